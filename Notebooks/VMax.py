@@ -247,7 +247,7 @@ def disp_gwots(ac_props, py_props, gwots, g, offset=0.5):
 w = wio.pstep_factory.get()
 gidx = wio.GearMultiIndexer.from_df(gwots)
 
-rec = vmax.calc_v_max(gwots)
+rec = vmax.calc_v_max(gwots, with_wot=True)
 print(f"VMAX: {rec.v_max}, G_VMAX: {rec.g_vmax}, maxWOT? {rec.is_n_lim}")
 display(rec.wot[f"g{rec.g_vmax}"])
 
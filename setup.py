@@ -130,6 +130,7 @@ def clean_line(line):
 
 plot_reqs = ["matplotlib"]
 excel_reqs = ["xlwings; sys_platform == 'win32'"]
+arrow_reqs = ["pyarrow"]
 doc_reqs = [
     "sphinx>=2",
     "matplotlib",
@@ -170,6 +171,7 @@ def clean_line(line):
     test_reqs
     + plot_reqs
     + excel_reqs
+    + arrow_reqs
     + [
         "twine",
         "pylint",
@@ -272,6 +274,7 @@ def clean_line(line):
     extras_require={
         "plot": plot_reqs,
         "excel": excel_reqs,
+        "arrow": arrow_reqs,
         "all": dev_reqs,
         "dev": dev_reqs,
         "notebook": notebook_reqs,
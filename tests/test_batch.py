@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013-2020 European Commission (JRC);
+# Licensed under the EUPL (the 'Licence');
+# You may not use this work except in compliance with the Licence.
+# You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl
+import json
+
+import pytest
+
+from wltp import batch, cli
+
+
+def _fake_runner(mdl):
+    """Module-level, to be picklable by the process-pool."""
+    if mdl["v_max"] < 0:
+        raise ValueError(f"Bad v_max({mdl['v_max']})!")
+    return {**mdl, "pmr": 2 * mdl["v_max"]}
+
+
+@pytest.mark.parametrize("max_workers, chunksize", [(0, 1), (0, 3), (2, 1), (2, 3)])
+def test_run_batch_order_and_errors(max_workers, chunksize):
+    mdls = [{"v_max": v} for v in (1, 2, -3, 4, 5, -6, 7)]
+
+    results = list(
+        batch.run_batch(
+            iter(mdls),
+            runner=_fake_runner,
+            max_workers=max_workers,
+            chunksize=chunksize,
+        )
+    )
+
+    assert [r.index for r in results] == list(range(len(mdls)))
+    assert [r.key for r in results] == list(range(len(mdls)))
+    for res, mdl in zip(results, mdls):
+        if mdl["v_max"] < 0:
+            assert res.mdl is None
+            assert "ValueError: Bad v_max" in res.error
+        else:
+            assert res.error is None
+            assert res.mdl["pmr"] == 2 * mdl["v_max"]
+
+
+def test_run_batch_keyed():
+    mdls = [("a", {"v_max": 1}), ("b", {"v_max": -1})]
+    results = list(batch.run_batch(mdls, runner=_fake_runner, max_workers=0))
+    table = batch.results_table(results, items=["v_max", "pmr"])
+
+    assert list(table.index) == ["a", "b"]
+    assert table.loc["a", "pmr"] == 2
+    assert table.loc["a", "error"] is None
+    assert table.loc["b", "error"].startswith("ValueError")
+
+
+def test_run_batch_bad_args():
+    with pytest.raises(TypeError, match="custom runner"):
+        list(batch.run_batch([], runner=_fake_runner, skip_model_validation=True))
+    with pytest.raises(ValueError, match="Chunksize"):
+        list(batch.run_batch([], chunksize=0))
+
+
+def test_iter_model_files(tmp_path):
+    (tmp_path / "veh1.json").write_text(json.dumps({"v_max": 1}))
+    (tmp_path / "veh2.yaml").write_text("v_max: 2\n")
+    (tmp_path / "notes.txt").write_text("not a model")
+
+    cases = list(batch.iter_model_files(tmp_path))
+
+    assert [k for k, _ in cases] == ["veh1", "veh2"]
+    assert [m["v_max"] for _, m in cases] == [1, 2]
+
+
+def test_cli_batch_reports_failures(tmp_path, capsys):
+    (tmp_path / "bad.json").write_text(json.dumps({"test_mass": -1}))
+    outdir = tmp_path / "out"
+
+    assert cli.main(["batch", "-j", "0", str(tmp_path), "-O", str(outdir)]) == 1
+
+    table = (outdir / "results.csv").read_text()
+    assert "bad" in table
+    assert "ValueError" in table
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013-2020 European Commission (JRC);
+# Licensed under the EUPL (the 'Licence');
+# You may not use this work except in compliance with the Licence.
+# You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl
+import os
+import subprocess as sbp
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from wltp import cache
+from wltp.experiment import Experiment
+
+from .goodvehicle import goodVehicle
+
+
+def _validated_model(**overrides):
+    return Experiment({**goodVehicle(), **overrides}).model
+
+
+def test_result_key_stable():
+    key = cache.result_key(_validated_model())
+
+    assert key == cache.result_key(_validated_model())
+    assert key != cache.result_key(_validated_model(p_rated=101))
+    assert key != cache.result_key(_validated_model(), vmax_wot=True)
+
+    ## Stable also across processes (e.g. no `id()` or hash-salt).
+    code = (
+        "from wltp import cache\n"
+        "from wltp.experiment import Experiment\n"
+        "from tests.goodvehicle import goodVehicle\n"
+        "print(cache.result_key(Experiment(goodVehicle()).model))"
+    )
+    out = sbp.check_output([sys.executable, "-c", code], cwd=os.getcwd())
+    assert out.decode().strip() == key
+
+
+@pytest.mark.parametrize(
+    "labels",
+    [np.arange(1000), np.arange(1000).astype(str), np.arange(1000) * 1e-3],
+)
+def test_result_key_long_axes(labels):
+    ## Their reprs elide the middle labels.
+    other = labels.copy()
+    other[500:990] = other[500:990][::-1]
+    a, b = pd.Series(0, index=labels), pd.Series(0, index=other)
+    assert str(a.axes) == str(b.axes)
+
+    assert cache.result_key({"a": a}) != cache.result_key({"a": b})
+    assert cache.result_key({"a": a.to_frame()}) != cache.result_key(
+        {"a": b.to_frame()}
+    )
+    assert cache.result_key({"a": a.to_frame().T}) != cache.result_key(
+        {"a": b.to_frame().T}
+    )
+    assert cache.result_key({"a": a}) == cache.result_key({"a": a.copy()})
+
+
+def test_experiment_cache_hit(tmp_path, monkeypatch):
+    mdl = Experiment(goodVehicle(), cache_dir=tmp_path).run()
+    assert len(list(tmp_path.glob(f"*/*{cache.result_file_ext}"))) == 1
+
+    def no_run(self):
+        raise AssertionError("Cached results not used!")
+
+    monkeypatch.setattr(Experiment, "_run", no_run)
+    mdl2 = Experiment(goodVehicle(), cache_dir=tmp_path).run()
+
+    assert mdl2["cycle"].equals(mdl["cycle"])
+    for k in ("v_max", "n_max", "f_dsc", "wltc_class", "pmr"):
+        assert mdl2[k] == mdl[k], k
+
+    with pytest.raises(AssertionError, match="not used"):
+        Experiment({**goodVehicle(), "p_rated": 101}, cache_dir=tmp_path).run()
+
+
+def test_cache_evict_lru(tmp_path):
+    rc = cache.ResultsCache(tmp_path)
+    rc.put("aa01", {"x": np.arange(1000)})
+    nbytes = next(tmp_path.glob(f"*/*{cache.result_file_ext}")).stat().st_size
+
+    rc = cache.ResultsCache(tmp_path, max_bytes=3.5 * nbytes)
+    now = time.time()
+    for i, key in enumerate(["aa02", "bb03", "cc04"]):
+        rc.put(key, {"x": np.arange(1000)})
+        os.utime(rc._fpath(key), (now - 100 + i, now - 100 + i))
+    os.utime(rc._fpath("aa01"), (now - 200, now - 200))
+    assert rc.get("aa01")  # touched, now most recently used
+
+    rc.put("dd05", {"x": np.arange(1000)})
+
+    assert rc.get("aa02") is None and rc.get("bb03") is None
+    assert rc.get("aa01") and rc.get("cc04") and rc.get("dd05")
+
+
+def test_cache_evict_expired_and_corrupted(tmp_path):
+    rc = cache.ResultsCache(tmp_path, max_age_sec=60)
+    rc.put("aa01", {"x": 1})
+    rc.put("bb02", {"x": 2})
+    assert rc.get("aa01") == {"x": 1}
+
+    old = time.time() - 61
+    os.utime(rc._fpath("aa01"), (old, old))
+    rc._fpath("bb02").write_bytes(b"garbage")
+
+    assert rc.get("aa01") is None
+    assert rc.get("bb02") is None
+    assert not list(tmp_path.glob(f"*/*{cache.result_file_ext}"))
+
+
+def test_cache_data_only_roundtrip(tmp_path):
+    mdl = Experiment(goodVehicle(), vmax_wot=True)._run()
+    results = {
+        **{k: mdl[k] for k in ("cycle", "wots_vmax", "v_max", "g_vmax", "f_dsc")},
+        "flag": np.bool_(True),
+        "none": None,
+        "arr": np.arange(3, dtype="int8"),
+        "flat": pd.DataFrame({"a": [1.0, np.NAN], "b": [True, np.NAN]}),
+    }
+    rc = cache.ResultsCache(tmp_path)
+    rc.put("aa01", results)
+    loaded = rc.get("aa01")
+
+    assert list(loaded) == list(results)
+    for k, v in results.items():
+        if isinstance(v, pd.DataFrame):
+            pd.testing.assert_frame_equal(loaded[k], v)
+        elif isinstance(v, np.ndarray):
+            np.testing.assert_array_equal(loaded[k], v)
+            assert loaded[k].dtype == v.dtype
+        else:
+            assert loaded[k] == v and type(loaded[k]) is type(v), k
+
+
+def test_cache_no_pickles(tmp_path, caplog):
+    rc = cache.ResultsCache(tmp_path)
+    rc.put("aa01", {"x": [1, 2]})
+    assert "Cannot cache 'x' of type list" in caplog.text
+    assert rc.get("aa01") is None
+
+    ## An archive with a pickled object-array is dropped, not unpickled.
+    rc._fpath("bb02").parent.mkdir()
+    with open(rc._fpath("bb02"), "wb") as fd:
+        np.savez(fd, **{"__items__": np.array('{"x": {"kind": "array"}}')}, x=[{}])
+    assert rc.get("bb02") is None
+    assert not rc._fpath("bb02").exists()
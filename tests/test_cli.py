@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013-2020 European Commission (JRC);
+# Licensed under the EUPL (the 'Licence');
+# You may not use this work except in compliance with the Licence.
+# You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl
+import re
+import subprocess as sbp
+import sys
+
+import pytest
+
+#: Modules that must not load just for ``import wltp`` or ``wltp --help``.
+heavy_modules = (
+    "pandas",
+    "scipy",
+    "jsonschema",
+    "graphtik",
+    "pandalone",
+    "matplotlib",
+    "pyarrow",
+)
+
+#: Cumulative seconds allowed for importing :mod:`wltp.cli` (~0.03s when lazy,
+#: ~1s if pandas & co get imported), checked only as a benchmark.
+import_budget_sec = 0.3
+
+
+def _run_python(*args) -> sbp.CompletedProcess:
+    return sbp.run(
+        [sys.executable, *args], stdout=sbp.PIPE, stderr=sbp.PIPE, check=True
+    )
+
+
+@pytest.mark.parametrize("module", ["wltp", "wltp.cli"])
+def test_import_skips_heavy_deps(module):
+    code = f"import sys, {module}; print(*sorted(m for m in sys.modules if '.' not in m))"
+    loaded = set(_run_python("-c", code).stdout.decode().split())
+
+    assert loaded.isdisjoint(heavy_modules)
+
+
+@pytest.mark.benchmark
+def test_import_time_budget():
+    ## `-X importtime` reports per-module in μsec: `self | cumulative | name`.
+    err = _run_python("-X", "importtime", "-c", "import wltp.cli").stderr.decode()
+    (cumulative,) = re.findall(r"\|\s*(\d+)\s*\|\s*wltp\.cli\s*$", err, re.M)
+
+    assert int(cumulative) / 1e6 < import_budget_sec, err
+
+
+def test_help_skips_heavy_deps():
+    code = (
+        "import sys, wltp.cli\n"
+        "try:\n"
+        "    wltp.cli.main(['--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print(*sorted(m for m in sys.modules if '.' not in m), file=sys.stderr)"
+    )
+    proc = _run_python("-c", code)
+
+    assert "usage:" in proc.stdout.decode()
+    assert set(proc.stderr.decode().split()).isdisjoint(heavy_modules)
+
+
+def test_lazy_submodule_attribute():
+    import wltp
+
+    assert "datamodel" in dir(wltp)
+    assert wltp.datamodel.get_model_base
+    with pytest.raises(AttributeError, match="no_such_thing"):
+        wltp.no_such_thing
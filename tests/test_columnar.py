@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013-2020 European Commission (JRC);
+# Licensed under the EUPL (the 'Licence');
+# You may not use this work except in compliance with the Licence.
+# You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl
+import numpy as np
+import pytest
+
+from wltp import batch, cli, columnar, utils
+from wltp.experiment import Experiment
+
+from .goodvehicle import goodVehicle
+
+pa = pytest.importorskip("pyarrow")
+
+
+@pytest.mark.parametrize("frmt", ["parquet", "feather", "arrow"])
+def test_cli_batch_columnar(tmp_path, frmt):
+    veh5 = {**goodVehicle(), "n2v_ratios": goodVehicle()["n2v_ratios"][:5]}
+    for key, mdl in [
+        ("veh6", goodVehicle()),
+        ("veh5", veh5),
+        ("bad", {**goodVehicle(), "f0": 5000}),
+    ]:
+        (tmp_path / f"{key}.json").write_text(utils.json_dumps(mdl))
+    outdir = tmp_path / "out"
+
+    argv = ["batch", "-j", "0", str(tmp_path), "-O", str(outdir), "--format", frmt]
+    assert cli.main([*argv, "--profile", "compact"]) == 1
+
+    ext = f".{frmt}"
+    assert sorted(p.name for p in outdir.iterdir()) == [
+        f"{name}{ext}" for name in ("cycle", "cycle_gears", "results")
+    ]
+
+    results = columnar.read_table(outdir / f"results{ext}")
+    meta = columnar.read_metadata(outdir / f"results{ext}")
+    assert meta["version"] == columnar.__version__
+    assert sorted(meta["model_hashes"]) == ["bad", "veh5", "veh6"]
+    assert dict(zip(results.vehicle, results.model_hash)) == meta["model_hashes"]
+    assert results.set_index("vehicle").error.notnull().to_dict() == {
+        "bad": True,
+        "veh5": False,
+        "veh6": False,
+    }
+
+    gears = columnar.read_table(outdir / f"cycle_gears{ext}", ["gear", "n"], ["veh5"])
+    assert list(gears.columns) == ["vehicle", "gear", "n"]
+    assert gears.vehicle.unique().tolist() == ["veh5"]
+    assert gears.gear.max() == 5
+
+    veh5 = batch.load_model_file(tmp_path / "veh5.json")
+    mdl = Experiment(veh5, output_profile="compact", output_layout="long").run()
+    cycle = columnar.read_table(outdir / f"cycle{ext}", ["V", "P_req"], ["veh5"])
+    np.testing.assert_array_equal(cycle.V, mdl["cycle"]["V"])
+    np.testing.assert_array_equal(gears.n, mdl["cycle_gears"]["n"])
+    assert columnar.read_metadata(outdir / f"cycle{ext}")["table"] == "cycle"
+
+
+def test_row_group_per_vehicle(tmp_path):
+    import pyarrow.parquet as pq
+
+    mdl = Experiment(goodVehicle(), output_profile="compact").run()
+    fpath = tmp_path / "cycle.parquet"
+    with columnar.TableWriter(fpath) as writer:
+        for key in ("a", "b", "c"):
+            writer.write(columnar.cycle_tables(mdl)[0], vehicle=key)
+
+    meta = pq.ParquetFile(fpath).metadata
+    assert meta.num_row_groups == 3
+    assert meta.num_rows == 3 * len(mdl["cycle"])
+
+
+def test_cycle_tables_flat_layout():
+    mdl = Experiment(goodVehicle(), output_layout="flat").run()
+    with pytest.raises(ValueError, match="flat columns"):
+        columnar.cycle_tables(mdl)
@@ -40,6 +40,21 @@ def test_identify_consecutive_truths_repeat_threshold_1_is_identical():
     assert col2.equals(col1 | col1.shift())
 
 
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("threshold", [1, 2, 3])
+def test_identify_consecutive_truths_vs_groupby(seed, threshold):
+    col = pd.Series(np.random.default_rng(seed).random(60) > 0.4, name="col")
+    pm = PhaseMarker(phase_repeat_threshold=threshold)
+
+    grouper = (col != col.shift()).cumsum()
+    exp = col & col.groupby(grouper).transform("count").ge(threshold)
+
+    got = pm._identify_consecutive_truths(col.copy(), right_edge=False)
+    assert got.equals(exp)
+    got = pm._identify_consecutive_truths(col.copy(), right_edge=True)
+    assert got.equals(exp | exp.shift(fill_value=False))
+
+
 @pytest.mark.parametrize("wltc_class, exp", [(0, 320), (1, 300), (2, 160), (3, 158)])
 def test_cycle_initaccel(wltc_class, exp, gwots):
     V = datamodel.get_class_v_cycle(wltc_class)
@@ -339,7 +354,189 @@ def test_cycler_pipeline():  # wltc_class):
     attach_class_phase_markers calc_phase_accel_raw calc_phase_run_stop calc_phase_decel
     calc_phase_initaccel calc_phase_stopdecel calc_phase_up calc_p_resist calc_inertial_power
     calc_required_power calc_n_max_cycle calc_n_max validate_n_max join_gwots_with_cycle
-    calc_P_remain calc_OK_p calc_OK_max_n calc_OK_g0 calc_OK_min_n derrive_ok_n_flags
-    calc_ok_gears make_cycle_multi_indexer make_incrementing_gflags make_G_min make_G_max0
+    calc_gear_flags make_cycle_multi_indexer make_incrementing_gflags make_G_min make_G_max0
     """.split()
     assert steps == steps_executed == exp_steps
+
+
+@pytest.fixture
+def cycler_inp():
+    """A factory of validated inputs for :func:`.pipelines.cycler_pipeline()`."""
+
+    def make(wltc_class="class3b", **overrides):
+        inp = {
+            **goodvehicle.goodVehicle(),
+            "wltc_data": datamodel.get_wltc_data(),
+            "wltc_class": wltc_class,
+            "v_max": 190.3,
+            "g_vmax": 6,
+            **overrides,
+        }
+        sol = nmindrive.mdl_2_n_min_drives.compute(
+            {**inp, "t_cold_end": 0}, "n_min_drives"
+        )
+        inp.update(sol["n_min_drives"]._asdict())
+        datamodel.validate_model(inp, additional_properties=True)
+
+        return inp
+
+    return make
+
+
+@pytest.mark.parametrize("wltc_class, p_rated", [(0, 100), ("class3b", 100), ("class3b", 50)])
+def test_flags_engines_equivalent(cycler_inp, wltc_class, p_rated):
+    inp = cycler_inp(wltc_class, p_rated=p_rated)
+    inp["V_compensated"] = datamodel.get_class_v_cycle(wltc_class).rename("V")
+    cycles = {
+        engine: pipelines.cycler_pipeline(flags_engine=engine).compute(inp)["cycle"]
+        for engine in ("pandas", "numpy")
+    }
+    exp, got = cycles["pandas"], cycles["numpy"]
+
+    assert set(got.columns) == set(exp.columns)
+    pd.testing.assert_frame_equal(got[exp.columns], exp)
+
+
+def test_flags_engine_unknown():
+    with pytest.raises(ValueError, match="flags_engine"):
+        pipelines.cycler_pipeline(flags_engine="bad")
+
+
+def test_class_cycle_cached_readonly():
+    cc = cycler.get_class_cycle("class3b", 0.1)
+    assert cycler.get_class_cycle(3, 0.1) is cc
+    assert cycler.get_class_cycle("class3b", 0.1, v_cap=0) is cc
+    assert cycler.get_class_cycle("class3b", 0.1, v_cap=100) is not cc
+
+    assert all(not arr.flags.writeable for arr in cc.arrays)
+    with pytest.raises(ValueError, match="read-only"):
+        cc.arrays[0][0] = -1
+
+    cycle = cc.frame()
+    cycle.iloc[:, 1] = -1  # frames are copies
+    assert (cc.frame().iloc[:, 1] >= 0).all()
+
+
+@pytest.mark.parametrize("f_dsc, v_cap", [(0, None), (0.1, None), (0.1, 100)])
+def test_class_cycle_pipeline_equivalent(cycler_inp, f_dsc, v_cap):
+    c = wio.pstep_factory.get().cycle
+    inp = cycler_inp()
+
+    class_cycle = cycler.get_class_cycle("class3b", f_dsc, v_cap)
+    V = pd.Series(class_cycle.frame()[c.v_target], name=c.v_target)
+
+    exp = pipelines.cycler_pipeline().compute({**inp, "V_compensated": V})["cycle"]
+    pipe = pipelines.cycler_pipeline(class_cycle=True)
+    got = pipe.compute({**inp, "class_cycle": class_cycle})["cycle"]
+
+    pd.testing.assert_frame_equal(got, exp)
+
+
+def test_cycler_plan_compiled_once(cycler_inp):
+    inp = cycler_inp()
+    inp["class_cycle"] = cycler.get_class_cycle("class3b")
+
+    pipe = pipelines.cycler_pipeline(class_cycle=True)
+    assert pipelines.cycler_pipeline(class_cycle=True) is pipe
+
+    ## NOTE: asking just `cycle` as output prunes ops providing implicit columns.
+    plan = pipe.compile(inputs=inp.keys())
+    assert pipe.compile(inputs=list(inp)) is plan
+
+    exp = pipe.compute(inp)["cycle"]
+    for _ in range(2):
+        got = plan.execute(inp)["cycle"]
+        pd.testing.assert_frame_equal(got, exp)
+
+
+@pytest.mark.parametrize(
+    "changes, exp_ops",
+    [
+        (
+            {"f2": 0.05},
+            """
+            calc_p_resist calc_required_power calc_gear_flags make_cycle_multi_indexer
+            make_incrementing_gflags make_G_min make_G_max0
+            """,
+        ),
+        (
+            {"test_mass": 1500},
+            """
+            calc_inertial_power calc_required_power calc_gear_flags make_cycle_multi_indexer
+            make_incrementing_gflags make_G_min make_G_max0
+            """,
+        ),
+        (
+            {"class_cycle": cycler.get_class_cycle("class3b", 0.1)},
+            """
+            init_cycle_from_class_cycle calc_p_resist calc_inertial_power
+            calc_required_power calc_n_max_cycle calc_n_max validate_n_max
+            join_gwots_with_cycle calc_gear_flags make_cycle_multi_indexer
+            make_incrementing_gflags make_G_min make_G_max0
+            """,
+        ),
+    ],
+)
+def test_whatif_recomputes_downstream(cycler_inp, changes, exp_ops):
+    inp = cycler_inp()
+    inp["class_cycle"] = cycler.get_class_cycle("class3b")
+    pipe = pipelines.cycler_pipeline(class_cycle=True)
+
+    wi = pipelines.WhatIf(pipe, inp)
+    orig = wi.solution["cycle"]
+    got = wi.update(**changes)
+
+    steps = [op.name for op in wi.executed]
+    assert steps == exp_ops.split()
+
+    exp = pipe.compute({**inp, **changes})["cycle"]
+    pd.testing.assert_frame_equal(got["cycle"], exp)
+    assert wi.inputs.keys() == inp.keys()
+
+    got = wi.update(**{k: inp[k] for k in changes})
+    pd.testing.assert_frame_equal(got["cycle"], orig)
+
+
+def test_whatif_chained_updates(cycler_inp):
+    inp = cycler_inp()
+    inp["class_cycle"] = cycler.get_class_cycle("class3b")
+    pipe = pipelines.cycler_pipeline(class_cycle=True)
+
+    wi = pipelines.WhatIf(pipe, inp)
+    ## Re-adding `gwots` into `cycle` needs rebuilding it.
+    wi.update(f_safety_margin=0.2)
+    assert "interpolate_wot_on_v_grid" in [op.name for op in wi.executed]
+    got = wi.update(g_vmax=5, v_max=150)
+
+    exp = pipe.compute({**inp, "f_safety_margin": 0.2, "g_vmax": 5, "v_max": 150})
+    pd.testing.assert_frame_equal(got["cycle"], exp["cycle"])
+    assert got["n_max_cycle"] == exp["n_max_cycle"]
+
+
+def test_gear_multi_indexer_memoized():
+    G = wio.GearMultiIndexer.from_ngears(6, gear0=True)
+    gidx = G.with_item("p")[3:]
+    G2 = wio.GearMultiIndexer.from_ngears(6, gear0=True)
+    assert gidx.equals(G2.with_item("p")[3:])
+
+    ## Modifying returned indices must not affect the memo.
+    gidx.names = (None, None)
+    assert G.with_item("p")[3:].names == ["item", "gear"]
+    gears = G[:]
+    gears.append("g7")
+    assert G[:] == ["g0", "g1", "g2", "g3", "g4", "g5", "g6"]
+
+    cols = G.colidx_pairs("n", G[3:])
+    df = pd.DataFrame(np.arange(14).reshape(2, 7), columns=G.with_item("n")[:])
+    assert (df.iloc[:, G.positions(slice(3, None))] == df.loc[:, cols]).all(None)
+    assert df.iloc[:, G.positions(-1)].name == ("n", "g6")
+
+
+def test_gear_multi_indexer_one_shot_keys():
+    G = wio.GearMultiIndexer.from_ngears(6)
+    assert G[(g for g in [2, 3])] == ["g2", "g3"]
+    assert G.positions(iter([2, 3])).tolist() == [1, 2]
+
+    G2 = wio.GearMultiIndexer.from_ngears(6)
+    assert G2[[2, 3]] == ["g2", "g3"]
+    assert G2.positions([2, 3]).tolist() == [1, 2]
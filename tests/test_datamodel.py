@@ -8,8 +8,11 @@
 
 import functools as fnt
 import itertools as itt
+import pickle
+import re
 
 import pandas as pd
+import pytest
 
 from graphtik import compose, operation
 from wltp import cycles, datamodel
@@ -129,3 +132,93 @@ def test_v_distances_pipeline(wltc_class):
         """,
     }
     assert oneliner(got) == oneliner(exp_sums[wltc_class])
+
+
+def _validated(trusted, **mdl_overrides):
+    mdl = datamodel.merge(datamodel.get_model_base(), goodVehicle())
+    mdl.update(mdl_overrides)
+    errors = datamodel.validate_model(
+        mdl, additional_properties=True, iter_errors=True, trusted=trusted
+    )
+    return mdl, [str(e) for e in errors]
+
+
+def test_validate_trusted_equals_full():
+    full, full_errors = _validated(False)
+    trusted, trusted_errors = _validated(True)
+
+    assert full_errors == trusted_errors == []
+    assert full.keys() == trusted.keys()
+    for k, v in full.items():
+        if k != "wltc_data":
+            assert str(v) == str(trusted[k]), k
+
+
+@pytest.mark.parametrize(
+    "overrides, err",
+    [
+        ({"f0": "1"}, "f0: '1' is not of type"),
+        ({"n2v_ratios": [[1, 2]]}, "n2v_ratios: .+ is not of type 1-D array"),
+        ({"p_rated": None}, "'p_rated' is a required property"),
+    ],
+)
+def test_validate_trusted_errors(overrides, err):
+    _mdl, errors = _validated(True, **overrides)
+
+    assert any(re.match(err, e) for e in errors), errors
+
+
+def test_wltc_data_validated_once(monkeypatch):
+    nvalidations = 0
+
+    class CountingValidator:
+        def iter_errors(self, wltc_data):
+            nonlocal nvalidations
+            nvalidations += 1
+            return iter(())
+
+    monkeypatch.setattr(datamodel, "_valid_wltc_checksums", set())
+    monkeypatch.setattr(datamodel, "wltc_validator", CountingValidator)
+
+    for _ in range(3):
+        mdl = datamodel.merge(datamodel.get_model_base(), goodVehicle())
+        datamodel.validate_model(mdl, validate_wltc_data=True, trusted=True)
+    assert nvalidations == 1
+
+    wltc_data = mdl["wltc_data"].thaw()
+    wltc_data["classes"]["class1"]["V_cycle"].iloc[3] += 1
+    mdl["wltc_data"] = wltc_data
+    datamodel.validate_model(mdl, validate_wltc_data=True, trusted=True)
+    assert nvalidations == 2
+
+
+def test_wltc_data_shared_readonly():
+    wltc_data = datamodel.get_model_base()["wltc_data"]
+    assert wltc_data is datamodel.get_wltc_data()
+
+    cls = wltc_data["classes"]["class1"]
+    with pytest.raises(TypeError):
+        cls["lengths"] = (1, 2)
+    with pytest.raises(ValueError, match="read-only"):
+        cls["V_cycle"].iloc[3] += 1
+
+    ## Pickled by reference.
+    mdl = datamodel.merge(datamodel.get_model_base(), goodVehicle())
+    payload = pickle.dumps(mdl)
+    assert len(payload) < 10_000, len(payload)
+    assert pickle.loads(payload)["wltc_data"] is wltc_data
+
+
+def test_wltc_data_modified_interned():
+    V = datamodel.get_class_v_cycle(0).copy()
+    V.iloc[3] += 1
+    override = {"wltc_data": {"classes": {"class1": {"V_cycle": V}}}}
+
+    mdls = [Experiment({**goodVehicle(), **override}).model for _ in range(2)]
+    wltc_data = mdls[0]["wltc_data"]
+
+    assert wltc_data is mdls[1]["wltc_data"]
+    assert wltc_data is not datamodel.get_wltc_data()
+    assert wltc_data["classes"]["class1"]["V_cycle"].iloc[3] == V.iloc[3]
+    assert datamodel.get_class_v_cycle(0).iloc[3] == V.iloc[3] - 1
+    assert pickle.loads(pickle.dumps(wltc_data)) is wltc_data
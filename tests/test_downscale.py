@@ -9,6 +9,7 @@
 import itertools as itt
 import logging
 import unittest
+import zlib
 
 import numpy as np
 import pandas as pd
@@ -166,10 +167,10 @@ def test_dsc_pipelines(wltc_class):
     assert sol["compensate_phases_t_extra"].tolist() == exp_t_missing[wltc_class]
 
     exp_compensated_phases = [
-        [(0, 589), (590, 1023), (1023, 1612)],
-        [(0, 589), (599, 1032), (1075, 1530), (1722, 2045)],
-        [(0, 589), (597, 1030), (1111, 1566), (1769, 2092)],
-        [(0, 589), (597, 1030), (1111, 1566), (1769, 2092)],
+        [(0, 589), (589, 1023), (1023, 1612)],
+        [(0, 589), (589, 1032), (1032, 1530), (1530, 2045)],
+        [(0, 589), (589, 1030), (1030, 1566), (1566, 2092)],
+        [(0, 589), (589, 1030), (1030, 1566), (1566, 2092)],
     ]
     compensated_phases = sol["compensated_phase_boundaries"]
     assert compensated_phases == exp_compensated_phases[wltc_class]
@@ -180,15 +181,17 @@ def test_dsc_pipelines(wltc_class):
 
     exp_compensated_distances = [
         [11988.4, 29146.9, 41135.3],
-        [11162.2, 28209.7, 51666.1, 70103.2],
-        [11140.3, 28110.5, 50564.1, 69069.5],
-        [11140.3, 28241.0, 50779.8, 69285.2],
+        [11162.2, 28209.7, 52644.6, 81496.3],
+        [11140.3, 28110.5, 53749.9, 83481.2],
+        [11140.3, 28241.0, 53999.1, 83730.4],
     ]
     compensated_distances = sol["compensated_distances"]
     assert (
         inv.vround(compensated_distances["cumsum"])
         == exp_compensated_distances[wltc_class]
     ).all()
+    ## No gaps between the phases.
+    assert compensated_distances["sum"].sum() == pytest.approx(V_compensated.sum())
 
     ## No CAPPING
 
@@ -204,3 +207,192 @@ def test_dsc_pipelines(wltc_class):
     V_compensated = sol["V_compensated"]
     assert regular_phases[-1][-1] == V_compensated.index[-1]
     assert sol["V_dsc"].sum() == sol["V_compensated"].sum()
+
+
+def _compensation_inputs(wltc_class, f_dsc, v_cap):
+    aug = wio.make_autograph()
+    ops = aug.wrap_funcs(
+        [
+            *pipelines.downscale_pipeline().ops,
+            *pipelines.compensate_capped_pipeline().ops,
+            *pipelines.v_distances_pipeline().ops,
+        ]
+    )
+    inp = {
+        "wltc_data": datamodel.get_wltc_data(),
+        "wltc_class": wltc_class,
+        "f_dsc": f_dsc,
+        "v_cap": v_cap,
+    }
+    outputs = [
+        "V_dsc",
+        "V_capped",
+        "compensate_phases_t_extra",
+        "class_phase_boundaries",
+    ]
+    return compose(..., *ops).compute(inp, outputs=outputs)
+
+
+## Recorded from the groupby implementation (before v1.1.0), as
+#  ``(len, sum, crc32 of float64 bytes)`` of `V_compensated`,
+#  and the compensated-phase-boundaries, but starting where the previous phase ends
+#  (it shifted each phase-start also by the extra samples of that phase).
+@pytest.mark.parametrize(
+    "wltc_class, f_dsc, v_cap, exp_V, exp_bounds",
+    [
+        (
+            "class1",
+            0,
+            60,
+            (1613, 41135.3, 180822261),
+            [(0, 589), (589, 1023), (1023, 1612)],
+        ),
+        (
+            "class1",
+            0.05,
+            55,
+            (1618, 40957.7, 4002953017),
+            [(0, 589), (589, 1028), (1028, 1617)],
+        ),
+        (
+            "class1",
+            0.1,
+            10,
+            (4487, 40718.7, 1653583469),
+            [(0, 1379), (1379, 3107), (3107, 4486)],
+        ),
+        (
+            "class2",
+            0,
+            90,
+            (1852, 81499.8, 365727649),
+            [(0, 589), (589, 1022), (1022, 1477), (1477, 1851)],
+        ),
+        (
+            "class2",
+            0.013,
+            110,
+            (1811, 81427.0, 2804235267),
+            [(0, 589), (589, 1022), (1022, 1477), (1477, 1810)],
+        ),
+        (
+            "class2",
+            0.1,
+            70,
+            (1927, 80512.1, 773750260),
+            [(0, 589), (589, 1023), (1023, 1488), (1488, 1926)],
+        ),
+        (
+            "class3a",
+            0,
+            120,
+            (1806, 83553.5, 3228696003),
+            [(0, 589), (589, 1022), (1022, 1477), (1477, 1805)],
+        ),
+        (
+            "class3a",
+            0.02,
+            100,
+            (1832, 83294.2, 3620901992),
+            [(0, 589), (589, 1022), (1022, 1477), (1477, 1831)],
+        ),
+        (
+            "class3b",
+            0,
+            0,
+            (1801, 83758.6, 4053363247),
+            [(0, 589), (589, 1022), (1022, 1477), (1477, 1800)],
+        ),
+        (
+            "class3b",
+            0,
+            110,
+            (1816, 83762.5, 4267031286),
+            [(0, 589), (589, 1022), (1022, 1477), (1477, 1815)],
+        ),
+        (
+            "class3b",
+            0.05,
+            50,
+            (2272, 83195.5, 3712952920),
+            [(0, 590), (590, 1057), (1057, 1662), (1662, 2271)],
+        ),
+        (
+            "class3b",
+            0.1,
+            100,
+            (1824, 82679.3, 2895830911),
+            [(0, 589), (589, 1022), (1022, 1477), (1477, 1823)],
+        ),
+    ],
+)
+def test_compensation_vs_groupby(wltc_class, f_dsc, v_cap, exp_V, exp_bounds):
+    sol = _compensation_inputs(wltc_class, f_dsc, v_cap)
+    V = downscale.calc_V_compensated(
+        v_cap,
+        sol["V_dsc"],
+        sol["V_capped"],
+        sol["compensate_phases_t_extra"],
+        sol["class_phase_boundaries"],
+    )
+    bounds = downscale.make_compensated_phase_boundaries(
+        sol["V_dsc"],
+        sol["V_capped"],
+        sol["compensate_phases_t_extra"],
+        sol["class_phase_boundaries"],
+    )
+
+    V = np.asarray(V, dtype=float)
+    assert (len(V), round(V.sum(), 1), zlib.crc32(V.tobytes())) == exp_V
+    assert bounds == exp_bounds
+    assert bounds[-1][-1] == len(V) - 1
+
+
+def test_compensation_extras_without_capped_samples(caplog):
+    ## `class1` @ 60kmh caps only phase-2: the groupby implementation
+    #  inserted 1 sample, but shifted the boundaries by all 6.
+    sol = _compensation_inputs("class1", 0, 60)
+    args = (sol["V_dsc"], sol["V_capped"], [3, 1, 2], sol["class_phase_boundaries"])
+
+    V = downscale.calc_V_compensated(60, *args)
+    bounds = downscale.make_compensated_phase_boundaries(*args)
+
+    V = np.asarray(V, dtype=float)
+    assert (len(V), round(V.sum(), 1), zlib.crc32(V.tobytes())) == (
+        1613,
+        41135.3,
+        180822261,
+    )
+    assert bounds == [(0, 589), (589, 1023), (1023, 1612)]
+    assert bounds[-1][-1] == len(V) - 1
+    assert "Dropped extra-samples [3, 0, 2]" in caplog.text
+
+    ## Nothing capped, nothing inserted.
+    args = (sol["V_dsc"], sol["V_dsc"], [3, 1, 2], sol["class_phase_boundaries"])
+    V = downscale.calc_V_compensated(60, *args)
+    assert downscale.make_compensated_phase_boundaries(*args)[-1][-1] == len(V) - 1
+
+
+@pytest.mark.parametrize("wclass", _wltc["classes"])
+def test_batch_vs_scalar_and_recursing(wclass):
+    class_data = _wltc["classes"][wclass]
+    V = pd.Series(class_data["V_cycle"])
+    phases = class_data["downscale"]["phases"]
+    f_dscs = np.round(np.arange(0, 0.501, 0.001), 3)
+
+    V_dscs = downscale.calc_V_dsc_batch(V, f_dscs, phases)
+    assert V_dscs.shape == (len(f_dscs), len(V))
+    assert (V_dscs[0] == V).all()
+
+    for f_dsc, V_dsc in zip(f_dscs[1:], V_dscs[1:]):
+        ## Bit-identical to the scalar path.
+        V_scalar = inv.vround(downscale.calc_V_dsc_raw(V, f_dsc, phases))
+        assert (V_dsc == V_scalar.to_numpy()).all(), f_dsc
+
+        ## Equal to the Spec's recursion, but for rounding ties
+        #  (e.g. 12.35 vs 12.3499999).
+        V_rec = downscale.downscale_by_recursing(V, f_dsc, phases).to_numpy()
+        assert np.allclose(V_rec, V_dsc, rtol=0, atol=0.05 + 1e-9), f_dsc
+        bad_ix = V_dsc != inv.vround(V_rec)
+        ties = np.isclose(V_rec[bad_ix] * 10 % 1, 0.5)
+        assert ties.all(), (f_dsc, V_rec[bad_ix][~ties])
@@ -243,6 +243,49 @@ def interpolate_veh(case):
     npt.assert_allclose(df.index.levels[1], invariants.vround(df.index.levels[1]))
 
 
+def test_interpolate_wots_on_v_grid_many_vehicles():
+    props = goodvehicle.goodVehicle()
+    wot = engine.preproc_wot(props, props["wot"])
+    wot2 = wot.iloc[:-3]  # shorter wot, shorter v-grid
+    n2vs = [props["n2v_ratios"], [130, 80, 50, 35], [100, 40]]
+
+    gw = engine.interpolate_wots_on_v_grid([wot, wot2, wot], n2vs)
+
+    assert gw.values.shape == (3, 6, len(gw.V_grid), wot.shape[1])
+    assert list(gw.ngears) == [6, 4, 2]
+    for i, (w, n2v) in enumerate(zip((wot, wot2, wot), n2vs)):
+        exp = engine.interpolate_wot_on_v_grid(w, n2v)
+        assert gw.nvs[i] == len(exp)
+        pd.testing.assert_frame_equal(gw.frame(i), exp, check_exact=True)
+        ## NAN-padding
+        assert np.isnan(gw.values[i, gw.ngears[i] :]).all()
+        assert np.isnan(gw.values[i, :, gw.nvs[i] :]).all()
+
+    with pytest.raises(ValueError, match="differ from"):
+        engine.interpolate_wots_on_v_grid([wot, wot.iloc[:, :-1]], n2vs[:2])
+
+
+def test_interpolate_wots_on_v_grid_equals_np_interp():
+    props = goodvehicle.goodVehicle()
+    wot = engine.preproc_wot(props, props["wot"])
+    wot["ASM"] = np.where(wot["n"] > 5000, np.NAN, 0.1)  # NANs interpolated too
+    n2vs = props["n2v_ratios"]
+
+    gw = engine.interpolate_wots_on_v_grid([wot], [n2vs])
+
+    V_grid = gw.V_grid[: gw.nvs[0]]
+    wot_values = wot.to_numpy(float)
+    for gi, n2v in enumerate(n2vs):
+        V = wot["n"].to_numpy() / n2v
+        out_of_bounds = (V_grid < V[0]) | (V_grid > V[-1])
+        for ii, item in enumerate(gw.items):
+            exp = np.interp(V_grid, V, wot_values[:, ii])
+            exp[out_of_bounds] = np.NAN
+            if item == "n":
+                exp = V_grid * n2v
+            npt.assert_array_equal(gw.values[0, gi, : gw.nvs[0], ii], exp, (gi, item))
+
+
 def test_attach_p_avail_in_gwots_smoketest(h5_accdb):
     gwots = pd.DataFrame({("p", "g1"): [], ("ASM", "g1"): []})
     engine.attach_p_avail_in_gwots(gwots, f_safety_margin=0.1)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013-2020 European Commission (JRC);
+# Licensed under the EUPL (the 'Licence');
+# You may not use this work except in compliance with the Licence.
+# You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl
+import numpy as np
+import pytest
+
+from wltp import datamodel, experiment
+from wltp.experiment import CrossCheckError, Experiment
+
+from .goodvehicle import goodVehicle
+
+
+@pytest.mark.parametrize("p_rated, f_dsc", [(100, 0), (50, 0.019)])
+def test_run_cross_check(p_rated, f_dsc):
+    mdl = goodVehicle()
+    mdl["p_rated"] = p_rated
+
+    exp = Experiment(mdl, cross_check=True)
+    mdl = exp.run()
+
+    assert mdl["f_dsc"] == f_dsc
+    assert exp.cross_check_diffs == []
+    assert len(mdl["cycle"]) == 1801
+    assert mdl["n_max"] == max(mdl["n_max1"], mdl["n_max2"], mdl["n_max3"])
+
+
+def test_run_cross_check_diffs(monkeypatch):
+    orig_calc = experiment.vehicle.calc_required_power
+    monkeypatch.setattr(
+        experiment.vehicle,
+        "calc_required_power",
+        lambda *args: orig_calc(*args) + 1,
+    )
+
+    mdl = Experiment(goodVehicle()).run()  # no cross-check, no complaints
+    assert "cycle" in mdl
+
+    exp = Experiment(goodVehicle(), cross_check=True)
+    with pytest.raises(CrossCheckError, match="P_req") as exinfo:
+        exp.run()
+
+    diffs = exinfo.value.diffs
+    assert diffs == exp.cross_check_diffs
+    assert [d.item for d in diffs] == ["P_req"]
+    (diff,) = diffs
+    assert len(diff.expected) == len(diff.got) > 0
+    assert ((diff.expected - diff.got).round(6) == 1).all()
+
+
+def test_phase_repeat_threshold_in_class_cycle():
+    def run(**items):
+        mdl = {**goodVehicle(), "phase_repeat_threshold": 5, **items}
+        return Experiment(mdl).run()["cycle"]
+
+    ## The cached class-cycle vs the forced velocity, phased by the pipeline.
+    got = run()
+    exp = run(cycle={"v_target": datamodel.get_class_v_cycle("class3b")})
+    phases = ["run", "stop", "decel", "initaccel", "stopdecel", "up"]
+    np.testing.assert_array_equal(got[phases].to_numpy(), exp[phases].to_numpy())
+
+    assert not got[phases].equals(run(phase_repeat_threshold=2)[phases])
@@ -12,6 +12,7 @@
 import io
 import json
 import unittest
+from pathlib import Path
 from timeit import timeit
 
 import jsonschema
@@ -167,6 +168,59 @@ def test_identify_checksums_works_with_all_CRCs(full):
     assert cycles.identify_cycle_v_crc(int(crc, 16)) == exp
 
 
+def test_identify_cycle_v_stream():
+    rng = np.random.default_rng(0)
+    parts, exp_cycles = [], []
+    for wltc_class in ("class3b", "class1", "class2", "class3a", "class3b"):
+        parts.append(np.zeros(rng.integers(10, 300)))
+        parts.append(rng.uniform(0, 80, 200).round(1))
+        start = sum(len(p) for p in parts)
+        parts.append(datamodel.get_class_v_cycle(wltc_class).to_numpy())
+        exp_cycles.append((start, start + len(parts[-1]), wltc_class))
+    V = np.concatenate(parts)
+
+    matches = cycles.CycleScanner().feed(V)
+
+    assert [
+        (m.start, m.end, m.cycle)
+        for m in matches
+        if m.phase is None and m.phasing == "V"
+    ] == exp_cycles
+    for m in matches:
+        assert cycles.identify_cycle_v(V[m.start : m.end]) == m[2:], m
+
+    chunks = (V[i : i + 333] for i in range(0, len(V), 333))
+    assert list(cycles.identify_cycle_v_stream(chunks)) == matches
+
+
+@pytest.mark.parametrize("name", ["V_class1", "V_class2", "V_class3a", "V_class3b"])
+def test_packed_V_equals_text(name, tmp_path):
+    V = cycles.read_V_packed(name)
+
+    assert isinstance(cycles.read_V_ints(name), np.memmap)
+    assert not V.flags.writeable
+    npt.assert_array_equal(V, cycles.read_V_file(f"{name}.txt"))
+
+    ## Re-packing the sources reproduces the shipped files.
+    fpath = cycles.pack_V_file(f"{name}.txt", tmp_path)
+    assert fpath.read_bytes() == (Path(cycles.__file__).parent / fpath.name).read_bytes()
+
+
+def test_packed_V_corrupted(tmp_path, monkeypatch):
+    fpath = cycles.pack_V_file("V_class2.txt", tmp_path)
+    V_ints = np.load(fpath)
+    V_ints[100] += 1
+    np.save(tmp_path / "V_class2.npy", V_ints)
+
+    monkeypatch.setattr(cycles, "files", lambda package: tmp_path)
+    cycles.read_V_ints.cache_clear()
+    try:
+        with pytest.raises(ValueError, match="Corrupted velocity trace"):
+            cycles.read_V_ints("V_class2")
+    finally:
+        cycles.read_V_ints.cache_clear()
+
+
 @pytest.mark.parametrize(
     "wltc_class, exp",
     [
@@ -187,7 +241,7 @@ def test_full_cycles_in_wltc_checksums(wltc_class, exp):
         (idx[:589], ("class1", "phase-1", "V")),
         (idx[589:1022], ("class1", "phase-2", "V")),
         (idx[:1022], ("class1", "PHASE-2", "V")),
-        (idx[:1021], (None, None, None)),
+        (idx[:1021], ("class1", "PHASE-2", "VA0")),  # CRC 090BEA9C
         (idx[:588], ("class1", "phase-1", "VA0")),
         (idx[1:589], ("class1", "phase-1", "VA1")),  # 1st & 3rd parts are identical
         (idx[1:590], (None, None, None)),
@@ -55,3 +55,51 @@ def test_n_mins_smoke(mdl):
     #
     for _i, nmins in enumerate(results):
         assert (np.isfinite(i) for i in nmins)
+
+
+_cases = list(
+    itt.product(
+        [500, 745, 904.9, 1204],  # n_idle
+        [850, 3000, 5450.4],  # n_rated
+        [None, 700, 2500],  # n_min_drive_up
+        [None, 1000.4, 3000],  # n_min_drive_down_start
+        [None, 1100],  # n_min_drive_set
+    )
+)
+
+
+def test_n_min_drives_batch_vs_pipeline():
+    n_idle, n_rated, up, down_start, nset = (
+        np.array(col, dtype=float) for col in zip(*_cases)
+    )
+    res = nmindrive.calc_n_min_drives_batch(
+        n_idle,
+        n_rated,
+        470,
+        n_min_drive_up=up,
+        n_min_drive_down_start=down_start,
+        n_min_drive_set=nset,
+    )
+
+    pipe = nmindrive.mdl_2_n_min_drives_pipeline()
+    assert res.invalid.any() and not res.invalid.all()
+    for i, (n_idle, n_rated, up, down_start, nset) in enumerate(_cases):
+        mdl = {"n_idle": n_idle, "n_rated": n_rated, "t_cold_end": 470}
+        for k, v in zip(
+            ("n_min_drive_up", "n_min_drive_down_start", "n_min_drive_set"),
+            (up, down_start, nset),
+        ):
+            if v is not None:
+                mdl[k] = v
+        sol = pipe.compute(mdl)
+
+        failed = {op.name for op in sol.ops if sol.is_failed(op)}
+        assert failed == {k for k, v in res.errors.items() if v[i]}, mdl
+        assert len(res.vehicle_errors(i)) == len(failed)
+        if not failed:
+            assert sol["n_min_drives"] == res.vehicle(i), mdl
+
+
+def test_n_min_drives_batch_bad_override():
+    with pytest.raises(TypeError, match="n_min_drive_foo"):
+        nmindrive.calc_n_min_drives_batch(500, 3000, n_min_drive_foo=1)
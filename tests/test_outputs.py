@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013-2020 European Commission (JRC);
+# Licensed under the EUPL (the 'Licence');
+# You may not use this work except in compliance with the Licence.
+# You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl
+import numpy as np
+import pytest
+
+from wltp import invariants as inv
+from wltp import io as wio
+from wltp import outputs
+from wltp.experiment import Experiment
+
+from .goodvehicle import goodVehicle
+
+
+@pytest.fixture(scope="module")
+def debug_mdl():
+    return Experiment(goodVehicle()).run()
+
+
+def test_output_profiles(debug_mdl):
+    cycle = debug_mdl["cycle"]
+    assert debug_mdl["cycle_nbytes"] == outputs.cycle_nbytes(cycle)
+
+    full = Experiment(goodVehicle(), output_profile="full").run()
+    compact = Experiment(goodVehicle(), output_profile="compact").run()
+
+    assert full["cycle"].columns.equals(cycle.columns)
+    dtypes = {np.dtype(i) for i in "float32 int8 int16 bool".split()}
+    assert set(full["cycle"].dtypes) <= dtypes
+    assert compact["cycle"].shape[1] < full["cycle"].shape[1]
+    items = compact["cycle"].columns.get_level_values(0)
+    assert not set(items) & set(outputs.rule_items())
+    assert (
+        debug_mdl["cycle_nbytes"]
+        > 1.8 * full["cycle_nbytes"]
+        > 1.8 * compact["cycle_nbytes"]
+    )
+
+    ## Downcasting within GTR precision.
+    #
+    for item in ("V", "G_min", "G_max0", "OK_gear"):
+        got = compact["cycle"][item].astype(float)
+        assert (inv.vround(got) == cycle[item]).all(None), item
+    got = compact["cycle"]["n"].astype(float)
+    np.testing.assert_allclose(got, cycle["n"], rtol=1e-6)
+
+
+def test_output_profile_unknown():
+    with pytest.raises(ValueError, match="Unknown output-profile 'tiny'"):
+        Experiment(goodVehicle(), output_profile="tiny")
+
+
+def test_cycle_layouts(debug_mdl):
+    cycle = debug_mdl["cycle"]
+
+    flat = Experiment(goodVehicle(), output_layout="flat").run()["cycle"]
+    assert flat.columns.tolist() == wio.flatten_columns(cycle.columns)
+    assert flat.set_axis(cycle.columns, axis=1).equals(cycle)
+
+    mdl = Experiment(goodVehicle(), output_layout="long").run()
+    per_t, per_gear = mdl["cycle"], mdl["cycle_gears"]
+    assert (cycle.columns.get_level_values(1) == "").sum() == per_t.shape[1]
+    assert per_gear.shape[0] == 7 * len(cycle)  # g0-g6
+    nbytes = outputs.cycle_nbytes(per_t) + outputs.cycle_nbytes(per_gear)
+    assert mdl["cycle_nbytes"] == nbytes
+
+    g2 = per_gear[per_gear.gear == 2].set_index("t")
+    assert g2["n"].equals(cycle[("n", "g2")].rename("n"))
+    assert (g2["OK_p"] == outputs.NANFLAG).all()  # only g3+
+    g3 = per_gear[per_gear.gear == 3].set_index("t")
+    assert (g3["OK_p"] == cycle[("OK_p", "g3")]).all()
+    assert g3["n_norm"].isnull().sum() == cycle[("n_norm", "g3")].isnull().sum()
+
+
+def test_flat_cycle_zero_copy(debug_mdl):
+    cycle = outputs.profile_cycle(debug_mdl["cycle"], "compact")
+    flat = outputs.flat_cycle(cycle)
+
+    for (_, col), (_, flat_col) in zip(cycle.items(), flat.items()):
+        assert np.shares_memory(col.to_numpy(), flat_col.to_numpy())
+        assert flat_col.to_numpy().flags.c_contiguous
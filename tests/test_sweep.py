@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013-2020 European Commission (JRC);
+# Licensed under the EUPL (the 'Licence');
+# You may not use this work except in compliance with the Licence.
+# You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl
+import numpy as np
+import pytest
+
+from wltp import sweep
+from wltp.experiment import Experiment
+
+from .goodvehicle import goodVehicle
+
+
+def test_sweep_equals_experiments():
+    base = {**goodVehicle(), "p_rated": 45}
+    grid = {
+        "test_mass": [1100, 1500, 1900],
+        "f2": [0.03, 0.05],
+        "f_safety_margin": [0.1, 0.2],
+    }
+    table = sweep.sweep(base, grid, with_cycle=True)
+
+    assert len(table) == 12
+    assert table.error.isnull().all()
+    ## Cover class & downscaling changes.
+    assert table.wltc_class.nunique() > 1
+    assert (table.f_dsc > 0).any() and (table.f_dsc == 0).any()
+
+    for i, point in sweep.grid_points(grid).iterrows():
+        mdl = Experiment({**base, **point.to_dict()}).run()
+        row = table.iloc[i]
+        for item in (*sweep.sweep_outputs, *sweep.cycle_outputs):
+            assert row[item] == mdl[item], (i, item)
+        shares = mdl["cycle"]["G_max0"].value_counts(normalize=True)
+        for g in range(len(base["n2v_ratios"]) + 1):
+            assert row[f"g{g}_share"] == shares.get(g, 0), (i, g)
+
+
+def test_sweep_failed_points():
+    table = sweep.sweep(goodVehicle(), {"f0": [210, 5000]})
+
+    assert list(table.columns) == ["f0", *sweep.sweep_outputs, "error"]
+    assert table.error[0] is None
+    assert table.error[1] == "ValueError: Cannot find v_max!"
+    assert np.isnan(table.v_max[1]) and table.wltc_class[1] is None
+
+    with pytest.raises(ValueError, match="Cannot find v_max"):
+        Experiment({**goodVehicle(), "f0": 5000}).run()
+
+
+def test_grid_points_unsweepable():
+    with pytest.raises(ValueError, match=r"Cannot sweep items \['n_idle'\]"):
+        sweep.grid_points({"n_idle": [800, 900], "f0": [100]})
+
+
+def test_sweep_p_rated_equals_experiments():
+    base = {**goodVehicle(), "p_rated": 45}
+    grid = {"p_rated": [40, 45, 50]}
+    table = sweep.sweep(base, grid, with_cycle=True)
+
+    assert table.error.isnull().all()
+    for i, point in sweep.grid_points(grid).iterrows():
+        mdl = Experiment({**base, **point.to_dict()}).run()
+        row = table.iloc[i]
+        for item in ("v_max", "g_vmax", "n_vmax", "f_dsc", "wltc_class"):
+            assert row[item] == pytest.approx(mdl[item]), (i, item)
+
+
+def test_monte_carlo():
+    base = {**goodVehicle(), "p_rated": 45}
+    sigmas = {"f0": 0.05, "f2": 0.05, "test_mass": 0.03}
+    mc = sweep.monte_carlo(
+        base, sigmas, 200, relative=True, seed=42, chunksize=64, cycle_samples=2
+    )
+
+    assert len(mc.samples) == 200
+    assert mc.samples.error.isnull().all()
+    assert mc.samples.test_mass.std() == pytest.approx(0.03 * 1500, rel=0.2)
+    assert {"v_max", "f_dsc", "pmr", "g1_share"} <= set(mc.stats.index)
+    assert {"5%", "50%", "95%"} <= set(mc.stats.columns)
+    assert mc.stats.loc["g1_share", "count"] == 2
+    assert mc.shares.groupby(level=0).sum().tolist() == pytest.approx([1, 1, 1])
+
+    mc2 = sweep.monte_carlo(base, sigmas, 200, relative=True, seed=42)
+    cols = list(mc2.samples.columns)
+    assert mc.samples[cols].equals(mc2.samples)
+
+
+def test_monte_carlo_negative_and_unset_items():
+    base = {**goodVehicle(), "f1": -0.1}
+    mc = sweep.monte_carlo(base, {"f1": 0.05}, 50, relative=True, seed=1)
+    assert mc.samples.f1.std() == pytest.approx(0.005, rel=0.3)
+
+    with pytest.raises(ValueError, match=r"missing from the model: \['f0'\]"):
+        sweep.sample_points({**goodVehicle(), "f0": None}, {"f0": 0.05}, 10)
+
+    mc = sweep.monte_carlo(goodVehicle(), {"test_mass": 2000}, 50, seed=1)
+    bad = mc.samples.test_mass <= 0
+    assert bad.any()
+    assert (mc.samples.error[bad] == "ValueError: Non-positive test_mass!").all()
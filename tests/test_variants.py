@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013-2020 European Commission (JRC);
+# Licensed under the EUPL (the 'Licence');
+# You may not use this work except in compliance with the Licence.
+# You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl
+import numpy.testing as npt
+import pandas as pd
+import pytest
+
+from graphtik import compose
+from wltp import cycles, datamodel
+from wltp import io as wio
+from wltp import pipelines, variants
+from wltp.experiment import Experiment
+
+from .goodvehicle import goodVehicle
+
+
+@pytest.mark.parametrize(
+    "wltc_class, f_dsc, v_cap",
+    [
+        ("class1", 0, 60),
+        ("class1", 0.05, 55),
+        ("class2", 0.02, 0),
+        ("class2", 0.013, 110),
+        ("class3b", 0.1, 100),
+    ],
+)
+def test_variant_V_equals_pipelines(wltc_class, f_dsc, v_cap):
+    aug = wio.make_autograph()
+    ops = aug.wrap_funcs(
+        [
+            *pipelines.downscale_pipeline().ops,
+            *pipelines.compensate_capped_pipeline().ops,
+            *pipelines.v_distances_pipeline().ops,
+        ]
+    )
+    inp = {
+        "wltc_data": datamodel.get_wltc_data(),
+        "wltc_class": wltc_class,
+        "f_dsc": f_dsc,
+        "v_cap": v_cap,
+    }
+    sol = compose(..., *ops).compute(inp, outputs=["V_capped", "V_compensated"])
+
+    npt.assert_array_equal(
+        variants.calc_variant_V(wltc_class, f_dsc, v_cap), sol["V_capped"]
+    )
+    npt.assert_array_equal(
+        variants.calc_variant_V(wltc_class, f_dsc, v_cap, compensated=True),
+        sol["V_compensated"],
+    )
+
+
+def test_variants_index(tmp_path):
+    index = variants.get_variants_index(tmp_path, f_dsc_max=0.02)
+    assert list(tmp_path.glob(f"{variants.index_file_prefix}*.npz"))
+    loaded = variants.VariantsIndex.load(
+        next(tmp_path.glob(f"{variants.index_file_prefix}*.npz"))
+    )
+    assert len(loaded) == len(index)
+
+    for wltc_class, f_dsc, v_cap, compensated in [
+        ("class1", 0, 60, True),
+        ("class2", 0.02, None, False),
+        ("class3a", 0.015, 120, False),
+        ("class3b", 0.015, 120, True),
+    ]:
+        V = variants.calc_variant_V(wltc_class, f_dsc, v_cap, compensated)
+        exp = (wltc_class, None, f_dsc, v_cap, compensated)
+        assert loaded.identify(V) == exp
+
+    ## Phases, the least capped variant.
+    V = variants.calc_variant_V("class3b", 0.02, 90)
+    assert loaded.identify(V[1022:1478]) == ("class3b", "phase-3", 0, 90, False)
+    ## Class3a/b share their last phase, labeled by the 1st class.
+    assert loaded.identify(V[1477:]) == ("class3a", "phase-4", 0.02, 90, False)
+    V = variants.calc_variant_V("class2", 0.02, 50)[:590]
+    assert loaded.identify(V) == ("class2", "phase-1", 0, 50, False)
+
+    ## Nominal & unknown traces.
+    assert loaded.identify(datamodel.get_class_v_cycle("class2")) is None
+    assert loaded.identify(variants.calc_variant_V("class2", 0.1)) is None
+
+
+def test_experiment_forced_variant(tmp_path, caplog):
+    index = variants.VariantsIndex.build(variants.f_dsc_grid(0.02))
+    V = variants.calc_variant_V("class3b", 0.015, 120, compensated=True)
+
+    def run(**exp_kw):
+        mdl = {**goodVehicle(), "v_cap": 100, "cycle": {"v_target": V}}
+        mdl = Experiment(mdl, **exp_kw).run()
+        return mdl.get("wltc_class"), mdl["f_dsc"], mdl["v_cap"]
+
+    ## Never built implicitly.
+    assert run() == (None, None, 100)
+    assert run(cache_dir=tmp_path) == (None, None, 100)
+    assert not list(tmp_path.glob(f"{variants.index_file_prefix}*"))
+    assert variants.load_variants_index(tmp_path) is None
+
+    caplog.set_level("INFO", logger="wltp.experiment")
+    assert run(variants_index=index) == ("class3b", 0.015, 120)
+    assert "replacing model's wltc_class(None) & v_cap(100)" in caplog.text
+
+    ## Consulted only when already saved in the cache-dir.
+    fpath = variants._index_fpath(
+        tmp_path, variants.f_dsc_grid(), variants.v_cap_min
+    )
+    index.save(fpath)
+    assert run(cache_dir=tmp_path) == ("class3b", 0.015, 120)
+
+    V = variants.calc_variant_V("class3b", 0.015, 120) + 1
+    assert run(variants_index=index) == (None, None, 100)
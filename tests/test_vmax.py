@@ -28,16 +28,16 @@
 log = logging.getLogger(__name__)
 
 
-def _calc_v_max_manual(props, wot, n2vs):
+def _calc_v_max_manual(props, wot, n2vs, with_wot=False):
     gwots = engine.interpolate_wot_on_v_grid(wot, n2vs)
     gwots = engine.attach_p_avail_in_gwots(gwots, f_safety_margin=0.1)
     gwots["p_resist"] = vehicle.calc_p_resist(
         gwots.index, props["f0"], props["f1"], props["f2"]
     )
-    return vmax.calc_v_max(gwots)
+    return vmax.calc_v_max(gwots, with_wot=with_wot)
 
 
-def _calc_v_max_pipelined(props, wot, n2vs):
+def _calc_v_max_pipelined(props, wot, n2vs, with_wot=False):
     pipe = pipelines.vmax_pipeline()
     calc_v_max_op = pipe.find_op_by_name("calc_v_max")
     res = pipe.compute(
@@ -48,6 +48,7 @@ def _calc_v_max_pipelined(props, wot, n2vs):
             "f0": props["f0"],
             "f1": props["f1"],
             "f2": props["f2"],
+            "vmax_with_wot": with_wot,
         },
         outputs=calc_v_max_op.provides,
     )
@@ -80,7 +81,16 @@ def test_v_max_goodvehicle(v_max_calculator):
     wot = props["wot"]
     wot = engine.preproc_wot(props, wot)
     vmax_rec = v_max_calculator(props, wot, props["n2v_ratios"])
-    vmax_rec[:4] == (190.3, 6089.6, 6, False)
+    assert vmax_rec[:4] == (190.3, 6089.6, 6, False)
+    assert vmax_rec.wot is None
+
+    vmax_rec2 = v_max_calculator(props, wot, props["n2v_ratios"], with_wot=True)
+    assert vmax_rec2[:4] == vmax_rec[:4]
+    gwot = vmax_rec2.wot["g6"]
+    assert gwot.loc[190.3, "p_remain_stable"] > 0
+    assert gwot.loc[190.4, "p_remain_stable"] <= 0
+    assert gwot.loc[190.3, "zero_crossings"] < 0
+    assert list(vmax_rec2.wot.columns.unique(0)) == ["g6", "g5"]
 
 
 def test_v_max_vehdb(h5_accdb, vehnums_to_run, v_max_calculator):
@@ -99,7 +109,7 @@ def make_v_maxes(vehnum):
 
         wot = wot.rename({"Pwot": "p"}, axis=1)
         wot["n"] = wot.index
-        rec = v_max_calculator(props, wot, n2vs)
+        rec = v_max_calculator(props, wot, n2vs, with_wot=True)
 
         return (props["v_max"], rec.v_max, props["gear_v_max"], rec.g_vmax, rec.wot)
 
@@ -610,7 +610,7 @@ def run_pyalgo_on_accdb_vehicle(
 
     mdl = mdl_from_accdb(props, wot, n2vs)
     datamodel.validate_model(mdl, additional_properties=additional_properties)
-    exp = Experiment(mdl, skip_model_validation=True)
+    exp = Experiment(mdl, skip_model_validation=True, vmax_wot=True)
     mdl = exp.run()
 
     ## Keep only *output* key-values, not to burden HDF data-model
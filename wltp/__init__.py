@@ -16,3 +16,42 @@
 __uri__ = "https://github.com/JRCSTU/wltp"
 
 from ._version import __version__, __updated__
+
+#: Submodules imported on first attribute access (e.g. ``wltp.datamodel``),
+#: so that a bare ``import wltp`` stays cheap (needs PY3.7+, PEP 562).
+_lazy_submodules = {
+    "autograph",
+    "batch",
+    "cache",
+    "cli",
+    "columnar",
+    "cycler",
+    "cycles",
+    "datamodel",
+    "downscale",
+    "engine",
+    "experiment",
+    "invariants",
+    "io",
+    "nmindrive",
+    "outputs",
+    "pipelines",
+    "plots",
+    "sweep",
+    "utils",
+    "variants",
+    "vehicle",
+    "vmax",
+}
+
+
+def __getattr__(name):
+    if name in _lazy_submodules:
+        import importlib
+
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted({*globals(), *_lazy_submodules})
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013-2020 European Commission (JRC);
+# Licensed under the EUPL (the 'Licence');
+# You may not use this work except in compliance with the Licence.
+# You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl
+"""
+run whole fleets of vehicles through :class:`~.experiment.Experiment` on a process-pool
+
+The vehicle-models are read lazily from any iterable (e.g. a directory of JSON/YAML
+files, see :func:`iter_model_files()`), sent in *chunks* to the worker processes,
+and their results (or errors) are streamed back in the *input order*.
+
+**Example:**
+
+.. code-block:: python
+
+    from wltp import batch
+
+    for res in batch.run_batch(batch.iter_model_files("fleet/"), max_workers=32):
+        if res.error:
+            print(res.key, res.error)
+        else:
+            ...  # res.mdl["cycle"], res.mdl["v_max"], ...
+
+.. Workaround sphinx-doc/sphinx#6590
+.. doctest::
+    :hide:
+
+    >>> from wltp.batch import *
+    >>> __name__ = "wltp.batch"
+"""
+import collections
+import concurrent.futures as cfut
+import functools as fnt
+import itertools as itt
+import logging
+import os
+import traceback
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from . import utils
+
+log = logging.getLogger(__name__)
+
+#: The model items collected by :func:`results_table()` for each vehicle.
+scalar_outputs = (
+    "pmr",
+    "n95_low",
+    "n95_high",
+    "v_max",
+    "n_vmax",
+    "g_vmax",
+    "is_n_lim_vmax",
+    "n_max1",
+    "n_max2",
+    "n_max3",
+    "n_max",
+    "wltc_class",
+    "f_dsc_raw",
+    "f_dsc",
+    "cycle_nbytes",
+)
+
+#: File extensions recognized by :func:`iter_model_files()`.
+model_file_extensions = (".json", ".yaml", ".yml")
+
+
+class BatchResult(NamedTuple):
+    """The outcome of running one vehicle, as yielded by :func:`run_batch()`."""
+
+    #: the position of the vehicle in the input iterable
+    index: int
+    #: the label given to the vehicle (e.g. filename or accdb case number)
+    key: Hashable
+    #: the resulting model, or `None` if `error`
+    mdl: Optional[dict]
+    #: the formatted traceback of the failure, or `None` if ok
+    error: Optional[str]
+    #: the :func:`.datamodel.tree_checksum()` of the input-model, as given
+    model_hash: Optional[str] = None
+
+
+def run_vehicle(mdl: Mapping, **experiment_kw) -> dict:
+    """
+    The default `runner` of :func:`run_batch()`, running a single :class:`.Experiment`.
+
+    :param experiment_kw:
+        passed to :class:`.Experiment` constructor
+    :return:
+        the output model, without the ``wltc_data`` (to save IPC from the workers)
+    """
+    from .experiment import Experiment
+
+    mdl = Experiment(mdl, **experiment_kw).run()
+    mdl.pop("wltc_data", None)
+
+    return mdl
+
+
+def _run_chunk(
+    runner: Callable[[Mapping], dict], chunk: List[Tuple[int, Hashable, Mapping]]
+) -> List[BatchResult]:
+    """Executed in worker processes: run every case, capturing any errors. """
+    from .datamodel import tree_checksum
+
+    results = []
+    for i, key, mdl in chunk:
+        model_hash = None
+        try:
+            model_hash = tree_checksum(mdl)
+            out = runner(mdl)
+        except Exception:
+            log.debug("Vehicle %r failed!", key, exc_info=True)
+            error = traceback.format_exc()
+            results.append(BatchResult(i, key, None, error, model_hash))
+        else:
+            results.append(BatchResult(i, key, out, None, model_hash))
+
+    return results
+
+
+def _as_cases(mdls: Iterable) -> Iterator[Tuple[int, Hashable, Mapping]]:
+    """Enumerate models, accepting also ``(key, mdl)`` pairs."""
+    for i, item in enumerate(mdls):
+        if isinstance(item, tuple) and len(item) == 2:
+            key, mdl = item
+        else:
+            key, mdl = i, item
+        yield (i, key, mdl)
+
+
+def _chunked(cases: Iterable, chunksize: int) -> Iterator[list]:
+    it = iter(cases)
+    while True:
+        chunk = list(itt.islice(it, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_batch(
+    mdls: Iterable[Union[Mapping, Tuple[Hashable, Mapping]]],
+    *,
+    runner: Callable[[Mapping], dict] = None,
+    max_workers: int = None,
+    chunksize: int = 4,
+    prefetch: int = 2,
+    **experiment_kw,
+) -> Iterator[BatchResult]:
+    """
+    Run vehicles on a :class:`concurrent.futures.ProcessPoolExecutor`, yielding in input order.
+
+    :param mdls:
+        an iterable of vehicle-models, or ``(key, mdl)`` pairs;
+        it is consumed lazily, as workers become free.
+    :param runner:
+        a *picklable* (e.g. module-level) function to run each model
+        (default: :func:`run_vehicle()`, receiving also any `experiment_kw`);
+        any exception it raises is reported in :attr:`BatchResult.error`.
+    :param max_workers:
+        number of worker processes (default: :func:`os.cpu_count()`);
+        when 0, all vehicles run sequentially in this process (e.g. for debugging).
+    :param chunksize:
+        how many vehicles each worker-task runs, to amortize IPC overhead
+    :param prefetch:
+        how many chunks per worker to keep in-flight, bounding the memory
+        held by results waiting for some slower earlier chunk.
+    :return:
+        a generator of :class:`BatchResult`, in the order of `mdls`
+    """
+    if runner is None:
+        runner = fnt.partial(run_vehicle, **experiment_kw)
+    elif experiment_kw:
+        raise TypeError(f"Unexpected keywords for custom runner: {experiment_kw}")
+    if chunksize < 1:
+        raise ValueError(f"Chunksize({chunksize}) must be a positive integer!")
+
+    chunks = _chunked(_as_cases(mdls), chunksize)
+
+    if max_workers == 0:
+        for chunk in chunks:
+            yield from _run_chunk(runner, chunk)
+        return
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_inflight = max(1, max_workers * prefetch)
+
+    with cfut.ProcessPoolExecutor(max_workers) as pool:
+        inflight: collections.deque = collections.deque()
+        for chunk in chunks:
+            inflight.append(pool.submit(_run_chunk, runner, chunk))
+            ## Yield ready chunks from the head, to preserve input order.
+            while inflight and (len(inflight) >= max_inflight or inflight[0].done()):
+                yield from inflight.popleft().result()
+        while inflight:
+            yield from inflight.popleft().result()
+
+
+def load_model_file(fpath: Union[str, Path]) -> dict:
+    """Read a vehicle-model from a JSON or YAML file. """
+    import json
+
+    fpath = Path(fpath)
+    with open(fpath, "rt", encoding="utf-8") as fd:
+        if fpath.suffix.lower() == ".json":
+            return json.load(fd)
+        return utils.yaml_load(fd)  # type: ignore
+
+
+def iter_model_files(
+    *paths: Union[str, Path], extensions=model_file_extensions
+) -> Iterator[Tuple[str, dict]]:
+    """
+    Lazily load vehicle-models from files & directories (not recursively).
+
+    :param paths:
+        files and/or directories, whose files with one of `extensions`
+        are loaded in sorted order
+    :return:
+        a generator of ``(file-stem, mdl)`` pairs, to feed :func:`run_batch()`
+    """
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            fpaths = sorted(
+                p for p in path.iterdir() if p.suffix.lower() in extensions
+            )
+        else:
+            fpaths = [path]
+        for fpath in fpaths:
+            yield fpath.stem, load_model_file(fpath)
+
+
+def _error_headline(error: str) -> str:
+    """The 1st line of the exception in a formatted traceback. """
+    lines = error.strip().splitlines()
+    frames = [i for i, l in enumerate(lines) if l.startswith('  File "')]
+    ## Skip the source-lines (indented) of the last frame.
+    for l in lines[frames[-1] + 1 if frames else 0 :]:
+        if not l[:1].isspace():
+            return l
+    return lines[-1]
+
+
+def results_table(
+    results: Iterable[BatchResult], items: Iterable[str] = scalar_outputs
+) -> "pd.DataFrame":
+    """
+    Collect the scalar `items` of all :func:`run_batch()` results in a table.
+
+    :return:
+        a dataframe indexed by result keys, with one column per item,
+        plus an ``error`` column with the exception-line of any failure
+    """
+    import pandas as pd
+
+    items = list(items)
+    rows = {}
+    for res in results:
+        if res.error:
+            row = {"error": _error_headline(res.error)}
+        else:
+            row = {i: res.mdl.get(i) for i in items}
+            row["error"] = None
+        rows[res.key] = row
+
+    return pd.DataFrame.from_dict(rows, orient="index", columns=[*items, "error"])
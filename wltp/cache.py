@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013-2020 European Commission (JRC);
+# Licensed under the EUPL (the 'Licence');
+# You may not use this work except in compliance with the Licence.
+# You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl
+"""
+a content-addressed on-disk cache for the results of whole-vehicle runs
+
+Each result is stored under the :func:`result_key()` of the *validated* input-model,
+which includes the `wltp` version and the checksum of the WLTC-data,
+so that re-running a fleet recomputes only the vehicles that have changed.
+
+The results are stored as data only (numpy archives & json, no pickles),
+so a cache-dir may be shared without executing any code from it,
+and read by other versions of pandas.
+
+**Example:**
+
+.. code-block:: python
+
+    from wltp.experiment import Experiment
+
+    mdl = Experiment(mdl, cache_dir="~/.cache/wltp").run()
+
+.. Workaround sphinx-doc/sphinx#6590
+.. doctest::
+    :hide:
+
+    >>> from wltp.cache import *
+    >>> __name__ = "wltp.cache"
+"""
+import functools as fnt
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from . import __version__
+
+log = logging.getLogger(__name__)
+
+#: The extension of the files in the cache-dir (compressed numpy archives).
+result_file_ext = ".npz"
+
+#: The archive member with the json "table of contents" of the result items.
+_toc_member = "__items__"
+
+#: The python types of scalars & object-column values stored as json.
+_json_types = (bool, int, float, str, type(None))
+
+#: The fraction of `max_bytes` to keep when evicting, to avoid evicting on every put.
+evict_ratio = 0.9
+
+
+def result_key(mdl: Mapping, **extras) -> str:
+    """
+    The hex-digest identifying the results of a validated model, stable across runs.
+
+    :param mdl:
+        a validated input-model; its `wltc_data` are hashed separately
+        (by :func:`.datamodel.wltc_data_checksum()`)
+    :param extras:
+        any other options affecting the results (e.g. `vmax_wot` of :class:`.Experiment`)
+    """
+    from .datamodel import tree_checksum, wltc_data_checksum
+
+    wltc_data = mdl.get("wltc_data")
+    return tree_checksum(
+        {
+            "version": __version__,
+            "wltc_data": wltc_data and wltc_data_checksum(wltc_data),
+            "model": {k: v for k, v in mdl.items() if k != "wltc_data"},
+            "extras": extras,
+        }
+    )
+
+
+def _pack_frame(name: str, df: pd.DataFrame, arrays: Dict[str, np.ndarray]) -> dict:
+    if isinstance(df.index, pd.MultiIndex):
+        raise TypeError(f"Cannot cache {name!r} with a multi-index!")
+
+    arrays[f"{name}/index"] = df.index.to_numpy()
+    objects = []
+    for i, (label, col) in enumerate(df.items()):
+        values = col.to_numpy()
+        if values.dtype.hasobject:
+            ## e.g. booleans mixed with NANs
+            values = values.tolist()
+            if not all(isinstance(v, _json_types) for v in values):
+                raise TypeError(f"Cannot cache {name!r} column {label!r} objects!")
+            objects.append(values)
+        else:
+            arrays[f"{name}/{i}"] = values
+            objects.append(None)
+
+    return {
+        "kind": "frame",
+        "index_name": df.index.name,
+        "column_names": list(df.columns.names),
+        "columns": [list(c) if isinstance(c, tuple) else c for c in df.columns],
+        "objects": objects,
+    }
+
+
+def _unpack_frame(name: str, item: dict, archive) -> pd.DataFrame:
+    columns = {
+        i: archive[f"{name}/{i}"] if values is None else np.array(values, dtype=object)
+        for i, values in enumerate(item["objects"])
+    }
+    index = pd.Index(archive[f"{name}/index"], name=item["index_name"])
+    df = pd.DataFrame(columns, index=index, copy=False)
+    names = item["column_names"]
+    if len(names) > 1:
+        df.columns = pd.MultiIndex.from_tuples(map(tuple, item["columns"]), names=names)
+    else:
+        df.columns = pd.Index(item["columns"], name=names[0])
+
+    return df
+
+
+def pack_results(results: Mapping) -> Dict[str, np.ndarray]:
+    """
+    The arrays of a numpy archive storing the `results`, without any pickles.
+
+    :param results:
+        items with dataframes (of a flat index), arrays, and numpy or python scalars
+    :return:
+        the arrays of the frames & arrays, and the json "table of contents" of the items
+    :raise TypeError:
+        for other values (e.g. lists), or frames with columns of non-scalar objects
+    """
+    arrays = {}
+    toc = {}
+    for name, value in results.items():
+        name = str(name)
+        if isinstance(value, pd.DataFrame):
+            toc[name] = _pack_frame(name, value, arrays)
+        elif isinstance(value, np.ndarray) and not value.dtype.hasobject:
+            arrays[name] = value
+            toc[name] = {"kind": "array"}
+        elif isinstance(value, np.generic) and not isinstance(value, np.object_):
+            dtype = value.dtype.str
+            toc[name] = {"kind": "scalar", "dtype": dtype, "value": value.item()}
+        elif isinstance(value, _json_types):
+            toc[name] = {"kind": "scalar", "value": value}
+        else:
+            raise TypeError(f"Cannot cache {name!r} of type {type(value).__name__}!")
+    arrays[_toc_member] = np.array(json.dumps(toc))
+
+    return arrays
+
+
+def unpack_results(archive: Mapping[str, np.ndarray]) -> dict:
+    """The results stored by :func:`pack_results()`, from a (loaded) numpy archive."""
+    results = {}
+    for name, item in json.loads(archive[_toc_member].item()).items():
+        kind = item["kind"]
+        if kind == "frame":
+            results[name] = _unpack_frame(name, item, archive)
+        elif kind == "array":
+            results[name] = archive[name]
+        elif "dtype" in item:
+            results[name] = np.dtype(item["dtype"]).type(item["value"])
+        else:
+            results[name] = item["value"]
+
+    return results
+
+
+class ResultsCache:
+    """
+    Store & load model-results by key, evicting the least recently used when full.
+
+    The results are stored as compressed numpy archives (see :func:`pack_results()`),
+    in sub-dirs named by the 1st 2 chars of their keys, and loaded without unpickling;
+    loading a result updates its *modification-time*,
+    which is used to evict by age and the least recently used.
+
+    Concurrent processes may share the same cache-dir, since files are written
+    atomically (but the size of the dir is tracked only approximately by each process).
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path],
+        max_bytes: Optional[int] = None,
+        max_age_sec: Optional[float] = None,
+    ):
+        """
+        :param cache_dir:
+            the directory to store the results (created if missing)
+        :param max_bytes:
+            when given, the least recently used results are evicted
+            when their total size exceeds this
+        :param max_age_sec:
+            when given, results not used for longer than this are
+            ignored & evicted
+        """
+        #: the directory storing the results
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.max_bytes = max_bytes
+        self.max_age_sec = max_age_sec
+        #: bytes stored in the cache-dir, scanned on 1st need
+        self._nbytes: Optional[int] = None
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}({str(self.cache_dir)!r}, "
+            f"max_bytes={self.max_bytes}, max_age_sec={self.max_age_sec})"
+        )
+
+    def _fpath(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key[2:]}{result_file_ext}"
+
+    def _is_expired(self, mtime: float, now: float = None) -> bool:
+        return self.max_age_sec is not None and (
+            (now or time.time()) - mtime > self.max_age_sec
+        )
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        :return:
+            the results stored under `key`, or None if missing, expired or unreadable
+        """
+        fpath = self._fpath(key)
+        try:
+            if self._is_expired(fpath.stat().st_mtime):
+                self._remove(fpath)
+                return None
+            with np.load(fpath, allow_pickle=False) as archive:
+                results = unpack_results(archive)
+        except FileNotFoundError:
+            return None
+        except Exception as ex:
+            ## e.g. truncated by a crash, or not written by :meth:`put()`
+            log.warning("Dropping unreadable cached result %s, due to: %s", fpath, ex)
+            self._remove(fpath)
+            return None
+
+        os.utime(fpath)
+
+        return results
+
+    def put(self, key: str, results: Mapping):
+        """
+        Store (or replace) the `results` under `key`, and evict if full.
+
+        Results with values not supported by :func:`pack_results()` are not stored
+        (a warning is logged).
+        """
+        try:
+            arrays = pack_results(results)
+        except TypeError as ex:
+            log.warning("Not caching results(%s), due to: %s", key, ex)
+            return
+
+        fpath = self._fpath(key)
+        fpath.parent.mkdir(parents=True, exist_ok=True)
+        tmp_fpath = fpath.with_name(f"{fpath.name}.{os.getpid()}.tmp")
+        with open(tmp_fpath, "wb") as fd:
+            np.savez_compressed(fd, **arrays)
+        nbytes = tmp_fpath.stat().st_size
+        os.replace(tmp_fpath, fpath)
+
+        if self.max_bytes is not None:
+            if self._nbytes is None:
+                self.evict()
+            else:
+                self._nbytes += nbytes
+                if self._nbytes > self.max_bytes:
+                    self.evict()
+
+    def _remove(self, fpath: Path) -> int:
+        try:
+            nbytes = fpath.stat().st_size
+            fpath.unlink()
+        except FileNotFoundError:
+            return 0  # e.g. evicted by another process
+        if self._nbytes is not None:
+            self._nbytes -= nbytes
+        return nbytes
+
+    def evict(self) -> int:
+        """
+        Remove the expired results, and the least recently used ones if over `max_bytes`.
+
+        :return:
+            the number of results removed
+        """
+        now = time.time()
+        entries = []
+        for fpath in self.cache_dir.glob(f"*/*{result_file_ext}"):
+            try:
+                st = fpath.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, fpath))
+        self._nbytes = sum(e[1] for e in entries)
+
+        nremoved = 0
+        entries.sort()
+        limit = None if self.max_bytes is None else self.max_bytes * evict_ratio
+        for mtime, _size, fpath in entries:
+            if not (
+                self._is_expired(mtime, now)
+                or (limit is not None and self._nbytes > limit)
+            ):
+                continue
+            self._remove(fpath)
+            nremoved += 1
+        if nremoved:
+            log.info("Evicted %i results from cache %s.", nremoved, self.cache_dir)
+
+        return nremoved
+
+
+@fnt.lru_cache()
+def open_cache(
+    cache_dir: Union[str, Path],
+    max_bytes: Optional[int] = None,
+    max_age_sec: Optional[float] = None,
+) -> ResultsCache:
+    """
+    A :class:`ResultsCache` shared by all experiments in this process with the same args.
+
+    So that the (approximate) size of the cache-dir is scanned just once
+    per process (e.g. per worker of :func:`.batch.run_batch()`).
+    """
+    return ResultsCache(cache_dir, max_bytes, max_age_sec)
@@ -11,23 +11,23 @@
     :func:`main()`
 """
 
-import os, sys, collections, functools, re, glob, shutil, logging
-from argparse import ArgumentTypeError
-from collections import OrderedDict
 import argparse
-import pkg_resources as pkg
-import ast
-from distutils.spawn import find_executable
+import collections
+import functools
 import json
+import logging
+import operator as ops
+import os
+import re
+import shutil
+import sys
+from argparse import ArgumentTypeError
 from textwrap import dedent
-from wltp import datamodel, experiment, utils, __version__ as prog_ver
-import pandalone.pandata as pandel
-from jsonschema.exceptions import RefResolutionError
-from pandas.core.generic import NDFrame
 
-import jsonschema as jsons
-import operator as ops
-import pandas as pd
+from wltp import utils, __version__ as prog_ver
+
+## NOTE: heavy deps (pandas, pandalone, jsonschema & the wltp model/engine modules)
+#  are imported inside the functions using them, to launch fast, e.g. for `--help`.
 
 
 DEBUG = False
@@ -69,6 +69,8 @@ def main(argv=None):
             ?=     : boolean
             :=     : parsed as json
             @=     : parsed as python (with eval())
+        * To run many vehicles at once on all CPUs, use the `batch` sub-command,
+          see ``%(prog)s batch --help``.
 
     EXAMPLES:
 
@@ -139,6 +141,9 @@ def main(argv=None):
     if argv is None:
         argv = sys.argv[1:]
 
+    if argv and argv[0] == "batch":
+        return batch_main(argv[1:], program_name)
+
     doc_lines = main.__doc__.splitlines()
     desc = doc_lines[0]
     epilog = dedent("\n".join(doc_lines[1:]))
@@ -189,6 +194,10 @@ def main(argv=None):
 
     ## Main program
     #
+    import jsonschema as jsons
+    from jsonschema.exceptions import RefResolutionError
+    from wltp import datamodel, experiment
+
     try:
         additional_props = not opts.strict
         mdl = assemble_model(infiles, opts.m)
@@ -222,6 +231,94 @@ def main(argv=None):
         )
 
 
+def batch_main(argv, program_name=PROG):
+    """
+    Run many vehicle-models (JSON/YAML files or dirs) on a process-pool, see :mod:`.batch`.
+
+    EXAMPLES::
+
+        ## Run all vehicles in `fleet/` dir on all CPUs, storing
+        #  their cycles & a summary table in `out/` dir:
+        >> %(prog)s batch fleet/ -O out/
+
+        ## Run 2 vehicles sequentially, printing the summary table:
+        >> %(prog)s batch -j 0 veh1.json veh2.yaml
+
+        ## Re-run the fleet, computing only vehicles changed since last time:
+        >> %(prog)s batch fleet/ -O out/ --cache ~/.cache/wltp --cache-max-mb 2000
+
+        ## Store cycles with float32 & without the columns of gear-rules:
+        >> %(prog)s batch fleet/ -O out/ --profile compact
+
+        ## Store all cycles & results in 3 Parquet files, a row-group per vehicle:
+        >> %(prog)s batch fleet/ -O out/ --format parquet
+    """
+    from wltp import batch
+
+    doc_lines = batch_main.__doc__.splitlines()
+    parser = build_batch_args_parser(
+        f"{program_name} batch",
+        prog_ver,
+        doc_lines[1].strip(),
+        dedent("\n".join(doc_lines[2:])),
+    )
+    opts = parser.parse_args(argv)
+    columnar = opts.format != "csv"
+    if columnar and not opts.O:
+        parser.error(f"Format {opts.format!r} needs an OUTDIR (-O)!")
+    if columnar and opts.layout == "flat":
+        parser.error(f"Format {opts.format!r} cannot store the `flat` layout!")
+
+    level = logging.DEBUG if opts.verbose else DEFAULT_LOG_LEVEL
+    _init_logging(level, name=program_name)
+
+    outdir = opts.O
+    if outdir:
+        os.makedirs(outdir, exist_ok=True)
+
+    def store_cycles(results):
+        for res in results:
+            if res.error:
+                log.error("Vehicle %r failed: %s", res.key, res.error)
+            elif outdir and not columnar:
+                for item in ("cycle", "cycle_gears"):
+                    if item in res.mdl:
+                        fpath = os.path.join(outdir, f"{res.key}.{item}.csv")
+                        res.mdl[item].to_csv(fpath)
+            yield res
+
+    results = batch.run_batch(
+        batch.iter_model_files(*opts.models),
+        max_workers=opts.jobs,
+        chunksize=opts.chunksize,
+        additional_properties=not opts.strict,
+        trusted_model=opts.trusted,
+        cache_dir=opts.cache,
+        cache_max_bytes=opts.cache_max_mb and int(opts.cache_max_mb * 2 ** 20),
+        cache_max_age_sec=opts.cache_max_days and opts.cache_max_days * 86400,
+        output_profile=opts.profile,
+        output_layout=opts.layout,
+    )
+    if columnar:
+        from wltp.columnar import BatchStore
+
+        with BatchStore(outdir, f".{opts.format}") as store:
+            table = batch.results_table(store_cycles(store.store_cycles(results)))
+            store.store_results(table)
+    else:
+        table = batch.results_table(store_cycles(results))
+        if outdir:
+            table.to_csv(os.path.join(outdir, "results.csv"))
+        else:
+            table.to_csv(sys.stdout)
+
+    n_errors = table["error"].notnull().sum()
+    if n_errors:
+        log.warning("%i out of %i vehicles failed!", n_errors, len(table))
+
+    return int(bool(n_errors))
+
+
 def copy_excel_template_files(dest_dir=None):
     import pkg_resources as pkg
 
@@ -255,28 +352,42 @@ def copy_excel_template_files(dest_dir=None):
     return files_copied
 
 
+def _read_series_csv(*args, **kw):
+    # From https://stackoverflow.com/a/40208359/548792
+    import pandas as pd
+
+    return pd.read_csv(*args, **kw).T.squeeze()
+
+
 ## The value of file_frmt=VALUE to decide which
-#    pandas.read_XXX() and write_XXX() methods to use.
+#    pandas.read_XXX() and write_XXX() methods to use
+#    (by name, resolved on use, not to import pandas on launch).
 #
 # _io_file_modes = {'r':0, 'rb':0, 'w':1, 'wb':1, 'a':1, 'ab':1}
 _io_file_modes = {"r": 0, "w": 1}
-_read_clipboard_methods = (pd.read_clipboard, "to_clipboard")
+_read_clipboard_methods = ("read_clipboard", "to_clipboard")
 _default_pandas_format = "AUTO"
 _pandas_formats = collections.OrderedDict(
     [
         ("AUTO", None),
-        ("CSV", (pd.read_csv, "to_csv")),
-        ("TXT", (pd.read_csv, "to_csv")),
-        ("XLS", (pd.read_excel, "to_excel")),
-        ("JSON", (pd.read_json, "to_json")),
-        # From https://stackoverflow.com/a/40208359/548792
-        (
-            "SERIES",
-            ((lambda *args, **kw: pd.read_csv(*args, **kw).T.squeeze()), "to_json"),
-        ),
+        ("CSV", ("read_csv", "to_csv")),
+        ("TXT", ("read_csv", "to_csv")),
+        ("XLS", ("read_excel", "to_excel")),
+        ("JSON", ("read_json", "to_json")),
+        ("SERIES", (_read_series_csv, "to_json")),
+        ("PARQUET", ("read_parquet", "to_parquet")),
+        ("FEATHER", ("read_feather", "to_feather")),
     ]
 )
-_known_file_exts = {"XLSX": "XLS"}
+_known_file_exts = {"XLSX": "XLS", "ARROW": "FEATHER"}
+## The pandas methods given filenames, not files opened in text-mode.
+_fname_io_methods = {
+    "read_excel",
+    "read_parquet",
+    "to_parquet",
+    "read_feather",
+    "to_feather",
+}
 
 
 def get_file_format_from_extension(fname):
@@ -333,6 +444,7 @@ def parse_key_value_pair(arg):
 
 def parse_column_specifier(arg):
     """Argument-type for --icolumns, syntaxed like: COL_NAME [(UNITS)]."""
+    import pandalone.pandata as pandel
 
     res = pandel.parse_value_with_units(arg)
     if res:
@@ -408,7 +520,7 @@ def parse_file_args(n, fname, *kv_args):
             assert isinstance(methods, tuple), methods
             method = methods[io_file_indx]
 
-            if method == pd.read_excel:
+            if method in _fname_io_methods:
                 file = fname
             else:
                 file = argparse.FileType(filemode)(fname)
@@ -449,6 +561,10 @@ def parse_file_args(n, fname, *kv_args):
 def load_file_as_df(filespec):
     # FileSpec(io_method, fname, file, frmt, path, append, kws)
     method = filespec.io_method
+    if isinstance(method, str):
+        import pandas as pd
+
+        method = getattr(pd, method)
     log.debug(
         "Reading file with: pandas.%s(%s, %s)",
         method.__name__,
@@ -480,6 +596,8 @@ def load_file_as_df(filespec):
 
 
 def load_model_part(mdl, filespec):
+    import pandalone.pandata as pandel
+
     dfin = load_file_as_df(filespec)
     log.debug("  +-input-file(%s):\n%s", filespec.fname, dfin.head())
     if filespec.path:
@@ -490,6 +608,8 @@ def load_model_part(mdl, filespec):
 
 
 def assemble_model(infiles, model_overrides):
+    import pandalone.pandata as pandel
+    from wltp import datamodel
 
     mdl = datamodel.get_model_base()
 
@@ -517,14 +637,33 @@ def assemble_model(infiles, model_overrides):
     return mdl
 
 
+def _as_columnar_frame(part):
+    """Flatten any `(item, gear)` columns, and move a named index into the columns."""
+    import pandas as pd
+
+    from wltp import outputs
+
+    if isinstance(part, pd.Series):
+        part = part.to_frame()
+    if isinstance(part.columns, pd.MultiIndex):
+        part = outputs.flat_cycle(part)
+    if part.index.name is not None:
+        part = part.reset_index(drop=part.index.name in part.columns)
+
+    return part.reset_index(drop=True)
+
+
 def store_part_as_df(filespec, part):
     """If part is Pandas, store it as it is, else, store it as json recursively.
 
         :param FileSpec filespec: named_tuple
         :param part: what to store, originating from model(filespec.path))
     """
+    from pandas.core.generic import NDFrame
 
     if isinstance(part, NDFrame):
+        if filespec.io_method in ("to_parquet", "to_feather"):
+            part = _as_columnar_frame(part)
         log.debug(
             "Writing file with: pandas.%s(%s, %s)",
             filespec.io_method,
@@ -541,6 +680,9 @@ def store_part_as_df(filespec, part):
 
 
 def store_model_parts(mdl, outfiles):
+    import pandalone.pandata as pandel
+    from jsonschema.exceptions import RefResolutionError
+
     for filespec in outfiles:
         try:
             try:
@@ -595,7 +737,7 @@ def build_args_parser(program_name, version, desc, epilog):
             * The FILENAME can be '-' to designate <stdin> or '+' to designate CLIPBOARD.
             * Any KEY-VALUE pairs pass directly to pandas.read_XXX() options,
               except from the following keys, which are consumed before reaching pandas:
-                ** file_frmt = [ AUTO | CSV | TXT | XLS | JSON | SERIES ]
+                ** file_frmt = [ AUTO | CSV | TXT | XLS | JSON | SERIES | PARQUET | FEATHER ]
                   selects which pandas.read_XXX() method to use:
                     *** AUTO: the format is deduced from the filename's extension (ie Excel files).
                     *** JSON: different sub-formats are selected through the 'orient' keyword
@@ -783,5 +925,108 @@ def build_args_parser(program_name, version, desc, epilog):
     return parser
 
 
+def build_batch_args_parser(program_name, version, desc, epilog):
+    parser = argparse.ArgumentParser(
+        prog=program_name,
+        description=desc,
+        epilog=epilog,
+        formatter_class=RawTextHelpFormatter,
+    )
+    parser.add_argument(
+        "models",
+        help="vehicle-model files (JSON/YAML) or directories containing them",
+        nargs="+",
+        metavar="PATH",
+    )
+    parser.add_argument(
+        "-O",
+        help="directory to write `<vehicle>.cycle.csv` & `results.csv` files into\n"
+        "(or the `--format` ones);\n"
+        "if missing, the results-table is printed in <stdout>",
+        metavar="OUTDIR",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="number of worker processes, 0 to run sequentially [default: #CPUs]",
+        type=int,
+        metavar="N",
+    )
+    parser.add_argument(
+        "--chunksize",
+        help="vehicles sent to each worker at once [default: %(default)s]",
+        type=int,
+        default=4,
+        metavar="N",
+    )
+    parser.add_argument(
+        "--strict",
+        help="validate models strictly, ie no additional-properties allowed.\n"
+        "[default: %(default)s]",
+        default=False,
+        type=utils.str2bool,
+        metavar="[TRUE | FALSE]",
+    )
+    parser.add_argument(
+        "--cache",
+        help="directory to load the results of vehicles ran before, or store them",
+        metavar="DIR",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        help="evict least recently used results when the cache exceeds this size",
+        type=float,
+        metavar="MB",
+    )
+    parser.add_argument(
+        "--cache-max-days",
+        help="evict results not used for this many days",
+        type=float,
+        metavar="DAYS",
+    )
+    parser.add_argument(
+        "--profile",
+        help="the columns & dtypes of the stored cycles, `compact` being the smallest\n"
+        "(see `wltp.outputs`) [default: %(default)s]",
+        choices=("debug", "full", "compact"),
+        default="debug",
+    )
+    parser.add_argument(
+        "--layout",
+        help="the columns of the stored cycles: `wide` (item, gear) pairs,\n"
+        "`flat` like `n/g2`, or `long` with an extra `<vehicle>.cycle_gears.csv`\n"
+        "having a row per (t, gear) [default: %(default)s]",
+        choices=("wide", "flat", "long"),
+        default="wide",
+    )
+    parser.add_argument(
+        "--format",
+        help="the files of the cycles & results; the columnar ones store\n"
+        "all vehicles in `cycle`, `cycle_gears` & `results` files\n"
+        "with a row-group per vehicle, needing `pyarrow`\n"
+        "(see `wltp.columnar`) [default: %(default)s]",
+        choices=("csv", "parquet", "feather", "arrow"),
+        default="csv",
+    )
+    parser.add_argument(
+        "--trusted",
+        help="validate just the types & dimensions of items in models\n"
+        "already validated, to run faster",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        help="set verbosity level [default: %(default)s]",
+    )
+    parser.add_argument(
+        "--version", action="version", version=version,
+    )
+
+    return parser
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013-2020 European Commission (JRC);
+# Licensed under the EUPL (the 'Licence');
+# You may not use this work except in compliance with the Licence.
+# You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl
+"""
+store fleet results in columnar files (Parquet & Arrow), a row-group per vehicle
+
+The cycles of all vehicles of a :func:`.batch.run_batch()` go into 2 files,
+one for the `cycle` items without gears, and one with a row per ``(t, gear)``
+for the items having gears (like the ``long`` layout of :mod:`.outputs`),
+so their schemas stay the same regardless of the number of gears;
+a `vehicle` column keys the rows, and each vehicle is appended as
+a *row-group* (Parquet) or *record-batch* (Arrow IPC), so that reading a few
+columns, or a few vehicles, does not load the whole fleet.
+
+The files carry the `wltp` version in their metadata, and the results-table
+also the :attr:`.batch.BatchResult.model_hash` of each vehicle.
+
+Requires the optional :mod:`pyarrow` (install ``wltp[arrow]``).
+
+**Example:**
+
+.. code-block:: python
+
+    from wltp import batch, columnar
+
+    with columnar.BatchStore("out/", ".parquet") as store:
+        results = batch.run_batch(batch.iter_model_files("fleet/"))
+        table = batch.results_table(store.store_cycles(results))
+        store.store_results(table)
+
+    ## The velocities of 2 vehicles, reading just the `vehicle` & `V` columns.
+    columnar.read_table("out/cycle.parquet", ["V"], vehicles=["veh1", "veh2"])
+
+.. Workaround sphinx-doc/sphinx#6590
+.. doctest::
+    :hide:
+
+    >>> from wltp.columnar import *
+    >>> __name__ = "wltp.columnar"
+"""
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, Iterator, Optional, Tuple, Union
+
+import pandas as pd
+
+from . import io as wio
+from . import outputs
+from . import __version__
+
+log = logging.getLogger(__name__)
+
+#: The columnar file-formats, by their file-extension (`feather` v2 is Arrow IPC).
+columnar_formats = {".parquet": "parquet", ".feather": "arrow", ".arrow": "arrow"}
+
+#: The column keying the rows of each vehicle in the files.
+vehicle_column = "vehicle"
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as ex:
+        raise ImportError(
+            "Columnar outputs need `pyarrow`, install it with `pip install wltp[arrow]`"
+        ) from ex
+
+    return pyarrow
+
+
+def columnar_format(fpath: Union[str, Path]) -> str:
+    """
+    :return:
+        one of the :data:`columnar_formats` values, by the extension of `fpath`
+    :raise ValueError:
+        for unknown extensions
+
+    >>> columnar_format("out/cycle.feather")
+    'arrow'
+    """
+    ext = Path(fpath).suffix.lower()
+    if ext not in columnar_formats:
+        raise ValueError(
+            f"Unknown columnar extension {ext!r}, not one of {list(columnar_formats)}!"
+        )
+
+    return columnar_formats[ext]
+
+
+def file_metadata(**extras) -> Dict[bytes, bytes]:
+    """
+    The key-value metadata of the files, the `wltp` version & any `extras`.
+
+    :param extras:
+        any other metadata, non-string values stored as json
+    :return:
+        the metadata, with keys prefixed by ``wltp_``
+
+    >>> file_metadata(table="cycle")
+    {b'wltp_version': b'...', b'wltp_table': b'cycle'}
+    """
+    meta = {"version": __version__, **extras}
+
+    return {
+        f"wltp_{k}".encode(): (v if isinstance(v, str) else json.dumps(v)).encode()
+        for k, v in meta.items()
+    }
+
+
+def cycle_tables(mdl) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    The `cycle` of a model as 2 frames with fixed columns, regardless of its gears.
+
+    :param mdl:
+        a model after :meth:`.Experiment.run()`, in the ``wide`` or ``long`` layout
+    :return:
+        the items without gears, and those with gears in a row per ``(t, gear)``
+        (see :func:`.outputs.long_cycle()`)
+    :raise ValueError:
+        for the ``flat`` layout, whose columns depend on the gears
+    """
+    m = wio.pstep_factory.get()
+
+    cycle = mdl[m.cycle]
+    if m.cycle_gears in mdl:
+        return cycle, mdl[m.cycle_gears]
+    if not isinstance(cycle.columns, pd.MultiIndex):
+        raise ValueError(
+            "Cannot store cycles with flat columns (they vary with the gears)"
+            " in columnar files; use the `wide` or `long` layout."
+        )
+
+    return outputs.layout_cycle(cycle, "long")
+
+
+class TableWriter:
+    """
+    Append frames in a single Parquet or Arrow IPC file, each one as a row-group.
+
+    The schema of the file is that of the 1st frame written (without its index),
+    and the later frames are converted to it (e.g. int8 columns of a vehicle
+    upcast to int16 of the 1st one), or fail.
+    """
+
+    def __init__(
+        self, fpath: Union[str, Path], metadata: Dict[bytes, bytes] = None,
+    ):
+        """
+        :param fpath:
+            the file to write, its extension one of :data:`columnar_formats`
+        :param metadata:
+            added to the schema of the file (see :func:`file_metadata()`)
+        """
+        self.fpath = Path(fpath)
+        self.frmt = columnar_format(fpath)
+        self.metadata = metadata or file_metadata()
+        #: the schema of the 1st frame written
+        self.schema = None
+        self._writer = None
+        #: the number of row-groups written
+        self.ngroups = 0
+
+    def __repr__(self):
+        return f"{type(self).__name__}({str(self.fpath)!r}, ngroups={self.ngroups})"
+
+    def _open(self, table):
+        pa = _import_pyarrow()
+
+        self.schema = table.schema.with_metadata(self.metadata)
+        if self.frmt == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(str(self.fpath), self.schema)
+        else:
+            self._writer = pa.ipc.new_file(str(self.fpath), self.schema)
+
+    def write(self, df: pd.DataFrame, **constants):
+        """
+        Append `df` as a single row-group, after any `constants` columns.
+
+        :param constants:
+            columns to insert in front, a value or a list of them
+            (e.g. the vehicle key)
+        """
+        pa = _import_pyarrow()
+
+        df = df.reset_index(drop=True)
+        for i, (k, v) in enumerate(constants.items()):
+            df.insert(i, k, v, allow_duplicates=False)
+        table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        if self._writer is None:
+            self._open(table)
+            table = table.replace_schema_metadata(self.metadata)
+
+        if self.frmt == "parquet":
+            self._writer.write_table(table, row_group_size=max(1, len(table)))
+        else:
+            self._writer.write_table(table, max_chunksize=max(1, len(table)))
+        self.ngroups += 1
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class BatchStore:
+    """
+    Store :func:`.batch.run_batch()` results in columnar files of an output-dir.
+
+    Writes ``cycle<ext>`` & ``cycle_gears<ext>`` with a row-group per vehicle
+    (see :func:`cycle_tables()`), and ``results<ext>`` with the scalar-outputs.
+    """
+
+    def __init__(self, outdir: Union[str, Path], ext: str = ".parquet"):
+        """
+        :param ext:
+            the extension of the files, one of :data:`columnar_formats`
+        """
+        _import_pyarrow()
+        self.outdir = Path(outdir)
+        self.ext = ext
+        columnar_format(self.fpath("results"))
+        #: the :attr:`.batch.BatchResult.model_hash` of the vehicles stored, by key
+        self.model_hashes: Dict[Hashable, Optional[str]] = {}
+        self._writers: Dict[str, TableWriter] = {}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({str(self.outdir)!r}, {self.ext!r})"
+
+    def fpath(self, name: str) -> Path:
+        return self.outdir / f"{name}{self.ext}"
+
+    def _writer(self, name: str) -> TableWriter:
+        if name not in self._writers:
+            meta = file_metadata(table=name)
+            self._writers[name] = TableWriter(self.fpath(name), meta)
+        return self._writers[name]
+
+    def store_cycles(self, results: Iterable["BatchResult"]) -> Iterator["BatchResult"]:
+        """
+        Append the cycles of the successful `results`, yielding all of them.
+
+        Results from the ``flat`` layout of :mod:`.outputs` fail with ValueError.
+        """
+        for res in results:
+            self.model_hashes[res.key] = res.model_hash
+            if not res.error:
+                for name, df in zip(("cycle", "cycle_gears"), cycle_tables(res.mdl)):
+                    self._writer(name).write(df, **{vehicle_column: str(res.key)})
+            yield res
+
+    def store_results(self, table: pd.DataFrame) -> Path:
+        """
+        Write the :func:`.batch.results_table()` with the model-hashes of its vehicles.
+
+        The hashes go both in a `model_hash` column and in the metadata,
+        as a json mapping of vehicle-keys to hashes.
+        """
+        keys = [str(k) for k in table.index]
+        hashes = [self.model_hashes.get(k) for k in table.index]
+        table = table.reset_index(drop=True)
+        table.insert(len(table.columns), "model_hash", hashes)
+        meta = file_metadata(table="results", model_hashes=dict(zip(keys, hashes)))
+        with TableWriter(self.fpath("results"), meta) as writer:
+            writer.write(table, **{vehicle_column: keys})
+
+        return writer.fpath
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+            log.info("Stored %s vehicles in %s.", writer.ngroups, writer.fpath)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_metadata(fpath: Union[str, Path]) -> dict:
+    """The `wltp` metadata of a columnar file, without reading its data."""
+    pa = _import_pyarrow()
+
+    if columnar_format(fpath) == "parquet":
+        import pyarrow.parquet as pq
+
+        schema = pq.read_schema(str(fpath))
+    else:
+        with pa.memory_map(str(fpath)) as source:
+            schema = pa.ipc.open_file(source).schema
+    meta = {
+        k.decode()[len("wltp_") :]: v.decode()
+        for k, v in (schema.metadata or {}).items()
+        if k.startswith(b"wltp_")
+    }
+    if "model_hashes" in meta:
+        meta["model_hashes"] = json.loads(meta["model_hashes"])
+
+    return meta
+
+
+def read_table(
+    fpath: Union[str, Path],
+    columns: Iterable[str] = None,
+    vehicles: Iterable[Hashable] = None,
+) -> pd.DataFrame:
+    """
+    Read some `columns` of some `vehicles` from a columnar file.
+
+    Only the row-groups of the `vehicles` are loaded from Parquet files
+    (by their statistics), and Arrow files are memory-mapped.
+
+    :param columns:
+        the columns to read, besides the `vehicle` one, or all if None
+    :param vehicles:
+        the keys of the vehicles to read, or all if None
+    """
+    _import_pyarrow()
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    if columns is not None:
+        columns = [vehicle_column, *(c for c in columns if c != vehicle_column)]
+    fmt = "parquet" if columnar_format(fpath) == "parquet" else "ipc"
+    filt = None
+    if vehicles is not None:
+        filt = ds.field(vehicle_column).isin([str(v) for v in vehicles])
+    filesystem = fs.LocalFileSystem(use_mmap=True)
+    dataset = ds.dataset(str(fpath), format=fmt, filesystem=filesystem)
+
+    return dataset.to_table(columns=columns, filter=filt).to_pandas()
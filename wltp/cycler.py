@@ -19,7 +19,16 @@
 import functools as fnt
 import itertools as itt
 import logging
-from typing import Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+from typing import (
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 import pandas as pd
@@ -168,36 +177,36 @@ def phase(cond):
 
         Adapted from: https://datascience.stackexchange.com/a/22105/79324
         """
-        grouper = (col.to_numpy() != col.shift().to_numpy()).cumsum()
-        # NOTE: git warns: pandas/core/indexes/base.py:2890: FutureWarning:
-        # elementwise comparison failed; returning scalar instead,
-        # but in the future will perform elementwise comparison
-        col &= col.groupby(grouper).transform("count").ge(self.phase_repeat_threshold)
+        flags = col.to_numpy(bool)
+        runs = inv.run_lengths(flags)
+        flags = flags & runs.expand(runs.lengths >= self.phase_repeat_threshold)
         if right_edge:
-            col |= col.shift()
-        return col
+            flags[1:] |= flags[:-1].copy()
+
+        return pd.Series(flags, index=col.index, name=col.name)
 
     @autog.autographed(
         needs=["phase_marker", "cycle/V", "cycle/accel_raw"], provides="cycle/initaccel"
     )
     def calc_phase_initaccel(self, V, accel):
         """.. jsonschema:: data-schema.yaml#/properties/cycle/properties/initaccel"""
+        ## Runs (of either accel or not) starting from standstill,
+        #  and moving on all other samples.
+        V_arr = np.asarray(V, dtype=float)
+        runs = inv.run_lengths(np.asarray(accel, dtype=bool))
+        moving = V_arr > 0
+        good_runs = (V_arr[runs.starts] == 0) & (
+            runs.count(moving) - moving[runs.starts] == runs.lengths - 1
+        )
+        good = runs.expand(good_runs)
 
-        def count_good_rows(group):
-            # print(group.index.min(),group.index.max(), (group[c_accel] & group[c_init]).any(None), '\n', group)
-            return (
-                group.count()
-                if (group.iloc[1:] > 0).all() and group.iloc[0] == 0
-                else 0
-            )
-
-        repeats_grouper = (accel.to_numpy() != accel.shift().to_numpy()).cumsum()
-        initaccel = V.groupby(repeats_grouper).transform(count_good_rows) > 0
-
-        ## Shift -1 for Annex 2-3.2, +1 for phase definitions @ 4.
-        initaccel |= initaccel.shift(-1) | initaccel.shift(1)
+        ## Shift -1 for Annex 2-3.2, +1 for phase definitions @ 4
+        #  (but not into the last sample, as when OR-ing pandas-shifts with NANs).
+        initaccel = good.copy()
+        initaccel[:-1] |= good[1:]
+        initaccel[1:-1] |= good[:-2]
 
-        return initaccel
+        return pd.Series(initaccel, index=V.index, name=V.name)
 
     @autog.autographed(
         needs=["phase_marker", "cycle/decel", "cycle/stop"],
@@ -205,15 +214,12 @@ def count_good_rows(group):
     )
     def calc_phase_stopdecel(self, decel, stop):
         """.. jsonschema:: data-schema.yaml#/properties/cycle/properties/stopdecel"""
+        decel_arr = np.asarray(decel, dtype=bool)
+        last_decel_sample_before_stop = decel_arr & np.asarray(stop, dtype=bool)
+        runs = inv.run_lengths(decel_arr)
+        stopdecel = runs.expand(runs.any(last_decel_sample_before_stop))
 
-        def count_good_rows(group):
-            return group.count() if (group & last_decel_sample_before_stop).any() else 0
-
-        last_decel_sample_before_stop = decel & stop
-        repeats_grouper = (decel.to_numpy() != decel.shift().to_numpy()).cumsum()
-        stopdecel = decel.groupby(repeats_grouper).transform(count_good_rows) > 0
-
-        return stopdecel
+        return pd.Series(stopdecel, index=decel.index, name=decel.name)
 
     @autog.autographed(
         needs=["phase_marker", "cycle/run", "cycle/accel_raw"], provides="cycle/accel"
@@ -565,7 +571,7 @@ def calc_OK_p(P_remain: pd.DataFrame, gidx: wio.GearMultiIndexer):
     c = wio.pstep_factory.get().cycle
 
     g3 = 3
-    OK_p = (P_remain >= 0).astype("int8")
+    OK_p = (P_remain.iloc[:, gidx.positions(slice(g3, None))] >= 0).astype("int8")
     OK_p.columns = gidx.with_item(c.OK_p)[g3:]
 
     return OK_p
@@ -661,6 +667,166 @@ def init_cycle_velocity(*velocities: Union[pd.Series, pd.DataFrame]) -> pd.DataF
     return cycle
 
 
+class ClassCycle(NamedTuple):
+    """
+    The vehicle-independent columns of a cycle, as cached by :func:`get_class_cycle()`.
+
+    Its arrays are read-only, shared by all vehicles running the same cycle;
+    use :meth:`frame()` to get a new (writable) cycle-dataframe from them.
+    """
+
+    #: the cache key, ``(wltc_class, f_dsc, v_cap, *phase-thresholds)``
+    key: tuple
+    #: as returned by :func:`.cycles.get_class_phase_boundaries()`
+    class_phase_boundaries: Tuple[Tuple[int, int], ...]
+    #: the time-index of the cycle
+    index: pd.Index
+    #: the column labels of the cycle
+    columns: pd.Index
+    #: one read-only array for each of the `columns`
+    arrays: Tuple[np.ndarray, ...]
+
+    def frame(self) -> pd.DataFrame:
+        """A new cycle-dataframe, with copies of the cached arrays. """
+        cycle = pd.DataFrame(dict(enumerate(self.arrays)), index=self.index, copy=True)
+        cycle.columns = self.columns
+
+        return cycle
+
+
+@fnt.lru_cache(maxsize=32)
+def _build_class_cycle(
+    wltc_class: str,
+    f_dsc: float,
+    v_cap: Optional[float],
+    f_running_threshold: float,
+    f_up_threshold: float,
+    phase_repeat_threshold: int,
+) -> ClassCycle:
+    from . import datamodel, downscale, pipelines
+
+    c = wio.pstep_factory.get().cycle
+
+    wltc_data = datamodel.get_wltc_data()
+    class_data = datamodel.get_class(wltc_class)
+    V = class_data["V_cycle"]
+
+    if f_dsc > 0:
+        V_dsc_raw = downscale.calc_V_dsc_raw(V, f_dsc, class_data["downscale"]["phases"])
+        V = inv.vround(V_dsc_raw)
+    if v_cap:
+        ## NOTE: not compensated for the lost distance, that would extend
+        #  the cycle beyond its class-phases.
+        V = downscale.calc_V_capped(V, v_cap)
+    V_target = V.copy()
+    V_target.name = c.v_target
+
+    inp = {
+        "wltc_data": wltc_data,
+        "wltc_class": wltc_class,
+        "V_compensated": V_target,
+        "f_running_threshold": f_running_threshold,
+        "f_up_threshold": f_up_threshold,
+        "phase_repeat_threshold": phase_repeat_threshold,
+    }
+    sol = pipelines.cycle_phases_pipeline().compute(inp)
+    cycle = sol["cycle"]
+
+    arrays = []
+    for _, col in cycle.items():
+        arr = col.to_numpy(copy=True)
+        arr.flags.writeable = False
+        arrays.append(arr)
+
+    key = (
+        wltc_class,
+        f_dsc,
+        v_cap,
+        f_running_threshold,
+        f_up_threshold,
+        phase_repeat_threshold,
+    )
+    return ClassCycle(
+        key,
+        tuple(sol["class_phase_boundaries"]),
+        cycle.index,
+        cycle.columns,
+        tuple(arrays),
+    )
+
+
+def get_class_cycle(
+    wltc_class: Union[str, int],
+    f_dsc: float = None,
+    v_cap: float = None,
+    *,
+    f_running_threshold: float = PhaseMarker.running_threshold,
+    f_up_threshold: float = PhaseMarker.up_threshold,
+    phase_repeat_threshold: int = PhaseMarker.phase_repeat_threshold,
+) -> ClassCycle:
+    """
+    Fetch from an LRU-cache (or build) the vehicle-independent columns of a cycle.
+
+    These are the class's velocity downscaled by `f_dsc` and clipped to `v_cap`,
+    its acceleration, class-phases and phase markers (up to ``cycle/up``),
+    as produced by :func:`~.pipelines.cycle_phases_pipeline()`;
+    most vehicles of a fleet share only a few of them.
+
+    :param wltc_class:
+        one of 'class1', ..., 'class3b' or its index 0,1, ... 3
+    :param f_dsc:
+        the downscale factor, if not null/0
+    :param v_cap:
+        the capping velocity, if > 0 (the lost distance is NOT compensated)
+    :return:
+        a :class:`ClassCycle` with read-only arrays;
+        the last 32 of them are kept (see ``_build_class_cycle.cache_info()``).
+
+    **Example:**
+
+    >>> cc = get_class_cycle("class3b", 0.05)
+    >>> cc is get_class_cycle(3, 0.05)
+    True
+    >>> cc.frame().shape
+    (1801, 17)
+    """
+    from . import datamodel
+
+    if isinstance(wltc_class, int):
+        wltc_class = datamodel.get_class_names()[wltc_class]
+
+    return _build_class_cycle(
+        wltc_class,
+        f_dsc or 0,
+        v_cap if v_cap and v_cap > 0 else None,
+        f_running_threshold,
+        f_up_threshold,
+        phase_repeat_threshold,
+    )
+
+
+@autog.autographed(
+    needs="class_cycle",
+    provides=[
+        sfxed("cycle", "init", "v_phases"),
+        implicit("cycle/t"),
+        implicit("cycle/V"),
+        implicit("cycle/A"),
+        implicit("cycle/va_phase"),
+        implicit("cycle/accel_raw"),
+        implicit("cycle/run"),
+        implicit("cycle/stop"),
+        implicit("cycle/decel"),
+        implicit("cycle/initaccel"),
+        implicit("cycle/stopdecel"),
+        implicit("cycle/up"),
+    ],
+)
+def init_cycle_from_class_cycle(class_cycle: ClassCycle) -> pd.DataFrame:
+    """Start the cycle from a cached :class:`ClassCycle`, instead of building its phases. """
+    return class_cycle.frame()
+
+
 @autog.autographed(
     needs=[
         sfxed("cycle", "init"),
@@ -1028,8 +1194,14 @@ def derrive_ok_n_flags(**ok_n_flags: Mapping[str, pd.DataFrame]):
     """
     c = wio.pstep_factory.get().cycle
 
-    flags = pd.concat(
-        ok_n_flags.values(), axis=1, keys=ok_n_flags.keys(), names=["item", "gear"]
+    ## NOTE: g2 flags are "shorter" series (split on `stopdecel`),
+    #  so fill their gaps with NANFLAGs, or else, NANs would OR as true.
+    flags = (
+        pd.concat(
+            ok_n_flags.values(), axis=1, keys=ok_n_flags.keys(), names=["item", "gear"]
+        )
+        .fillna(NANFLAG)
+        .astype("int8")
     )
     ok_n = flags.groupby(axis=1, level="gear").apply(_derrive_ok_n_flags)
     ok_n.columns = pd.MultiIndex.from_product(((c.OK_n,), ok_n.columns))
@@ -1116,6 +1288,224 @@ def calc_ok_gears(**flags):
     return final_ok
 
 
+def calc_gear_flags_arrays(
+    N: np.ndarray,
+    P_avail: np.ndarray,
+    P_req: np.ndarray,
+    run_phase: np.ndarray,
+    stop_phase: np.ndarray,
+    initaccel_phase: np.ndarray,
+    stopdecel_phase: np.ndarray,
+    up_phase: np.ndarray,
+    g_vmax: int,
+    n95_high: float,
+    n_max_cycle: float,
+    n_min_drive2_stopdecel: int,
+    n_min_drive2: int,
+    n_min_drive_up_start: int,
+) -> Mapping[str, np.ndarray]:
+    """
+    All "initial gear" flags of Annex 2 in one pass over contiguous ``(time, gear)`` arrays.
+
+    The same rules as :func:`calc_P_remain()`, :func:`calc_OK_p()`, :func:`calc_OK_max_n()`,
+    :func:`calc_OK_g0()`, :func:`calc_OK_min_n()`, :func:`derrive_ok_n_flags()` and
+    :func:`calc_ok_gears()`, without any dataframe slicing/concatenating in between.
+
+    :param N, P_avail:
+        2D float arrays ``(time, gear)`` for all gears ``g1...gN`` (``N >= 3``)
+    :param P_req, *_phase:
+        1D arrays ``(time,)``, with boolean phases
+    :return:
+        a dict with arrays keyed by item-names (see :func:`calc_gear_flags()`),
+        2D ``int8`` arrays for ``OK_p`` (``g3+``), ``OK_n`` (``g1+``) and ``OK_gear``
+        (``g0+``), 1D/2D booleans for the rest, and the 2D floats of ``P_remain``.
+    """
+    c = wio.pstep_factory.get().cycle
+
+    stopdecel = stopdecel_phase
+    initaccel = initaccel_phase
+    N_g2 = N[:, 1]
+    N_g3plus = N[:, 2:]
+
+    P_remain = np.nan_to_num(P_avail, nan=0.0) - np.nan_to_num(P_req, nan=1.0)[:, None]
+    ## (ok-p) rule
+    OK_p = P_remain[:, 2:] >= 0
+
+    ## (MAXn-1), (MAXn-a)  and (MAXn-b) rules
+    #  Special handling of g1 to accept also NANs in N.
+    OK_max_n = np.empty(N.shape, dtype=bool)
+    OK_max_n[:, 0] = np.nan_to_num(N[:, 0], nan=0.0) < n95_high
+    OK_max_n[:, 1 : g_vmax - 1] = N[:, 1 : g_vmax - 1] < n95_high
+    OK_max_n[:, g_vmax - 1 :] = N[:, g_vmax - 1 :] < n_max_cycle
+
+    ## Gear-0 rule
+    OK_g0 = (stopdecel & (N_g2 < n_min_drive2_stopdecel)) | (stop_phase & ~initaccel)
+
+    ## (MINn-ud/hc) rules
+    ok_g3plus = N_g3plus >= n_min_drive_up_start
+    ok_min_n_g3plus_ups = up_phase[:, None] & ok_g3plus
+    ok_min_n_g3plus_dns = ~up_phase[:, None] & ok_g3plus
+
+    ## Gear-2 rules (MINn-2ii) & (min-2iii), each on its own part of the cycle.
+    ok_min_n_g2_stopdecel = N_g2 >= n_min_drive2_stopdecel
+    ok_min_n_g2 = N_g2 >= n_min_drive2
+
+    ## Gear-1 rules (c_initaccel) & (c_a)
+    ok_min_n_g1_initaccel = initaccel
+    ok_min_n_g1 = ~initaccel & run_phase
+
+    ## OK_n: OK_max_n AND (any OR-ed min_n flags)
+    ok_min_n = np.empty(N.shape, dtype=bool)
+    ok_min_n[:, 0] = ok_min_n_g1 | ok_min_n_g1_initaccel
+    ok_min_n[:, 1] = np.where(stopdecel, ok_min_n_g2_stopdecel, ok_min_n_g2)
+    ok_min_n[:, 2:] = ok_min_n_g3plus_ups | ok_min_n_g3plus_dns
+    OK_n = OK_max_n & ok_min_n
+
+    ## OK_gear: g0 alone, OK_n for g1 & g2, and OK_n AND OK_p for the rest.
+    OK_gear = np.empty((N.shape[0], N.shape[1] + 1), dtype="int8")
+    OK_gear[:, 0] = OK_g0
+    OK_gear[:, 1:3] = OK_n[:, :2]
+    OK_gear[:, 3:] = OK_n[:, 2:] & OK_p
+
+    return {
+        c.P_remain: P_remain,
+        c.OK_p: OK_p.astype("int8"),
+        c.OK_max_n: OK_max_n,
+        c.OK_g0: OK_g0,
+        c.ok_min_n_g1: ok_min_n_g1,
+        c.ok_min_n_g1_initaccel: ok_min_n_g1_initaccel,
+        c.ok_min_n_g2: ok_min_n_g2,
+        c.ok_min_n_g2_stopdecel: ok_min_n_g2_stopdecel,
+        c.ok_min_n_g3plus_dns: ok_min_n_g3plus_dns,
+        c.ok_min_n_g3plus_ups: ok_min_n_g3plus_ups,
+        c.OK_n: OK_n.astype("int8"),
+        c.OK_gear: OK_gear,
+    }
+
+
+@autog.autographed(
+    needs=[
+        "cycle/n",
+        "cycle/p_avail",
+        "cycle/P_req",
+        "cycle/run",
+        "cycle/stop",
+        "cycle/initaccel",
+        "cycle/stopdecel",
+        "cycle/up",
+        ...,
+        ...,
+        ...,
+        ...,
+        ...,
+        ...,
+        ...,
+    ],
+    ## NOTE: graphtik h-concatenates them sorted by name.
+    provides=[
+        hcat("cycle/P_remain"),
+        hcat("cycle/OK_p"),
+        hcat("cycle/OK_max_n"),
+        hcat("cycle/OK_g0"),
+        hcat("cycle/ok_min_n_g1"),
+        hcat("cycle/ok_min_n_g1_initaccel"),
+        hcat("cycle/ok_min_n_g2"),
+        hcat("cycle/ok_min_n_g2_stopdecel"),
+        hcat("cycle/ok_min_n_g3plus_dns"),
+        hcat("cycle/ok_min_n_g3plus_ups"),
+        hcat("cycle/OK_n"),
+        hcat("cycle/OK_gear"),
+    ],
+)
+def calc_gear_flags(
+    N: pd.DataFrame,
+    P_avail: pd.DataFrame,
+    P_req: pd.Series,
+    run_phase: pd.Series,
+    stop_phase: pd.Series,
+    initaccel_phase: pd.Series,
+    stopdecel_phase: pd.Series,
+    up_phase: pd.Series,
+    gidx: wio.GearMultiIndexer,
+    g_vmax: int,
+    n95_high: float,
+    n_max_cycle: float,
+    n_min_drive2_stopdecel: int,
+    n_min_drive2: int,
+    n_min_drive_up_start: int,
+) -> Tuple[Union[pd.DataFrame, pd.Series], ...]:
+    """
+    The NumPy engine for all "initial gear" flags, see :func:`calc_gear_flags_arrays()`.
+
+    It replaces the ops from :func:`calc_P_remain()` up to :func:`calc_ok_gears()`
+    (see `flags_engine` in :func:`~.pipelines.cycler_pipeline()`),
+    labeling arrays as those ops do, only at the end.
+    """
+    c = wio.pstep_factory.get().cycle
+
+    assert all((g_vmax, n95_high, n_max_cycle)), (
+        "Null inputs:",
+        g_vmax,
+        n95_high,
+        n_max_cycle,
+    )
+
+    gears = gidx[:]
+    g0, g1, g2 = wio.gear_name(0), gidx[1], gidx[2]
+    gears_g3plus = gidx[3:]
+    index = N.index
+    stopdecel = stopdecel_phase.to_numpy(bool)
+    initaccel = initaccel_phase.to_numpy(bool)
+
+    flags = calc_gear_flags_arrays(
+        N.loc[:, gears].to_numpy(float),
+        P_avail.loc[:, gears].to_numpy(float),
+        P_req.to_numpy(float),
+        run_phase.to_numpy(bool),
+        stop_phase.to_numpy(bool),
+        initaccel,
+        stopdecel,
+        up_phase.to_numpy(bool),
+        g_vmax,
+        n95_high,
+        n_max_cycle,
+        n_min_drive2_stopdecel,
+        n_min_drive2,
+        n_min_drive_up_start,
+    )
+
+    def frame(item, gears):
+        return pd.DataFrame(
+            flags[item], index=index, columns=gidx.colidx_pairs(item, gears)
+        )
+
+    def series(item, gear, rows=slice(None)):
+        return pd.Series(flags[item][rows], index=index[rows], name=(item, gear))
+
+    OK_n = frame(c.OK_n, gears)
+    OK_n.columns.names = (None, None)
+    OK_gear = pd.DataFrame(
+        flags[c.OK_gear],
+        index=index,
+        columns=pd.MultiIndex.from_product(((c.OK_gear,), [g0, *gears])),
+    )
+
+    return (
+        frame(c.P_remain, gears),
+        frame(c.OK_p, gears_g3plus),
+        frame(c.OK_max_n, gears),
+        series(c.OK_g0, g0),
+        series(c.ok_min_n_g1, g1),
+        series(c.ok_min_n_g1_initaccel, g1),
+        series(c.ok_min_n_g2, g2, ~stopdecel),
+        series(c.ok_min_n_g2_stopdecel, g2, stopdecel),
+        frame(c.ok_min_n_g3plus_dns, gears_g3plus),
+        frame(c.ok_min_n_g3plus_ups, gears_g3plus),
+        OK_n,
+        OK_gear,
+    )
+
+
 @autog.autographed(
     needs=[..., "cycle/OK_gear"], provides=hcat("cycle/incrementing_gflags")
 )
@@ -1131,7 +1521,7 @@ def make_incrementing_gflags(gidx2: wio.GearMultiIndexer, ok_gear: pd.DataFrame)
     ## Convert False to NAN to identify samples without any gear
     #  (or else, it would be 0, which is used for g0).
     ret = ok_gear.replace([False, NANFLAG], np.NAN) * gids
-    ret.columns = gidx2.with_item(c.G_scala)[:]
+    ret.columns = gidx2.with_item(c.incrementing_gflags)[:]
 
     return ret
 
@@ -16,7 +16,19 @@
     >>> __name__ = "wltp.cycles"
 """
 import functools as fnt
-from typing import Iterable, Mapping, Optional, Sequence, Tuple, Union
+from pathlib import Path
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 import pandas as pd
@@ -29,17 +41,102 @@
 
 try:
     import importlib.resources as pkg_resources
+    from importlib.resources import as_file, files
 except ImportError:
-    # Try backported to PY<37 `importlib_resources`.
+    # Try backported to PY<39 `importlib_resources`.
     import importlib_resources as pkg_resources  # type: ignore
+    from importlib_resources import as_file, files  # type: ignore
+
+
+#: The dtype of packed velocity traces, in deci-km/h (as hashed by :func:`crc_velocity()`).
+packed_V_dtype = np.dtype("<i2")
 
 
 @fnt.lru_cache()
 def read_V_file(fname) -> Tuple[float, ...]:
-    """Parse textual files with cycle velocities."""
+    """
+    Parse textual files with cycle velocities.
+
+    The WLTC classes are loaded from their packed traces (see :func:`read_V_packed()`),
+    and their text-files are kept as the sources for :func:`pack_V_file()`.
+    """
     return tuple(float(n) for n in pkg_resources.read_text(__package__, fname).split())
 
 
+def pack_V_file(fname, out_dir=None) -> Path:
+    """
+    Convert a textual file with cycle velocities into a packed :file:`.npy` file.
+
+    Only for traces with :data:`~.invariants.v_decimals` precision,
+    like the WLTC classes (not the NEDC).
+
+    :param fname:
+        the text-file (e.g. ``V_class1.txt``) in this package
+    :param out_dir:
+        where to write the packed file, by default, next to this module
+    :return:
+        the path of the packed file written
+    """
+    from ..invariants import v_decimals, vround
+
+    V_ints = np.rint(vround(np.array(read_V_file(fname))) * 10 ** v_decimals)
+    out_fpath = Path(out_dir or Path(__file__).parent) / f"{Path(fname).stem}.npy"
+    np.save(out_fpath, V_ints.astype(packed_V_dtype), allow_pickle=False)
+
+    return out_fpath
+
+
+@fnt.lru_cache()
+def read_V_ints(name: str) -> np.ndarray:
+    """
+    Load a packed velocity trace (e.g. ``V_class1``) as read-only int16s.
+
+    The trace is read as a package resource, memory-mapped unless the package
+    is zipped, and when it is a WLTC class, its CRC32 is verified against
+    :func:`cycle_checksums()` (just once per process).
+
+    :raise ValueError:
+        if the packed trace has been corrupted
+    """
+    ## Zipped resources are extracted in temporary files, not to keep mapped.
+    mmap_mode = "r" if Path(__file__).parent.is_dir() else None
+    with as_file(files(__package__) / f"{name}.npy") as fpath:
+        V_ints = np.load(fpath, mmap_mode=mmap_mode, allow_pickle=False)
+    assert V_ints.dtype == packed_V_dtype, (fpath, V_ints.dtype)
+    V_ints.flags.writeable = False
+
+    wltc_class = name[2:]  # strip `V_` prefix
+    crcs = cycle_checksums(full=True)["CRC32", "cumulative", "V"]
+    if wltc_class in crcs.index.levels[0]:
+        from binascii import crc32
+
+        exp_crc = crcs.loc[wltc_class].iloc[-1]
+        crc = f"{crc32(V_ints):08X}"
+        if crc != exp_crc:
+            raise ValueError(
+                f"Corrupted velocity trace {fpath}: CRC32 {crc} != {exp_crc}"
+            )
+
+    return V_ints
+
+
+@fnt.lru_cache()
+def read_V_packed(name: str) -> np.ndarray:
+    """
+    The velocities (km/h) of a packed trace (e.g. ``V_class1``), see :func:`read_V_ints()`.
+
+    :return:
+        a read-only float array of this process, shared by all its calls
+        (the class-data series are built on copies of it, to stay modifiable)
+    """
+    from ..invariants import v_decimals
+
+    V = read_V_ints(name) / 10 ** v_decimals
+    V.flags.writeable = False
+
+    return V
+
+
 def crc_velocity(V: Iterable, crc: Union[int, str] = 0, full=False) -> str:
     """
     Compute the CRC32(V) of a 1Hz velocity trace, to be compared with :ref:`checksums`.
@@ -124,20 +221,15 @@ class	phase
         class3b	phase-4	F9621B4F	1A0A2845	517755EB	639BD037	0B7AD0EA	D3DFD78D	29714.9	83758.6
         """
     )
+    if not full:
+        ## Clip the (cached) full table, not to parse it twice.
+        df = cycle_checksums(full=True).copy()
+        df["CRC32"] = df["CRC32"].apply(lambda sr: sr.str[:4])
+        return df
+
     df = pd.read_csv(
         io.StringIO(table_csv), sep="\t", header=[0, 1, 2], index_col=[0, 1]
     )
-    if not full:
-
-        def clip_crc(sr):
-            try:
-                sr = sr.str[:4]
-            except AttributeError:
-                # AttributeError('Can only use .str accessor with string values...
-                pass
-            return sr
-
-        df = df.groupby(level="checksum", axis=1).transform(clip_crc)
 
     return df
 
@@ -178,10 +270,12 @@ def identify_cycle_v_crc(
     crc: Union[int, str]
 ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
     """The opposite of :func:`identify_cycle_v()`"""
+    ## Keep any leading zeros of full 32bit CRCs (e.g. 015B8365).
     if isinstance(crc, str):
-        crc = int(crc, 16)
-    crc = hex(crc).upper()
-    crc = crc[2:6]
+        crc = crc.zfill(8) if len(crc) > 4 else crc
+    else:
+        crc = f"{crc:08X}" if crc > 0xFFFF else f"{crc:04X}"
+    crc = crc.upper()[:4]
 
     crcs = cycle_checksums(full=False)["CRC32"]
     matches = crcs == crc
@@ -229,6 +323,145 @@ def identify_cycle_v(V: Iterable):
     return identify_cycle_v_crc(crc)
 
 
+class CycleMatch(NamedTuple):
+    """A class-cycle or phase found in a velocity stream, see :class:`CycleScanner`."""
+
+    #: the offset of the 1st sample of the match in the stream
+    start: int
+    #: the offset after the last sample, ie ``V[start:end]`` is the matched trace
+    end: int
+    #: the class (e.g. ``class3b``), like in :func:`identify_cycle_v()`
+    cycle: str
+    #: like in :func:`identify_cycle_v()`, None when a full cycle matched
+    phase: Optional[str]
+    #: one of ``V``, ``VA0``, ``VA1``
+    phasing: str
+
+
+@fnt.lru_cache()
+def _stream_targets() -> Dict[int, Tuple[np.ndarray, Dict[int, tuple]]]:
+    """
+    The phases of :func:`cycle_checksums()` by their length, for :class:`CycleScanner`.
+
+    :return:
+        ``{length: (sums, {crc: (cycle, phase, phasing)})}``,
+        where `sums` are the sorted unique sums of deci-km/h of that length,
+        and labels for the same trace are the 1st from the left-top of the table
+    """
+    import json
+
+    crcs = cycle_checksums(full=True)["CRC32"]
+    bounds = cycle_phases().applymap(lambda b: b and json.loads(b))
+
+    targets: Dict[int, Tuple[list, Dict[int, tuple]]] = {}
+    for cycle, phase in crcs.index:
+        V_ints = read_V_ints(f"V_{cycle}")
+        is_last = phase == crcs.loc[cycle].index[-1]
+        for accum, phasing in crcs.columns:
+            start, stop = bounds.loc[(cycle, phasing), phase]
+            if accum == "cumulative":
+                start = bounds.loc[(cycle, phasing), "phase-1"][0]
+                label = (cycle, None if is_last else phase.upper(), phasing)
+            else:
+                label = (cycle, phase, phasing)
+            trace = V_ints[start : stop + 1]
+            sums, labels = targets.setdefault(len(trace), ([], {}))
+            sums.append(trace.sum(dtype=np.int64))
+            crc = int(crcs.loc[(cycle, phase), (accum, phasing)], 16)
+            labels.setdefault(crc, label)
+
+    return {n: (np.unique(sums), labels) for n, (sums, labels) in targets.items()}
+
+
+class CycleScanner:
+    """
+    Find the class-cycles & phases of :func:`cycle_checksums()` in a long velocity stream.
+
+    The stream (e.g. a multi-hour log of a chassis-dyno with many runs & idlings)
+    is consumed in chunks by :meth:`feed()`, keeping just a tail of samples
+    as long as the longest cycle; the windows of each phase-length are filtered
+    by their rolling sums, and the CRC32 is computed only for those with the sum
+    of some phase, so it runs in a single linear pass with bounded memory
+    (chunks of thousands of samples amortize the re-summing of the tail).
+
+    **Example:**
+
+    >>> from wltp import datamodel
+    >>> V = datamodel.get_class_v_cycle("class2")
+    >>> scanner = CycleScanner()
+    >>> matches = scanner.feed([0] * 100) + scanner.feed(V) + scanner.feed([0] * 100)
+    >>> [m for m in matches if m.phasing == "V"]
+    [CycleMatch(start=100, end=690, cycle='class2', phase='phase-1', phasing='V'),
+     CycleMatch(start=689, end=1123, cycle='class2', phase='phase-2', phasing='V'),
+     CycleMatch(start=100, end=1123, cycle='class2', phase='PHASE-2', phasing='V'),
+     CycleMatch(start=1122, end=1578, cycle='class2', phase='phase-3', phasing='V'),
+     CycleMatch(start=100, end=1578, cycle='class2', phase='PHASE-3', phasing='V'),
+     CycleMatch(start=1577, end=1901, cycle='class2', phase='phase-4', phasing='V'),
+     CycleMatch(start=100, end=1901, cycle='class2', phase=None, phasing='V')]
+    """
+
+    def __init__(self):
+        #: the number of samples consumed so far
+        self.nsamples = 0
+        #: the deci-km/h of the last samples, as long as the longest phase - 1
+        self._tail = np.empty(0, dtype=np.int64)
+
+    def feed(self, V: Iterable) -> List[CycleMatch]:
+        """
+        Consume the next chunk of velocity samples.
+
+        :param V:
+            the next samples of the stream (km/h), NaNs never match
+        :return:
+            the matches ending within this chunk, ordered by their `end`
+            (and shorter ones first)
+        """
+        from binascii import crc32
+        from ..invariants import v_decimals, vround
+
+        V = np.asarray(V, dtype=float)
+        if not V.size:
+            return []
+        V_ints = np.rint(vround(V) * 10 ** v_decimals)
+        V_ints[np.isnan(V_ints)] = np.iinfo(packed_V_dtype).min
+        buf = np.concatenate((self._tail, V_ints.astype(np.int64)))
+        buf_start = self.nsamples - len(self._tail)
+        cumsums = np.concatenate(([0], buf.cumsum()))
+
+        matches = []
+        targets = _stream_targets()
+        for length, (sums, labels) in targets.items():
+            if length > len(buf):
+                continue
+            ## Windows ending in the new samples only.
+            first = max(0, len(self._tail) - length + 1)
+            wsums = cumsums[first + length :] - cumsums[first : len(buf) - length + 1]
+            for i in np.flatnonzero(np.isin(wsums, sums)):
+                start = first + i
+                trace = buf[start : start + length].astype(packed_V_dtype)
+                label = labels.get(crc32(trace))
+                if label:
+                    start += buf_start
+                    matches.append(CycleMatch(start, start + length, *label))
+
+        self.nsamples += len(V)
+        self._tail = buf[-(max(targets) - 1) :]
+
+        return sorted(matches, key=lambda m: (m.end, -m.start))
+
+
+def identify_cycle_v_stream(chunks: Iterable[Iterable]) -> Iterator[CycleMatch]:
+    """
+    Find the class-cycles & phases in a stream of velocity chunks, see :class:`CycleScanner`.
+
+    :param chunks:
+        an iterable of velocity arrays (e.g. from ``pd.read_csv(..., chunksize=...)``)
+    """
+    scanner = CycleScanner()
+    for V in chunks:
+        yield from scanner.feed(V)
+
+
 @autog.autographed(needs=["wltc_data/classes", ...])
 def get_wltc_class_data(wltc_classes: Mapping, wltc_class: Union[str, int]) -> dict:
     """
@@ -240,13 +473,19 @@ def get_wltc_class_data(wltc_classes: Mapping, wltc_class: Union[str, int]) -> d
         one of 'class1', ..., 'class3b' or its index 0,1, ... 3
 
     Like :func:`.datamodel.get_class` suited for pipelines.
+
+    The nested dicts are returned as (shallow) copies (see :func:`.datamodel.dict_nodes()`),
+    so that pipelines may evict their jsonp items even from a read-only
+    :class:`.datamodel.WltcData`.
     """
+    from ..datamodel import dict_nodes
+
     if isinstance(wltc_class, int):
         class_name = list(wltc_classes.keys())[wltc_class]
     else:
         class_name = wltc_class
 
-    return wltc_classes[class_name]
+    return dict_nodes(wltc_classes[class_name])
 
 
 @autog.autographed(needs=["wltc_class_data/lengths", "wltc_class_data/V_cycle"])
@@ -42,7 +42,9 @@ def class_data():
         },
         "checksum": 41139.6,
         "part_checksums": [11988.4, 17162.8, 11988.4],
-        "V_cycle": pd.Series(cycles.read_V_file("V_class1.txt"), name=c.V_cycle),
+        "V_cycle": pd.Series(
+            cycles.read_V_packed("V_class1"), name=c.V_cycle, copy=True
+        ),
     }
     data["V_cycle"].index.name = c.t
 
@@ -42,7 +42,9 @@ def class_data():
         },
         "checksum": 81536.9,
         "part_checksums": [11162.2, 17054.3, 24450.6],
-        "V_cycle": pd.Series(cycles.read_V_file("V_class2.txt"), name=c.V_cycle),
+        "V_cycle": pd.Series(
+            cycles.read_V_packed("V_class2"), name=c.V_cycle, copy=True
+        ),
     }
     data["V_cycle"].index.name = c.t
 
@@ -43,7 +43,9 @@ def class_data_a():
         },
         "checksum": 83496.9,
         "part_checksums": [11140.3, 16995.7, 25646.0, 29714.9],
-        "V_cycle": pd.Series(cycles.read_V_file("V_class3a.txt"), name=c.V_cycle),
+        "V_cycle": pd.Series(
+            cycles.read_V_packed("V_class3a"), name=c.V_cycle, copy=True
+        ),
     }
     data["V_cycle"].index.name = c.t
 
@@ -56,7 +58,7 @@ def class_data_b():
     """
     c = wio.pstep_factory.get().cycle
 
-    cycle = pd.Series(cycles.read_V_file("V_class3b.txt"), name=c.V_cycle)
+    cycle = pd.Series(cycles.read_V_packed("V_class3b"), name=c.V_cycle, copy=True)
     cycle.index.name = c.t
 
     data = class_data_a()
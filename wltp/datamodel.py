@@ -16,12 +16,14 @@
 
 import copy
 import functools as fnt
+import hashlib
 import itertools as itt
 import logging
 import operator as ops
+import weakref
 from collections import abc as cabc
 from textwrap import dedent
-from typing import Mapping
+from typing import Any, Iterator, Mapping, NamedTuple
 from typing import Sequence as Seq
 from typing import Tuple, Union
 
@@ -143,13 +145,16 @@ def upd_resistance_coeffs_regression_curves(mdl):
     return mdl
 
 
-def get_wltc_data():
+@fnt.lru_cache()
+def get_wltc_data() -> "WltcData":
     """The WLTC-data required to run an experiment (the class-cycles and their attributes)..
 
     Prefer to access wltc-data through :func:`get_class()`, or
     from :samp:`{datamodel}['wltc_data']`,
 
-    :return: a tree
+    :return:
+        the read-only tree shared by all models of this process
+        (use :meth:`WltcData.thaw()` for a modifiable copy)
     """
 
     ## See schemas for explanations.
@@ -163,7 +168,122 @@ def get_wltc_data():
         }
     }
 
-    return wltc_data
+    return intern_wltc_data(wltc_data)
+
+
+def _frozen(node):
+    if isinstance(node, _FrozenDict):
+        return node
+    if isinstance(node, pd.Series):
+        values = node.to_numpy(copy=True)
+        values.flags.writeable = False
+        return pd.Series(values, index=node.index, name=node.name)
+    if isinstance(node, ndarray):
+        node = node.copy()
+        node.flags.writeable = False
+        return node
+    if isinstance(node, cabc.Mapping) and not isinstance(node, NDFrame):
+        return _FrozenDict(node)
+    if isinstance(node, (list, tuple)):
+        return tuple(_frozen(i) for i in node)
+    return node
+
+
+def _thawed(node):
+    if isinstance(node, _FrozenDict):
+        return node.thaw()
+    if isinstance(node, (pd.Series, ndarray)):
+        return node.copy()
+    if isinstance(node, tuple):
+        return [_thawed(i) for i in node]
+    return node
+
+
+class _FrozenDict(cabc.Mapping):
+    """A read-only dict, for the nested nodes of :class:`WltcData`."""
+
+    __slots__ = ("_dict", "__weakref__")
+
+    def __init__(self, mapping: Mapping):
+        self._dict = {k: _frozen(v) for k, v in mapping.items()}
+
+    def __getitem__(self, key):
+        return self._dict[key]
+
+    def __iter__(self):
+        return iter(self._dict)
+
+    def __len__(self):
+        return len(self._dict)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._dict!r})"
+
+    def __reduce__(self):
+        return (type(self), (self._dict,))
+
+    def thaw(self) -> dict:
+        """A deep, modifiable copy (lists instead of tuples, series copied)."""
+        return {k: _thawed(v) for k, v in self._dict.items()}
+
+
+class WltcData(_FrozenDict):
+    """
+    A read-only `wltc_data` tree, interned by its contents (see :func:`intern_wltc_data()`).
+
+    All its nested dicts are read-only, lists become tuples, and arrays
+    or series are not writeable, so a single instance is shared by all models
+    of a process, and its checksum is computed just once.
+
+    The builtin instance of :func:`get_wltc_data()` pickles as a reference,
+    so that models sent to worker processes do not carry the cycles of all classes.
+    """
+
+    __slots__ = ("key",)
+
+    def __init__(self, wltc_data: Mapping, key: str = None):
+        super().__init__(wltc_data)
+        #: the :func:`tree_checksum()` of the contents
+        self.key = key or tree_checksum(self)
+
+    def __reduce__(self):
+        if self is get_wltc_data():
+            return (get_wltc_data, ())
+        return (intern_wltc_data, (self.thaw(),))
+
+
+#: The :class:`WltcData` of this process in use, by their :attr:`WltcData.key`.
+_interned_wltc_data: Mapping[str, WltcData] = weakref.WeakValueDictionary()
+
+
+def intern_wltc_data(wltc_data: Mapping) -> WltcData:
+    """
+    The single :class:`WltcData` of this process with the contents of `wltc_data`.
+
+    :param wltc_data:
+        a tree like :func:`get_wltc_data()` (e.g. a modified :meth:`WltcData.thaw()`)
+    """
+    if isinstance(wltc_data, WltcData):
+        return wltc_data
+
+    key = tree_checksum(wltc_data)
+    interned = _interned_wltc_data.get(key)
+    if interned is None:
+        interned = _interned_wltc_data[key] = WltcData(wltc_data, key)
+
+    return interned
+
+
+def dict_nodes(node):
+    """
+    Shallow, modifiable dict-copies of all nested mappings in `node` (e.g. a :class:`WltcData`).
+
+    Pipelines evict their jsonp items by deleting them from their parent-dicts,
+    which fails on read-only nodes; series & arrays are not copied.
+    """
+    if isinstance(node, cabc.Mapping) and not isinstance(node, NDFrame):
+        return {k: dict_nodes(v) for k, v in node.items()}
+    return node
 
 
 _model_url = "/data"
@@ -384,6 +504,8 @@ def merge(a, b, path=[]):
             elif av is bv:
                 continue  # same leaf value
             elif isinstance(av, cabc.Mapping):
+                if isinstance(av, _FrozenDict):
+                    av = a[key] = av.thaw()
                 merge(av, bv, path + [str(key)])
                 continue
         a[key] = bv
@@ -396,6 +518,17 @@ def merge(a, b, path=[]):
 # merge({1:{"a":"A"},2:{"b":"B"}}, {1:{"a":"A"},2:{"b":"C"}})
 
 
+def _referenced_schema(schema: Mapping) -> Mapping:
+    """
+    A `schema` to be `$ref`-erenced, without its ``$schema`` dialect.
+
+    Since *jsonschema-4*, a validator evolves into the plain class of any ``$schema``
+    it descends into, losing the types of :class:`PandelVisitor` (e.g. tuples
+    as arrays, any mappings as objects, like the read-only :class:`WltcData`).
+    """
+    return {k: v for k, v in schema.items() if k != "$schema"}
+
+
 @fnt.lru_cache()
 def model_validator(
     additional_properties=False, validate_wltc_data=False, validate_schema=False
@@ -405,7 +538,7 @@ def model_validator(
     #
     schema = _get_model_schema(additional_properties)
     wltc_schema = (
-        _get_wltc_schema() if validate_wltc_data else {}
+        _referenced_schema(_get_wltc_schema()) if validate_wltc_data else {}
     )  ## Do not supply wltc schema, for speedup.
     resolver = RefResolver(_model_url, schema, store={_wltc_url: wltc_schema})
 
@@ -445,6 +578,241 @@ def model_validator(
     return validator
 
 
+@fnt.lru_cache()
+def wltc_validator() -> PandelVisitor:
+    """A validator for the `wltc_data` tree alone (see :func:`yield_wltc_data_errors()`)."""
+    wltc_schema = _get_wltc_schema()
+    ## The wltc-schema references definitions in the model-schema.
+    resolver = RefResolver(
+        _wltc_url,
+        wltc_schema,
+        store={_model_url: _referenced_schema(_get_model_schema())},
+    )
+
+    return PandelVisitor(wltc_schema, resolver=resolver)
+
+
+def _update_checksum(h, node):
+    ## NOTE: pandas-objects are registered as Mappings by `pandalone`.
+    if isinstance(node, (NDFrame, ndarray)):
+        if isinstance(node, NDFrame):
+            ## NOTE: not their `repr()`, elided in the middle for long axes.
+            for axis in node.axes:
+                h.update(f"{axis.dtype}{axis.names}".encode())
+                _update_checksum(h, np.asarray(axis))
+            node = node.values
+        h.update(f"{node.dtype}{node.shape}".encode())
+        if node.dtype == object:  # bytes would be just pointers
+            for i in node.ravel():
+                _update_checksum(h, i)
+        else:
+            h.update(np.ascontiguousarray(node).tobytes())
+    elif isinstance(node, cabc.Mapping):
+        h.update(b"{")
+        for k in sorted(node, key=str):
+            h.update(str(k).encode())
+            _update_checksum(h, node[k])
+        h.update(b"}")
+    elif isinstance(node, (list, tuple)):
+        h.update(b"[")
+        for i in node:
+            _update_checksum(h, i)
+        h.update(b"]")
+    else:
+        h.update(repr(node).encode())
+
+
+def tree_checksum(tree) -> str:
+    """
+    A content-hash of a tree of dicts, lists & scalars, pandas or numpy objects.
+
+    :return:
+        the hex-digest (sha1) of the tree's keys (sorted), values & array-shapes
+
+    >>> tree_checksum({"a": [1, 2.0], "b": np.arange(3)})
+    '...'
+    >>> _ == tree_checksum({"b": np.arange(3), "a": [1, 2.0]})
+    True
+    """
+    h = hashlib.sha1()
+    _update_checksum(h, tree)
+
+    return h.hexdigest()
+
+
+def wltc_data_checksum(wltc_data) -> str:
+    """
+    The :func:`tree_checksum()` of a `wltc_data` tree, to avoid re-validating the same data.
+
+    >>> wltc_data_checksum(get_wltc_data()) == wltc_data_checksum(get_wltc_data().thaw())
+    True
+    """
+    if isinstance(wltc_data, WltcData):
+        return wltc_data.key
+    return tree_checksum(wltc_data)
+
+
+#: The checksums of `wltc_data` trees found valid by :func:`yield_wltc_data_errors()`.
+_valid_wltc_checksums: set = set()
+
+
+def yield_wltc_data_errors(wltc_data) -> Iterator[ValidationError]:
+    """
+    Validate the (immutable) `wltc_data` tree only the 1st time its contents are seen.
+
+    The :func:`wltc_data_checksum()` of trees found without errors are remembered,
+    and any tree with the same contents is not validated again.
+    """
+    checksum = wltc_data_checksum(wltc_data)
+    if checksum in _valid_wltc_checksums:
+        return
+
+    nerrors = 0
+    for err in wltc_validator().iter_errors(wltc_data):
+        nerrors += 1
+        err.path.appendleft("wltc_data")
+        yield err
+
+    if not nerrors:
+        _valid_wltc_checksums.add(checksum)
+
+
+class ItemShape(NamedTuple):
+    """What is checked by :func:`yield_trusted_errors()` for a model-item."""
+
+    #: the json-schema types allowed for the item, or empty for any type
+    types: Tuple[str, ...]
+    #: the dimensions expected if the item is an array, or 0 if not known
+    ndim: int
+    #: whether the schema provides a :attr:`default`
+    has_default: bool
+    default: Any
+
+
+def _resolve_subschema(subschema: Mapping, definitions: Mapping) -> Mapping:
+    ref = subschema.get("$ref", "")
+    if ref.startswith("#/definitions/"):
+        return definitions[ref[len("#/definitions/") :]]
+    return subschema
+
+
+def _schema_types(subschema: Mapping) -> Tuple[str, ...]:
+    types = subschema.get("type", ())
+    return (types,) if isinstance(types, str) else tuple(types)
+
+
+@fnt.lru_cache()
+def model_item_shapes() -> Mapping[str, ItemShape]:
+    """
+    The model-schema "compiled" once into the :class:`ItemShape` of each model-item.
+
+    .. Warning::
+      Do not modify, or they will affect all future operations
+    """
+    schema = _get_model_schema()
+    definitions = schema.get("definitions", {})
+
+    def array_ndim(subschema):
+        ndim = 0
+        while "array" in _schema_types(subschema):
+            ndim += 1
+            items = subschema.get("items")
+            if not isinstance(items, cabc.Mapping):
+                break
+            subschema = _resolve_subschema(items, definitions)
+        return ndim
+
+    shapes = {}
+    for prop, subschema in schema["properties"].items():
+        subschema = _resolve_subschema(subschema, definitions)
+        shapes[prop] = ItemShape(
+            _schema_types(subschema),
+            array_ndim(subschema),
+            "default" in subschema,
+            subschema.get("default"),
+        )
+
+    return shapes
+
+
+def _is_null(value) -> bool:
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def _item_type_matches(value, typ: str, ndim: int) -> bool:
+    if typ == "number":
+        return isinstance(value, (int, float, np.number)) and not isinstance(
+            value, (bool, np.bool_)
+        )
+    if typ == "integer":
+        return isinstance(value, (int, np.integer)) and not isinstance(value, bool)
+    if typ == "string":
+        return isinstance(value, str)
+    if typ == "boolean":
+        return isinstance(value, (bool, np.bool_))
+    if typ == "null":
+        return _is_null(value)
+    if typ == "object":
+        return isinstance(value, (cabc.Mapping, pd.DataFrame))
+    if typ == "array":
+        if not isinstance(value, (list, tuple, ndarray, pd.Series)):
+            return False
+        if not ndim:
+            return True
+        try:
+            return np.ndim(value) == ndim
+        except ValueError:  # ragged lists
+            return False
+
+    return True  # unknown types not checked
+
+
+def yield_trusted_errors(mdl, additional_properties=False) -> Iterator[ValidationError]:
+    """
+    The fast-path of :func:`validate_model()` for trusted (pre-validated) models.
+
+    Like the full validation, it removes nulls and applies any schema defaults,
+    but then checks just the types of scalars and the dimensions of arrays
+    for the items in the :func:`model_item_shapes()`, skipping any limits,
+    enums or nested structures, and the `wltc_data`.
+    """
+    if not isinstance(mdl, cabc.Mapping):
+        yield ValidationError(f"{mdl!r} is not of type 'object'")
+        return
+
+    shapes = model_item_shapes()
+    for prop, shape in shapes.items():
+        types = shape.types
+        if prop in mdl:
+            if not _is_null(mdl[prop]) or "null" in types:
+                continue
+            if not shape.has_default:
+                del mdl[prop]
+                continue
+        if shape.has_default:
+            mdl[prop] = copy.deepcopy(shape.default)
+
+    for prop in _get_model_schema()["required"]:
+        if prop not in mdl:
+            yield ValidationError(f"{prop!r} is a required property")
+
+    for prop, value in mdl.items():
+        shape = shapes.get(prop)
+        if shape is None:
+            if not additional_properties:
+                yield ValidationError(
+                    f"Additional properties are not allowed ({prop!r} was unexpected)"
+                )
+            continue
+        if prop == "wltc_data" or not shape.types:
+            continue
+        if not any(_item_type_matches(value, t, shape.ndim) for t in shape.types):
+            expected = (
+                f"{shape.ndim}-D array" if shape.types == ("array",) else shape.types
+            )
+            yield ValidationError(f"{prop}: {value!r} is not of type {expected}")
+
+
 ## TODO: drop yield-error method, locality of errors is lost on debug.
 def validate_model(
     mdl,
@@ -452,9 +820,18 @@ def validate_model(
     iter_errors=False,
     validate_wltc_data=False,
     validate_schema=False,
+    trusted=False,
 ):
     """
     :param bool iter_errors: does not fail, but returns a generator of ValidationErrors
+    :param validate_wltc_data:
+        when true, validates also the `wltc_data`, but only the 1st time
+        its contents are seen (see :func:`yield_wltc_data_errors()`)
+    :param trusted:
+        when true, skip the full json-schema validation, and check only
+        the scalar-types & array-dimensions (see :func:`yield_trusted_errors()`),
+        and not the values of the `wot`;
+        meant for bulk-runs of models already validated
 
     >>> validate_model(None)
     Traceback (most recent call last):
@@ -486,14 +863,18 @@ def validate_model(
     []
     """
 
-    validator = model_validator(
-        additional_properties=additional_properties,
-        validate_wltc_data=validate_wltc_data,
-    )
+    if trusted:
+        schema_errors = yield_trusted_errors(mdl, additional_properties)
+    else:
+        validator = model_validator(additional_properties=additional_properties)
+        schema_errors = validator.iter_errors(mdl)
     validators = [
-        validator.iter_errors(mdl),
+        schema_errors,
+        yield_wltc_data_errors(mdl["wltc_data"])
+        if validate_wltc_data and isinstance(mdl, cabc.Mapping) and "wltc_data" in mdl
+        else None,
         yield_n_min_errors(mdl),
-        yield_load_curve_errors(mdl),
+        yield_load_curve_errors(mdl, validate_wot=not trusted),
     ]
     errors = itt.chain(*[v for v in validators if not v is None])
 
@@ -504,7 +885,10 @@ def validate_model(
             raise error
 
 
-def yield_load_curve_errors(mdl):
+def yield_load_curve_errors(mdl, validate_wot=True):
+    """
+    Parse & normalize the `wot` in-place, validating its values if `validate_wot` true.
+    """
     d = wio.pstep_factory.get()
 
     wot = mdl.get("wot")
@@ -534,6 +918,9 @@ def yield_load_curve_errors(mdl):
         yield ValidationError(f"Failed (de)normalizing wot due to: {ex}")
         return
 
+    if not validate_wot:
+        return
+
     n_min_drive_set = mdl.get(d.n_min_drive_set)
     for err in engine.validate_wot(wot, n_idle, n_rated, p_rated, n_min_drive_set):
         raise err
@@ -541,24 +928,24 @@ def yield_load_curve_errors(mdl):
 
 def yield_n_min_errors(mdl):
     """
+    Validate & fill-in the *n_min_drives* with :func:`.nmindrive.n_min_drives_from_model()`.
+
     .. TODO:
       Validate min(Nwot) <= n_min_drive_set.
     """
     d = wio.pstep_factory.get()
-    # g = wio.pstep_factory.get().gears
 
-    if not mdl.get(d.n_rated) or not mdl.get(d.n_rated):
+    if not mdl.get(d.n_rated) or not mdl.get(d.n_idle):
         # Bail out, jsonschema errors already reported.
         return
 
-    # sol = mdl_2_n_min_drives.compute(mdl2, "n_min_drives")
-    sol = nmindrive.mdl_2_n_min_drives.compute(mdl)
-    err = sol.check_if_incomplete()
-    if err:
-        yield err
-    nmins = sol["n_min_drives"]
+    nmins = nmindrive.n_min_drives_from_model(mdl)
+    errors = nmins.vehicle_errors(0)
+    if errors:
+        yield from errors
+        return
 
-    for k, v in nmins._asdict().items():
+    for k, v in nmins.vehicle(0)._asdict().items():
         mdl[k] = v
 
 
@@ -51,7 +51,9 @@ def calc_f_dsc_raw(
     """
     Check if downscaling required, and apply it.
 
-    :return: (float) the factor
+    :return:
+        (float) the factor, or an array of them if any of the vehicle-params
+        are arrays (e.g. for the points of :func:`.sweep.sweep()`)
 
     @see: Annex 1-7, p 68
     """
@@ -68,6 +70,8 @@ def calc_f_dsc_raw(
 
     (r0, a1, b1) = wltc_dsc_coeffs
 
+    if np.ndim(r_max):
+        return np.where(r_max >= r0, a1 * r_max + b1, 0)
     if r_max >= r0:
         f_dsc = a1 * r_max + b1
     else:
@@ -81,8 +85,12 @@ def calc_f_dsc(f_dsc_raw: float, f_dsc_threshold: float, f_dsc_decimals,) -> flo
     ATTENTION: by the spec, f_dsc MUST be > 0.01 to apply, but
     in :file:`F_new_vehicle.form.txt:(3537, 3563, 3589)` a +0.5 is ADDED!
     (see CHANGES.rst)
+
+    Accepts also an array of `f_dsc_raw` (see :func:`calc_f_dsc_raw()`).
     """
     f_dsc = inv.round1(f_dsc_raw, f_dsc_decimals)
+    if np.ndim(f_dsc):
+        return np.where(f_dsc <= f_dsc_threshold, 0, f_dsc)
     return 0 if f_dsc <= f_dsc_threshold else f_dsc
 
 
@@ -190,6 +198,79 @@ def downscale_by_scaling(V: pd.Series, f_dsc, phases) -> pd.Series:
     return V_DSC
 
 
+def downscale_by_scaling_batch(V, f_dscs, phases) -> np.ndarray:
+    """
+    Like :func:`downscale_by_scaling()`, for many `f_dsc` at once.
+
+    :param V:
+        the class velocity profile (series or array, indexed by seconds from 0)
+    :param f_dscs:
+        a vector of N downscaling factors
+    :return:
+        a ``(N, len(V))`` float array, not-rounded, each row bit-identical
+        to the same-`f_dsc` result of :func:`downscale_by_scaling()`
+    """
+    V = np.asarray(V, dtype=float)
+    f_dscs = np.asarray(f_dscs, dtype=float).reshape(-1, 1)
+    (t0, t1, t2) = phases
+    f_scale = 1 - f_dscs
+
+    V_DSC = np.repeat(V[None, :], len(f_dscs), axis=0)
+
+    ## UP-phase, tip included: [start, tip]
+    #
+    up_offset = V[t0]
+    V_DSC[:, t0 : t1 + 1] = up_offset + f_scale * (V[t0 : t1 + 1] - up_offset)
+
+    ## DOWN-phase: [tip+1, end]
+    #
+    dn_offset = V[t2]
+    f_corr = (V_DSC[:, t1 : t1 + 1] - dn_offset) / (V[t1] - dn_offset)
+    V_DSC[:, t1 + 1 : t2 + 1] = dn_offset + f_corr * (V[t1 + 1 : t2 + 1] - dn_offset)
+
+    ## Invariants asserted by the scalar function.
+    #
+    assert (V_DSC[:, t0] == V[t0]).all() and (V_DSC[:, t2] == V[t2]).all(), (
+        f"Invariant start/end violation for f_dsc: "
+        f"{f_dscs[(V_DSC[:, t0] != V[t0]) | (V_DSC[:, t2] != V[t2]), 0]}"
+    )
+    bad_tips = f_scale[:, 0] * abs(V_DSC[:, t1 + 1] - V_DSC[:, t1]) > abs(
+        V[t1 + 1] - V[t1]
+    )
+    assert not bad_tips.any(), f"Smooth-tip violation for f_dsc: {f_dscs[bad_tips, 0]}"
+
+    return V_DSC
+
+
+def calc_V_dsc_batch(v_class, f_dscs, dsc_phases) -> np.ndarray:
+    """
+    Downscale & round the velocity profile by many `f_dsc` values, e.g. for fleets & sweeps.
+
+    :param v_class:
+        the class velocity profile (series or array, indexed by seconds from 0)
+    :param f_dscs:
+        a vector of N downscaling factors; zeros reproduce `v_class`
+    :return:
+        a ``(N, len(v_class))`` array, each row equal to the `V_dsc` of
+        :func:`calc_V_dsc_raw()` rounded with :func:`.invariants.vround()`
+
+    Example::
+
+        >>> from wltp import datamodel
+        >>> cd = datamodel.get_class("class3b")
+        >>> V_dscs = calc_V_dsc_batch(cd["V_cycle"], [0, 0.05], cd["downscale"]["phases"])
+        >>> V_dscs.shape
+        (2, 1801)
+        >>> V_dscs[:, 1724]
+        array([131.3, 127.7])
+    """
+    f_dscs = np.asarray(f_dscs, dtype=float)
+    V_dscs = inv.vround(downscale_by_scaling_batch(v_class, f_dscs, dsc_phases))
+    V_dscs[f_dscs == 0] = np.asarray(v_class, dtype=float)
+
+    return V_dscs
+
+
 round_calc_V_dsc = operation(
     inv.vround, name="round_calc_V_dsc", needs="V_dsc_raw", provides="V_dsc"
 )
@@ -253,12 +334,72 @@ def round_compensate_phases_t_extra(
     return inv.asint(inv.round1(compensate_phases_t_extra_raw))
 
 
+def compensate_capped(
+    V_dsc, V_capped, compensate_phases_t_extra, class_phase_boundaries
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Insert all extra `v_cap` samples of the phases at once, at their 1st capped sample.
+
+    :param V_dsc:
+        compared against `V_capped` to discover capped samples
+    :param V_capped:
+        the trace to compensate (array or series, in any units)
+    :param compensate_phases_t_extra:
+        the # of samples to insert in each phase; phases without capped samples
+        have nowhere to insert them, so their extras are dropped (with a warning)
+    :param class_phase_boundaries:
+        the ``[low, high)`` pairs of the phases, the last `high` being
+        the last sample of the traces, which is not in any phase
+    :return:
+        the compensated trace (its last sample replaced by a 0, like the phasing `VA0`),
+        and the boundaries shifted by the samples inserted, as an ``(N, 2)`` int-array
+
+    Example::
+
+        >>> V_dsc = np.array([0, 5, 7, 5, 0, 6, 8, 0, 0])
+        >>> V, bounds = compensate_capped(V_dsc, np.minimum(V_dsc, 6), [1, 2], [(0, 4), (4, 8)])
+        >>> V
+        array([0, 5, 6, 6, 5, 0, 6, 6, 6, 6, 0, 0])
+        >>> bounds.tolist()
+        [[0, 5], [5, 11]]
+    """
+    V_dsc = np.asarray(V_dsc)
+    V_capped = np.asarray(V_capped)
+    t_extra = np.asarray(compensate_phases_t_extra, dtype=int)
+    bounds = np.asarray(class_phase_boundaries, dtype=int)
+    t_end = bounds[-1, -1]
+
+    ## The 1st capped sample of each phase, from the phases of all capped samples.
+    #
+    capped_ix = np.flatnonzero(V_dsc[:t_end] != V_capped[:t_end])
+    capped_phases = np.searchsorted(bounds[:, 1], capped_ix, side="right")
+    phases, first_ix = np.unique(capped_phases, return_index=True)
+    inserted = np.zeros_like(t_extra)
+    inserted[phases] = t_extra[phases]
+    if (inserted != t_extra).any():
+        log.warning(
+            "Dropped extra-samples %s of phases without capped samples.",
+            np.where(inserted != t_extra, t_extra, 0).tolist(),
+        )
+    positions = np.repeat(capped_ix[first_ix], inserted[phases])
+
+    V = np.append(V_capped[:t_end], 0)
+    V = np.insert(V, positions, V_capped[positions])
+
+    ## Phases start after the extra samples of the previous phases,
+    #  and end after their own.
+    shifts = np.cumsum(inserted)
+    bounds = bounds + np.column_stack([np.r_[0, shifts[:-1]], shifts])
+
+    return V, bounds
+
+
 def calc_V_compensated(
     v_cap,
     V_dsc: pd.Series,
     V_capped: pd.Series,
     compensate_phases_t_extra,
-    class_phases_grouper,
+    class_phase_boundaries,
 ) -> pd.Series:
     """
     Equalize capped-cycle distance to downscaled one.
@@ -271,55 +412,39 @@ def calc_V_compensated(
         needed just for verification,
 
     :return:
-        the compensated `V_capped`, same name & index
+        the compensated `V_capped`, indexed from 0
 
         .. Note::
             Cutting corners by grouping phases like `VA0`, so an extra 0 needed
             at the end when constructing the compensated trace.
+
+    See :func:`compensate_capped()`.
     """
     diffs = V_dsc != V_capped
     if not diffs.any():
         return V_capped
 
-    def compensate_phase(V, diffs, extra_steps):
-        if not diffs.any():
-            return (V,)
-
-        t = diffs.idxmax()  # capping start time to split_and_extend
-        assert V[t] == v_cap, (
-            f"`V_capped` missmatch `v_cap`@t={t}: " f"{V[t]} != {v_cap}!\n  {locals()}"
-        )
-
-        # Need to slice 1st piece with open-right, but only `iloc` does that
-        # (https://stackoverflow.com/a/45523811/548792)
-        ti = V.index.get_loc(t)
-        head = V.iloc[:ti]
-        tail = V.loc[t:]
-        wedge = [v_cap] * extra_steps
-        return head, wedge, tail
-
-    df = pd.concat((V_capped, diffs), axis=1)
-    parts = []
-    for extra_steps, (_, phase) in zip(
-        compensate_phases_t_extra, df.groupby(class_phases_grouper)
-    ):
-        V, diffs = phase.iloc[:, 0], phase.iloc[:, 1]
-        parts += compensate_phase(V, diffs, extra_steps)
-    parts.append([0])  # convert A0 -1 length => full length
+    V_compensated, _ = compensate_capped(
+        V_dsc, V_capped, compensate_phases_t_extra, class_phase_boundaries
+    )
+    V_capped_diffs = V_capped[diffs]
+    assert (V_capped_diffs == v_cap).all(), (
+        f"`V_capped` missmatch `v_cap`({v_cap}):\n{V_capped_diffs[V_capped_diffs != v_cap]}"
+    )
 
     # Assuming 1Hz, t0=0.
-    V_compensated = pd.Series(np.hstack(parts))
-
-    return V_compensated
+    return pd.Series(V_compensated)
 
 
 def make_compensated_phase_boundaries(
-    class_phase_boundaries, compensate_phases_t_extra
+    V_dsc, V_capped, compensate_phases_t_extra, class_phase_boundaries
 ) -> List[Tuple[int, int]]:
-    extra_t = compensate_phases_t_extra.cumsum()
-    return [
-        (a + extra_a, b + extra_b)
-        for (a, b), extra_a, extra_b in zip(
-            class_phase_boundaries, extra_t.shift(0, fill_value=0), extra_t
-        )
-    ]
+    """
+    The phase-boundaries of :func:`calc_V_compensated()`, shifted by its extra samples.
+
+    See :func:`compensate_capped()`.
+    """
+    _, bounds = compensate_capped(
+        V_dsc, V_capped, compensate_phases_t_extra, class_phase_boundaries
+    )
+    return [tuple(i) for i in bounds.tolist()]
@@ -8,12 +8,11 @@
 """formulae for engine power & revolutions and gear-box"""
 import logging
 from collections.abc import Mapping
-from typing import Optional, Tuple
+from typing import NamedTuple, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
 from jsonschema import ValidationError
-from scipy import interpolate
 
 from graphtik import implicit, optional, sfx, sfxed
 
@@ -272,75 +271,217 @@ def _make_v_grid(v_wot_min: float, v_wot_max: float) -> np.ndarray:
     return V_grid
 
 
-@autog.autographed(provides="gwots")
-def interpolate_wot_on_v_grid(wot: pd.DataFrame, n2v_ratios) -> pd.DataFrame:
+class GridWots(NamedTuple):
     """
-    Return a new linearly interpolated df on v with inv.v_decimals.
-
-    :param df:
-        A df containing at least `n` (in RPM); any other column gets interpolated.
-
-        .. Attention::
-            Do not include non-linear columns (e.g. p_resistances(v^2))
-            because those interpolated values would be highly inaccurate!
-
-    :return:
-        the wot interpolated on a v-grid accommodating all gears
-        with 2-level columns (item, gear)
-
+    The grid-wots of many vehicles in a dense array, see :func:`interpolate_wots_on_v_grid()`.
     """
+
+    #: the (common) v-grid of all vehicles, the longest of them
+    V_grid: np.ndarray
+    #: the wot-columns interpolated, in the order of the last axis of :attr:`values`
+    items: Tuple[str, ...]
+    #: floats shaped ``(vehicle, gear, v_grid, item)``, NAN-padded for missing gears
+    #: and beyond the v-grid end of each vehicle
+    values: np.ndarray
+    #: the number of gears of each vehicle
+    ngears: np.ndarray
+    #: the length of the v-grid of each vehicle
+    nvs: np.ndarray
+
+    def frame(self, i: int) -> pd.DataFrame:
+        """
+        View the `gwots` of the `i`-th vehicle as :func:`interpolate_wot_on_v_grid()` returns it.
+
+        :return:
+            a df indexed by the vehicle's v-grid, with 2-level columns (item, gear)
+        """
+        w = wio.pstep_factory.get().wot
+
+        ng, nv = self.ngears[i], self.nvs[i]
+        ## (gear, v, item) --> (v, gear * item)
+        values = self.values[i, :ng, :nv, :].transpose(1, 0, 2).reshape(nv, -1)
+        gears = [wio.gear_name(g) for g in range(1, ng + 1)]
+        columns = pd.MultiIndex.from_product(
+            (gears, self.items), names=["gear", "item"]
+        ).swaplevel()
+        index = pd.Index(self.V_grid[:nv], name=w.v)
+
+        return pd.DataFrame(values, index=index, columns=columns)
+
+
+def _check_wot_n2vs(wot: pd.DataFrame, n2v_ratios) -> float:
+    """:return: the max `v` reached in the top gear"""
     w = wio.pstep_factory.get().wot
 
     assert wot.size, ("Empty WOT!", wot)
     assert np.all(np.diff(n2v_ratios) < 0), ("Unsorted N2Vs?", n2v_ratios)
 
-    N = wot[w.n]
-    n_wot_max = N.max()
+    n_wot_max = wot[w.n].max()
     v_wot_max = n_wot_max / n2v_ratios[-1]
-    v_wot_min = 0.1
-    assert v_wot_min < v_wot_max, f"Bad N? {v_wot_min}, {v_wot_max}\n{wot}"
+    assert _v_wot_min < v_wot_max, f"Bad N? {_v_wot_min}, {v_wot_max}\n{wot}"
 
-    V_grid = _make_v_grid(v_wot_min, v_wot_max)
+    return v_wot_max
 
-    def interpolate_gear_wot(wot, n2v):
-        V = N / n2v
 
-        def interp(C):
-            if C.name == w.n:
-                # NOTE that `n_norm` remains undefined for N < n_idle.
-                C_grid = V_grid * n2v
-            else:
-                C_grid = interpolate.interp1d(
-                    V,
-                    C,
-                    copy=False,
-                    assume_sorted=True,
-                    fill_value=np.NAN,
-                    bounds_error=False,
-                )(V_grid)
+def _interp_columns(x: np.ndarray, xp: np.ndarray, fp: np.ndarray, out: np.ndarray):
+    """
+    Like :func:`np.interp()` for all `fp` columns at once, NANs outside `xp`.
+
+    Like :class:`scipy.interpolate.interp1d` (which calls :func:`np.interp()`)
+    filling NANs outside the `xp` range; the segment-indices of `x` are searched once,
+    and the slopes & values of all columns gathered in one indexing operation,
+    with the arithmetic of :func:`np.interp()` (so identical results).
+
+    :param x:
+        the increasing x-coordinates to interpolate at
+    :param xp:
+        the increasing x-coordinates of the `fp` points
+    :param fp:
+        the 2D (point, column) y-coordinates
+    :param out:
+        the 2D (x, column) array to fill
+
+    >>> out = np.empty((4, 2))
+    >>> x, xp = np.array([0.5, 1, 2, 2.5]), np.array([0, 1, 2])
+    >>> _interp_columns(x, xp, np.eye(3)[:, :2], out)
+    >>> out
+    array([[0.5, 0.5],
+           [0. , 1. ],
+           [0. , 0. ],
+           [nan, nan]])
+    """
+    lo = np.searchsorted(x, xp[0], side="left")
+    hi = np.searchsorted(x, xp[-1], side="right")
+    out[:lo] = np.NAN
+    out[hi:] = np.NAN
+    if hi <= lo:
+        return
+    x = x[lo:hi]
+    y = out[lo:hi]
+
+    ## :func:`np.interp()` finds the `j` with ``xp[j] <= x < xp[j+1]``.
+    j = np.searchsorted(xp, x, side="right") - 1
+    np.clip(j, 0, len(xp) - 2, out=j)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slopes = np.diff(fp, axis=0) / np.diff(xp)[:, None]
+        slope = slopes[j]
+        y0 = fp[j]
+        np.multiply(slope, (x - xp[j])[:, None], out=y)
+        y += y0
+        if not np.isfinite(slopes).all():
+            ## If we get nan in one direction, try the other (like numpy).
+            y1 = fp[j + 1]
+            nans = np.isnan(y)
+            y[nans] = (slope * (x - xp[j + 1])[:, None] + y1)[nans]
+            nans = np.isnan(y) & (y0 == y1)
+            y[nans] = y0[nans]
+            at_knot = x == xp[j]
+            y[at_knot] = y0[at_knot]
+    if x[-1] == xp[-1]:
+        y[-1] = fp[-1]
+
+
+#: The start of the v-grid of all wots.
+_v_wot_min = 0.1
+
+
+def interpolate_wots_on_v_grid(
+    wots: Sequence[pd.DataFrame], n2v_ratios: Sequence[Sequence[float]]
+) -> GridWots:
+    """
+    Linearly interpolate the wots of many vehicles on a common v-grid, all at once.
 
-            return C_grid
+    Each vehicle's v-grid starts from the same `v` with the same step,
+    so it is a prefix of the longest one, which is shared by all vehicles.
 
-        wot_grid = pd.DataFrame({name: interp(vals) for name, vals in wot.iteritems()})
-        wot_grid.index = V_grid
-        wot_grid.index.name = w.v
+    :param wots:
+        a wot-df for each vehicle (see :func:`interpolate_wot_on_v_grid()`),
+        all with the same columns, including `n` (in RPM)
+    :param n2v_ratios:
+        the gear-ratios for each vehicle (may have different number of gears)
+    :return:
+        a :class:`GridWots` with the ``(vehicle, gear, v_grid, item)`` values
+        equal to those of :func:`interpolate_wot_on_v_grid()` for each vehicle
+
+    **Example:**
+
+    >>> wot = pd.DataFrame({"n": [500, 3000, 6000], "p": [5, 40, 80]})
+    >>> gw = interpolate_wots_on_v_grid([wot, wot], [[100, 50, 30], [120, 60]])
+    >>> gw.values.shape
+    (2, 3, 2000, 2)
+    >>> gw.nvs, gw.ngears
+    (array([2000, 1000]), array([3, 2]))
+    >>> gw.frame(1).iloc[[0, -1]]
+    item         n   p       n     p
+    gear        g1  g1      g2    g2
+    v
+    0.1       12.0 NaN     6.0   NaN
+    100.0  12000.0 NaN  6000.0  80.0
+    """
+    w = wio.pstep_factory.get().wot
 
-        return wot_grid
+    if len(wots) != len(n2v_ratios):
+        raise ValueError(
+            f"Mismatched number of wots({len(wots)}) & n2v_ratios({len(n2v_ratios)})!"
+        )
+    assert wots, "No wots given!"
+
+    items = tuple(wots[0].columns)
+    if w.n not in items:
+        raise ValueError(f"Missing `{w.n}` column from wots: {items}")
+    n_col = items.index(w.n)
+
+    v_wot_maxes = [_check_wot_n2vs(wot, n2vs) for wot, n2vs in zip(wots, n2v_ratios)]
+    V_grid = _make_v_grid(_v_wot_min, max(v_wot_maxes))
+    nvs = []
+    for v_wot_max in v_wot_maxes:
+        veh_grid = _make_v_grid(_v_wot_min, v_wot_max)
+        assert veh_grid[-1] == V_grid[len(veh_grid) - 1], (
+            "V-grid not a prefix of the common one:",
+            veh_grid[-3:],
+            V_grid[len(veh_grid) - 3 : len(veh_grid)],
+        )
+        nvs.append(len(veh_grid))
+    nvs = np.array(nvs)
+    ngears = np.array([len(n2vs) for n2vs in n2v_ratios])
+
+    values = np.full((len(wots), ngears.max(), len(V_grid), len(items)), np.NAN)
+    for vi, (wot, n2vs, nv) in enumerate(zip(wots, n2v_ratios, nvs)):
+        if set(wot.columns) != set(items):
+            raise ValueError(
+                f"Wot-columns of vehicle[{vi}] {list(wot.columns)} differ from {items}!"
+            )
+        wot_values = wot.loc[:, items].to_numpy(float)
+        N = wot_values[:, n_col]
+        V_grid_veh = V_grid[:nv]
+        for gi, n2v in enumerate(n2vs):
+            gear_values = values[vi, gi, :nv]
+            _interp_columns(V_grid_veh, N / n2v, wot_values, gear_values)
+            # NOTE that `n_norm` remains undefined for N < n_idle.
+            gear_values[:, n_col] = V_grid_veh * n2v
 
-    wot_grids = {
-        wio.gear_name(gnum): interpolate_gear_wot(wot, n2v)
-        for gnum, n2v in enumerate(n2v_ratios, 1)
-    }
+    return GridWots(V_grid, items, values, ngears, nvs)
 
-    wot_grid = pd.concat(
-        wot_grids.values(),
-        axis=1,
-        keys=wot_grids.keys(),
-        names=["gear", "item"],
-        verify_integrity=True,
-    ).swaplevel(axis=1)
 
-    return wot_grid
+@autog.autographed(provides="gwots")
+def interpolate_wot_on_v_grid(wot: pd.DataFrame, n2v_ratios) -> pd.DataFrame:
+    """
+    Return a new linearly interpolated df on v with inv.v_decimals.
+
+    :param df:
+        A df containing at least `n` (in RPM); any other column gets interpolated.
+
+        .. Attention::
+            Do not include non-linear columns (e.g. p_resistances(v^2))
+            because those interpolated values would be highly inaccurate!
+
+    :return:
+        the wot interpolated on a v-grid accommodating all gears
+        with 2-level columns (item, gear)
+
+    .. Seealso:: :func:`interpolate_wots_on_v_grid()` for many vehicles at once.
+    """
+    return interpolate_wots_on_v_grid([wot], [n2v_ratios]).frame(0)
 
 
 @autog.autographed(
@@ -397,6 +538,9 @@ def calc_n95(wot: pd.DataFrame, n_rated: int, p_rated: float) -> Tuple[float, fl
     )
     assert wot[w.n].min() < n_rated <= wot[w.n].max()
 
+    ## Deferred, `scipy` is heavy to import and used only here.
+    from scipy import interpolate
+
     def interp_n95(label, P, N_norm):
         if len(P) < 2:
             wot_location = "below" if label == "low" else "above"
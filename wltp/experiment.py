@@ -57,18 +57,40 @@
 
 import logging
 import re
+from typing import Any, Iterable, List, Mapping, NamedTuple, Optional
 
 import numpy as np
 import pandas as pd
 
-from . import cycler, cycles, datamodel, downscale, engine, invariants
+from . import cache, cycler, cycles, datamodel, downscale, engine, invariants
 from . import io as wio
-from . import nmindrive, pipelines, vehicle, vmax
+from . import nmindrive, outputs, pipelines, variants, vehicle, vmax
 from .invariants import v_decimals, vround
 
 log = logging.getLogger(__name__)
 
 
+class CrossCheckDiff(NamedTuple):
+    """A mismatch found by :meth:`Experiment.run()` in `cross_check` mode."""
+
+    #: the model or cycle item that differed
+    item: str
+    #: the value from the imperative code-path (only the differing samples, if series)
+    expected: Any
+    #: the value from the pipeline (only the differing samples, if series)
+    got: Any
+
+
+class CrossCheckError(AssertionError):
+    """Raised when :meth:`Experiment.run()` finds diffs in `cross_check` mode."""
+
+    def __init__(self, diffs: List[CrossCheckDiff]):
+        #: all the :class:`CrossCheckDiff` found
+        self.diffs = diffs
+        items = ", ".join(d.item for d in diffs)
+        super().__init__(f"Pipelines differ from imperative results in: {items}")
+
+
 class Experiment(object):
     """Runs the vehicle and cycle data describing a WLTC experiment.
 
@@ -81,6 +103,15 @@ def __init__(
         skip_model_validation=False,
         validate_wltc_data=False,
         additional_properties=True,
+        cross_check=False,
+        vmax_wot=False,
+        trusted_model=False,
+        cache_dir=None,
+        cache_max_bytes=None,
+        cache_max_age_sec=None,
+        output_profile="debug",
+        output_layout="wide",
+        variants_index=None,
     ):
         """
         :param mdl:
@@ -89,10 +120,61 @@ def __init__(
             when true, does not validate the model.
         :param additional_properties:
             when false; strict checks screams if unknown props in model
+        :param cross_check:
+            when true, :meth:`run()` re-calculates results also with the imperative
+            code-paths, and raises :class:`CrossCheckError` on any differences
+            (slow, for debugging & CI)
+        :param vmax_wot:
+            when true, :meth:`run()` keeps in the `wots_vmax` model-item
+            the grid-wots used to solve `v_max` (see :func:`.vmax.calc_v_max()`)
+        :param trusted_model:
+            when true, the model is validated only for the types & dimensions
+            of its items (see ``trusted`` in :func:`.datamodel.validate_model()`),
+            for bulk-runs of pre-validated models
+        :param cache_dir:
+            when given, :meth:`run()` loads the results of a model ran before
+            from this directory, or stores them there (see :mod:`.cache`)
+        :param cache_max_bytes, cache_max_age_sec:
+            eviction limits of the `cache_dir` (see :class:`.cache.ResultsCache`)
+        :param output_profile:
+            one of :data:`.outputs.output_profiles`, selecting the columns & dtypes
+            of the `cycle` (see :func:`.outputs.profile_cycle()`)
+        :param output_layout:
+            one of :data:`.outputs.cycle_layouts`, for the columns of the `cycle`,
+            or also a `cycle_gears` model-item (see :func:`.outputs.layout_cycle()`)
+        :param variants_index:
+            a :class:`.variants.VariantsIndex` (e.g. from
+            :func:`.variants.get_variants_index()`) identifying the `wltc_class`,
+            `f_dsc` & `v_cap` of forced `v_target` cycles, replacing those in the model;
+            if not given, only an index already saved in `cache_dir` is consulted
+            (see :func:`.variants.load_variants_index()`), never built (~5sec)
         """
+        #: when true, :meth:`run()` compares pipelines against imperative results
+        self.cross_check = cross_check
+        #: the :class:`CrossCheckDiff` found by the last :meth:`run()`
+        self.cross_check_diffs: List[CrossCheckDiff] = []
+        #: when true, :meth:`run()` keeps the diagnostic `wots_vmax` model-item
+        self.vmax_wot = vmax_wot
+        #: the :class:`.cache.ResultsCache` of `cache_dir`, if given
+        self.cache = (
+            cache.open_cache(cache_dir, cache_max_bytes, cache_max_age_sec)
+            if cache_dir
+            else None
+        )
+        outputs.check_output_options(output_profile, output_layout)
+        #: one of :data:`.outputs.output_profiles`, applied by :meth:`run()`
+        self.output_profile = output_profile
+        #: one of :data:`.outputs.cycle_layouts`, applied by :meth:`run()`
+        self.output_layout = output_layout
+        #: the :class:`.variants.VariantsIndex` identifying forced cycles, if any
+        self.variants_index = variants_index
 
         self._set_model(
-            mdl, skip_model_validation, validate_wltc_data, additional_properties
+            mdl,
+            skip_model_validation,
+            validate_wltc_data,
+            additional_properties,
+            trusted_model,
         )
 
         self.wltc = self._model["wltc_data"]
@@ -100,14 +182,85 @@ def __init__(
     def run(self):
         """Invokes the main-calculations and extracts/update Model values!
 
+        The cycle is "run" once, by the :func:`~.pipelines.cycler_pipeline()`;
+        the (older) imperative code-paths re-calculating the same results
+        run only in :attr:`cross_check` mode.
+
+        With a :attr:`cache`, the results of a model ran before are loaded from it
+        (except in :attr:`cross_check` mode), and new results are stored in it.
+
+        The :attr:`output_profile` & :attr:`output_layout` apply last,
+        on fresh or cached results (the cache stores them all), and the bytes
+        of the `cycle` (& any `cycle_gears`) are reported in `cycle_nbytes`.
+
+        :raise CrossCheckError:
+            in :attr:`cross_check` mode, if any imperative & pipelined results differ
+
         @see: Annex 2, p 70
         """
+        if self.cache is None:
+            return self._profile_outputs(self._run())
+
+        mdl = self._model
+        index = self._get_variants_index()
+        key = cache.result_key(
+            mdl,
+            vmax_wot=self.vmax_wot,
+            variants_index=None if index is None else len(index),
+        )
+        if not self.cross_check:
+            results = self.cache.get(key)
+            if results is not None:
+                log.debug("Loaded cached results(%s).", key)
+                mdl.update(results)
+                return self._profile_outputs(mdl)
+
+        inputs = mdl.copy()
+        mdl = self._run()
+        ## Store just the items added or replaced by the run.
+        results = {k: v for k, v in mdl.items() if inputs.get(k, self) is not v}
+        self.cache.put(key, results)
+
+        return self._profile_outputs(mdl)
+
+    def _get_variants_index(self) -> Optional[variants.VariantsIndex]:
+        """The :attr:`variants_index`, or the one already saved in the cache, if any."""
+        if self.variants_index is not None:
+            return self.variants_index
+        if self.cache is not None:
+            return variants.load_variants_index(self.cache.cache_dir)
+
+        return None
+
+    def _profile_outputs(self, mdl):
+        m = wio.pstep_factory.get()
+
+        cycle = outputs.profile_cycle(mdl[m.cycle], self.output_profile)
+        cycle, cycle_gears = outputs.layout_cycle(cycle, self.output_layout)
+        mdl[m.cycle] = cycle
+        nbytes = outputs.cycle_nbytes(cycle)
+        if cycle_gears is not None:
+            mdl[m.cycle_gears] = cycle_gears
+            nbytes += outputs.cycle_nbytes(cycle_gears)
+        mdl[m.cycle_nbytes] = nbytes
+        log.debug(
+            "Cycle%s of %s bytes (%r profile, %r layout).",
+            cycle.shape,
+            nbytes,
+            self.output_profile,
+            self.output_layout,
+        )
+
+        return mdl
+
+    def _run(self):
         m = wio.pstep_factory.get()
         c = wio.pstep_factory.get().cycle
         w = wio.pstep_factory.get().wot
 
         mdl = self._model
         orig_mdl = self._model.copy()
+        diffs = self.cross_check_diffs = []
 
         ## Prepare results
         #
@@ -132,7 +285,6 @@ def run(self):
         unladen_mass = mdl.get(m.unladen_mass) or test_mass - mdl[m.driver_mass]
         p_rated = mdl[m.p_rated]
         n_rated = mdl[m.n_rated]
-        n_idle = mdl[m.n_idle]
         n2v_ratios = mdl[m.n2v_ratios]
         f0 = mdl.get(m.f0)
         f1 = mdl.get(m.f1)
@@ -159,12 +311,13 @@ def run(self):
         gwots = engine.attach_p_avail_in_gwots(gwots, f_safety_margin=f_safety_margin)
         gwots[w.p_resist] = vehicle.calc_p_resist(gwots.index, f0, f1, f2)
 
-        v_max_rec = vmax.calc_v_max(gwots)
+        v_max_rec = vmax.calc_v_max(gwots, with_wot=self.vmax_wot)
         mdl[m.v_max] = v_max = v_max_rec.v_max
         mdl[m.n_vmax] = v_max_rec.n_vmax
         mdl[m.g_vmax] = v_max_rec.g_vmax
         mdl[m.is_n_lim_vmax] = v_max_rec.is_n_lim
-        mdl[m.wots_vmax] = v_max_rec.wot
+        if self.vmax_wot:
+            mdl[m.wots_vmax] = v_max_rec.wot
 
         p_m_ratio = vehicle.calc_p_m_ratio(p_rated, unladen_mass)
         mdl[m.pmr] = p_m_ratio
@@ -179,9 +332,24 @@ def run(self):
 
             V = pd.Series(V, name=c.v_target)
             wltc_class, _part, _kind = cycles.identify_cycle_v(V)
-            cb = cycler.CycleBuilder(V)
+            variant = None
+            velocities = [V]
             mdl[m.f_dsc] = None
+            index = self._get_variants_index()
+            if wltc_class is None and index is not None:
+                variant = index.identify(V)
+                if variant and variant.phase is None:
+                    log.info(
+                        "Identified forced velocity as %s, replacing model's"
+                        " wltc_class(%s) & v_cap(%s).",
+                        variant,
+                        mdl.get(m.wltc_class),
+                        mdl.get(m.v_cap),
+                    )
+                    mdl[m.f_dsc] = variant.f_dsc
+            class_cycle = None
         else:
+            variant = None
             ## Decide WLTC-class.
             #
             wltc_class = mdl.get(m.wltc_class)
@@ -225,101 +393,89 @@ def run(self):
                 mdl[m.f_dsc] = f_dsc
                 mdl[m.f_dsc_raw] = f_dsc_raw
 
-            if f_dsc > 0:
-                V_dsc_raw = downscale.calc_V_dsc_raw(V, f_dsc, phases)
-                V_dsc_raw.name = c.V_dsc_raw
-
-                V_dsc = vround(V_dsc_raw)
-                V_dsc.name = c.V_dsc
-
-                ## VALIDATE AGAINST PIPELINE.
-                #
-                orig_mdl.pop("v_max", None)  # vehdb contains v_max!
-                sol = pipelines.scale_trace_pipeline().compute(orig_mdl)
-                assert (V_dsc == sol["V_dsc"]).all()
-                assert mdl["pmr"] == sol["p_m_ratio"]
-                # for i in "v_max g_vmax n_vmax wltc_class n95_high n95_low".split():
-                for i in "v_max g_vmax n_vmax wltc_class".split():
-                    assert mdl[i] == sol[i]
-
-                # TODO: separate column due to cap/extend.
-                V_target = V_dsc.copy()
-                V_target.name = c.v_target
-
-                cb = cycler.CycleBuilder(V, V_dsc_raw, V_dsc, V_target)
-                V = cb.cycle[c.v_target]
-            else:
-                V_target = V.copy()
-                V_target.name = c.v_target
+            ## The velocities & phases of the cycle are shared among vehicles.
+            class_cycle = cycler.get_class_cycle(
+                wltc_class,
+                f_dsc,
+                f_running_threshold=mdl[m.f_running_threshold],
+                f_up_threshold=mdl[m.f_up_threshold],
+                phase_repeat_threshold=mdl.get(
+                    m.phase_repeat_threshold, cycler.PhaseMarker.phase_repeat_threshold
+                ),
+            )
 
-                cb = cycler.CycleBuilder(V, V_target)
-                V = V_target
+            if self.cross_check:
+                if f_dsc > 0:
+                    phases = class_data["downscale"]["phases"]
+                    V_dsc_raw = downscale.calc_V_dsc_raw(V, f_dsc, phases)
+                    V_dsc_raw.name = c.V_dsc_raw
 
-        assert isinstance(V, pd.Series), V
+                    V_dsc = vround(V_dsc_raw)
+                    V_dsc.name = c.V_dsc
 
-        pm = cycler.PhaseMarker()
+                    orig_mdl[m.unladen_mass] = unladen_mass
+                    diffs.extend(_cross_check_scale_trace(orig_mdl, mdl, V_dsc))
 
-        if wltc_class:
-            wltc_parts = datamodel.get_class_parts_limits(wltc_class, edges=True)
-            cb.cycle = pm.add_class_phase_markers(cb.cycle, wltc_parts)
+                    # TODO: separate column due to cap/extend.
+                    V_target = V_dsc.copy()
+                    V_target.name = c.v_target
 
-        cb.cycle = pm.add_transition_markers(cb.cycle, cb.V, cb.A)
+                    velocities = [V, V_dsc_raw, V_dsc, V_target]
+                else:
+                    V_target = V.copy()
+                    V_target.name = c.v_target
 
-        cb.cycle[c.p_inert] = vehicle.calc_inertial_power(
-            cb.V, cb.A, test_mass, f_inertial
-        )
-        cb.add_wots(gwots)
-        cb.cycle[c.p_req] = vehicle.calc_required_power(
-            cb.cycle[c.p_resist], cb.cycle[c.p_inert]
-        )
+                    velocities = [V, V_target]
 
-        ## VALIDATE AGAINST PIPELINE No1
-        #
-        inp = {**mdl, "V_compensated": V}
-        sol = pipelines.cycler_pipeline().compute(inp.copy())
-        graph_cycle = sol["cycle"]
-        P_req = graph_cycle["P_req"]
-        p_req = cb.cycle[c.p_req]
-        idx = ~p_req.isnull()
-        assert (p_req[idx] == P_req[idx]).all()
-
-        ## Remaining n_max values
+        ## Run the cycle.
         #
-        g_max_n2v = n2v_ratios[mdl[m.g_vmax] - 1]
+        inp = {k: v for k, v in mdl.items() if k != m.cycle}
+        if class_cycle is not None:
+            inp["class_cycle"] = class_cycle
+        else:
+            assert isinstance(V, pd.Series), V
+            inp["V_compensated"] = V
+        if any(mdl.get(i) is None for i in nmindrive.NMinDrives._fields):
+            ## Model validation (which fills-in n_mins) was skipped.
+            nmins = nmindrive.n_min_drives_from_model(mdl)
+            errors = nmins.vehicle_errors(0)
+            if errors:
+                raise errors[0]
+            inp.update(nmins.vehicle(0)._asdict())
+        pipe = pipelines.cycler_pipeline(class_cycle=class_cycle is not None)
+        sol = pipe.compute(inp)
+        cycle = sol["cycle"]
+
         #  NOTE: `n95_high` is not rounded based on v, like the rest n_mins.
-        mdl[m.n_max1] = mdl[m.n95_high]
+        mdl[m.n_max1] = n95_high
         #  NOTE: In Annex 2-2.g, it is confusing g_top with g_vmax;
         #  the later stack betters against accdb results.
-        mdl[m.n_max2] = n_max_cycle = g_max_n2v * cb.V.max()
-        mdl[m.n_max3] = g_max_n2v * mdl[m.v_max]
-        mdl[m.n_max] = engine.calc_n_max(mdl[m.n_max1], mdl[m.n_max2], mdl[m.n_max3])
+        mdl[m.n_max2] = sol["n_max_cycle"]
+        mdl[m.n_max3] = sol["n_max_vehicle"]
+        mdl[m.n_max] = sol["n_max"]
 
         # TODO: incorporate `t_cold_end` check in validation framework.
         if wltc_class:
+            wltc_parts = datamodel.get_class_parts_limits(wltc_class, edges=True)
+            cb = cycler.CycleBuilder(cycle, cycle[c.V], cycle[c.A])
             for err in cb.validate_nims_t_cold_end(mdl[m.t_cold_end], wltc_parts):
                 raise err
 
-        initial_gear_flags = cb.calc_initial_gear_flags(
-            g_vmax=mdl[m.g_vmax],
-            n95_high=n95_high,
-            n_max_cycle=n_max_cycle,
-            # TODO: expand nmins
-            nmins=nmindrive.mdl_2_n_min_drives(**mdl)["n_min_drives"],
-        )
-        ok_n_flags = cb.combine_ok_n_gear_flags(initial_gear_flags)
-        ok_flags = pd.concat((initial_gear_flags, ok_n_flags), axis=1)
-        ok_gears = cb.derrive_ok_gears(ok_flags)
-
-        g_min, g_max0, G_scala = cb.make_gmax0(ok_gears)
-
-        cb.add_columns(ok_flags, ok_gears, G_scala, g_min, g_max0)
-
-        mdl[m.cycle] = cb.cycle
+        if self.cross_check:
+            diffs.extend(
+                _cross_check_cycle(
+                    mdl, velocities, wltc_class, gwots, test_mass, f_inertial, cycle
+                )
+            )
+            if diffs:
+                raise CrossCheckError(diffs)
 
-        ## VALIDATE AGAINST PIPELINE No2
-        #
-        assert (g_min == graph_cycle["g_min"]).all()
-        assert (g_max0 == graph_cycle["g_max0"]).all()
+        if variant and variant.phase is None:
+            ## Reported only after the cycle has run, not to check the trace
+            #  against the phases & limits of the nominal class-cycle.
+            mdl[m.wltc_class] = variant.cycle
+            mdl[m.v_cap] = variant.v_cap
+        mdl[m.cycle] = cycle
 
         return mdl
 
@@ -332,12 +488,20 @@ def model(self):
         return self._model
 
     def _set_model(
-        self, mdl, skip_validation, validate_wltc_data, additional_properties
+        self,
+        mdl,
+        skip_validation,
+        validate_wltc_data,
+        additional_properties,
+        trusted_model=False,
     ):
-        from wltp.datamodel import get_model_base, merge
+        from wltp.datamodel import get_model_base, intern_wltc_data, merge
 
         merged_model = get_model_base()
         merge(merged_model, mdl)
+        ## Share any modified `wltc_data` (e.g. among experiments of a batch).
+        if isinstance(merged_model.get("wltc_data"), Mapping):
+            merged_model["wltc_data"] = intern_wltc_data(merged_model["wltc_data"])
         if not skip_validation:
             errors = list(
                 datamodel.validate_model(
@@ -345,6 +509,7 @@ def _set_model(
                     validate_wltc_data=validate_wltc_data,
                     additional_properties=additional_properties,
                     iter_errors=True,
+                    trusted=trusted_model,
                 )
             )
             if errors:
@@ -368,6 +533,62 @@ def driveability_report(self):
         return None
 
 
+def _diff_values(item: str, expected, got) -> Iterable[CrossCheckDiff]:
+    """Yield a :class:`CrossCheckDiff` if scalars or (non-null) series differ. """
+    if isinstance(expected, pd.Series):
+        idx = expected.notnull()
+        expected, got = expected[idx], got[idx]
+        neq = expected.to_numpy() != got.to_numpy()
+        if neq.any():
+            yield CrossCheckDiff(item, expected[neq], got[neq])
+    elif expected != got:
+        yield CrossCheckDiff(item, expected, got)
+
+
+def _cross_check_scale_trace(orig_mdl, mdl, V_dsc) -> Iterable[CrossCheckDiff]:
+    """Compare imperative scalars & `V_dsc` against :func:`.scale_trace_pipeline()`. """
+    orig_mdl = orig_mdl.copy()
+    orig_mdl.pop("v_max", None)  # vehdb contains v_max!
+    sol = pipelines.scale_trace_pipeline().compute(orig_mdl)
+
+    yield from _diff_values("V_dsc", V_dsc, sol["V_dsc"])
+    yield from _diff_values("pmr", mdl["pmr"], sol["p_m_ratio"])
+    # for i in "v_max g_vmax n_vmax wltc_class n95_high n95_low".split():
+    for i in "v_max g_vmax n_vmax wltc_class".split():
+        yield from _diff_values(i, mdl[i], sol[i])
+
+
+def _cross_check_cycle(
+    mdl, velocities, wltc_class, gwots, test_mass, f_inertial, cycle
+) -> Iterable[CrossCheckDiff]:
+    """Compare imperative `P_req` & `n_max` against the pipelined `cycle`. """
+    m = wio.pstep_factory.get()
+    c = wio.pstep_factory.get().cycle
+
+    cb = cycler.CycleBuilder(*velocities)
+    pm = cycler.PhaseMarker()
+    if wltc_class:
+        wltc_parts = datamodel.get_class_parts_limits(wltc_class, edges=True)
+        cb.cycle = pm.add_class_phase_markers(cb.cycle, wltc_parts)
+    cb.cycle = pm.add_transition_markers(cb.cycle, cb.V, cb.A)
+    cb.cycle[c.p_inert] = vehicle.calc_inertial_power(
+        cb.V, cb.A, test_mass, f_inertial
+    )
+    cb.add_wots(gwots)
+    cb.cycle[c.p_req] = vehicle.calc_required_power(
+        cb.cycle[c.p_resist], cb.cycle[c.p_inert]
+    )
+    yield from _diff_values(c.P_req, cb.cycle[c.p_req], cycle[c.P_req])
+
+    g_max_n2v = mdl[m.n2v_ratios][mdl[m.g_vmax] - 1]
+    n_max2 = g_max_n2v * cb.V.max()
+    n_max3 = g_max_n2v * mdl[m.v_max]
+    n_max = engine.calc_n_max(mdl[m.n_max1], n_max2, n_max3)
+    yield from _diff_values(m.n_max2, n_max2, mdl[m.n_max2])
+    yield from _diff_values(m.n_max3, n_max3, mdl[m.n_max3])
+    yield from _diff_values(m.n_max, n_max, mdl[m.n_max])
+
+
 #######################
 ## PURE CALCULATIONS ##
 ##  Separate for     ##
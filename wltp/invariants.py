@@ -13,7 +13,7 @@
   from wltp.invariants import *
 """
 import functools
-from typing import Union
+from typing import NamedTuple, Union
 
 import numpy as np
 import pandas as pd
@@ -124,6 +124,70 @@ def asint(n):
 nround10 = lambda n: asint(round1(n, -1))
 
 
+class Runs(NamedTuple):
+    """
+    The run-length encoding of a 1D array, as returned by :func:`run_lengths()`.
+
+    Per-run reductions/predicates are computed without python loops,
+    and are expanded back to the length of the original array with :meth:`expand()`.
+    """
+
+    #: the index of the 1st sample of each run
+    starts: np.ndarray
+    #: the number of samples in each run
+    lengths: np.ndarray
+    #: the (common) value of the samples in each run
+    values: np.ndarray
+
+    def expand(self, per_run) -> np.ndarray:
+        """Repeat each per-run item for all samples in its run. """
+        return np.repeat(per_run, self.lengths)
+
+    def count(self, flags) -> np.ndarray:
+        """The number of truths of the boolean array `flags` within each run. """
+        flags = np.asarray(flags, dtype=int)
+        if not len(self.starts):
+            return flags[:0]
+        return np.add.reduceat(flags, self.starts)
+
+    def any(self, flags) -> np.ndarray:
+        """Whether any of the boolean array `flags` is true within each run. """
+        return self.count(flags) > 0
+
+    def all(self, flags) -> np.ndarray:
+        """Whether all of the boolean array `flags` are true within each run. """
+        return self.count(flags) == self.lengths
+
+
+def run_lengths(arr) -> Runs:
+    """
+    Run-length encode a 1D array, splitting it where consecutive values differ.
+
+    :param arr:
+        any 1D array-like (e.g. a boolean series)
+
+    **Example:**
+
+    >>> runs = run_lengths([0, 0, 1, 1, 1, 0, 1])
+    >>> runs
+    Runs(starts=array([0, 2, 5, 6]), lengths=array([2, 3, 1, 1]), values=array([0, 1, 0, 1]))
+    >>> runs.expand(runs.lengths >= 2)
+    array([ True,  True,  True,  True,  True, False, False])
+    >>> runs.any([0, 1, 0, 0, 0, 0, 1])
+    array([ True, False, False,  True])
+    """
+    arr = np.asarray(arr)
+    n = len(arr)
+    if not n:
+        empty = np.empty(0, dtype=int)
+        return Runs(empty, empty, arr)
+
+    starts = np.flatnonzero(np.r_[True, arr[1:] != arr[:-1]])
+    lengths = np.diff(np.r_[starts, n])
+
+    return Runs(starts, lengths, arr[starts])
+
+
 def apply_bool_op_on_columns_with_NANFLAGs(
     df: pd.DataFrame, op, nan_val: int, NANFLAG=-1
 ) -> pd.Series:
@@ -217,6 +217,35 @@ class GearMultiIndexer:
     gear_namer: GearGenerator
     level_names: Sequence[str] = dataclasses.field(default=("item", "gear"))
 
+    def __post_init__(self):
+        ## Indexers of the same gears (e.g. from :meth:`with_item()`)
+        #  share a memo of their indices, see :meth:`_memoized()`.
+        gears_key = (
+            tuple(self.gnames.items()),
+            self.top_gear,
+            tuple(self.level_names),
+        )
+        object.__setattr__(self, "_gears_key", gears_key)
+
+    def _memoized(self, key, factory: Callable):
+        """
+        Return the `factory()` result, memoized for `key` and these gears.
+
+        Lists & indices are returned as (shallow) copies, since pandas modifies
+        e.g. the `names` of the columns in place.
+        """
+        memo = _gears_memo(self._gears_key)
+        try:
+            value = memo[key]
+        except KeyError:
+            memo[key] = value = factory()
+        except TypeError:  # unhashable `key`
+            return factory()
+
+        if isinstance(value, (list, pd.Index)):
+            value = value.copy()
+        return value
+
     @classmethod
     def from_ngears(
         cls,
@@ -302,7 +331,15 @@ def _level_names(self, items=None) -> Optional[Sequence[str]]:
     def __getitem__(self, key):
         """
         1-based & closed-bracket indexing, like Series but with `-1` for the top-gear.
+
+        The indices are memoized per `items` & `key`.
         """
+        key = _materialized_key(key)
+        items = None if self.items is None else tuple(self.items)
+        return self._memoized((items, _hashable_key(key)), lambda: self._getitem(key))
+
+    def _gears_loc(self, key, gears: pd.Series = None):
+        """Apply `key` on `gears` (:attr:`gnames` by default), indexed like them."""
         top_gear = self.ng
         # Support partial gears or G0!
         offset = int(top_gear == self.top_gear)
@@ -317,7 +354,10 @@ def from_top_gear(i):
         else:  # assume Iterable[int]
             key = [from_top_gear(g) for g in key]
 
-        gnames = self.gnames.loc[key]
+        return (self.gnames if gears is None else gears).loc[key]
+
+    def _getitem(self, key):
+        gnames = self._gears_loc(key)
 
         ## If no items, return just a list of gears.
         #
@@ -334,17 +374,60 @@ def from_top_gear(i):
             itt.product(self.items, gnames), names=self._level_names()
         )
 
+    def positions(self, key=slice(None)):
+        """
+        The 0-based column positions of ``self[key]`` within a ``self[:]`` index,
+
+        to slice frames or arrays with ``iloc`` or numpy, instead of labels.
+
+        :return:
+            an int, if `key` is an int & no `items`, a read-only int-array otherwise
+
+        Example:
+
+        >>> G = GearMultiIndexer.from_ngears(5, gear0=True)
+        >>> G.positions(slice(3, None))
+        array([3, 4, 5])
+        >>> G.positions(-1)
+        5
+        >>> G.with_item("foo", "bar").positions([1, 2])
+        array([1, 2, 7, 8])
+        """
+        key = _materialized_key(key)
+        items = None if self.items is None else tuple(self.items)
+
+        def make_positions():
+            gears = pd.Series(np.arange(self.ng), index=self.gnames.index)
+            gpos = self._gears_loc(key, gears)
+            if not isinstance(gpos, pd.Series):
+                if items is None:
+                    return int(gpos)
+                gpos = [gpos]
+            gpos = np.asarray(gpos, dtype=int)
+            if items is not None:
+                gpos = (np.arange(len(items))[:, None] * self.ng + gpos).ravel()
+            gpos.flags.writeable = False
+            return gpos
+
+        return self._memoized(("positions", items, _hashable_key(key)), make_positions)
+
     def colidx_pairs(
         self, item: Union[str, Iterable[str]], gnames: Iterable[str] = None
     ):
+        """The product MultiIndex of `item`(s) x `gnames` (all by default), memoized."""
         if gnames is None:
             gnames = self.gnames
+        gnames = tuple(gnames)
         assert gnames, locals()
 
         if isinstance(item, str):
             item = (item,)
-        return pd.MultiIndex.from_tuples(
-            itt.product(item, gnames), names=self._level_names(item)
+        item = tuple(item)
+        return self._memoized(
+            ("colidx_pairs", item, gnames),
+            lambda: pd.MultiIndex.from_tuples(
+                itt.product(item, gnames), names=self._level_names(item)
+            ),
         )
 
     def __len__(self):
@@ -367,6 +450,27 @@ def size(self):
         return self.ng * ((len(self.items) + 1) if self.items else 1)
 
 
+def _materialized_key(key):
+    """Iterables as tuples, not to consume any one-shot ones (e.g. generators) twice."""
+    if isinstance(key, Iterable) and not isinstance(key, (str, tuple)):
+        return tuple(key)
+    return key
+
+
+def _hashable_key(key):
+    if isinstance(key, slice):
+        return ("slice", key.start, key.stop, key.step)
+    if isinstance(key, Iterable) and not isinstance(key, str):
+        return ("list", *key)
+    return key
+
+
+@fnt.lru_cache(maxsize=64)
+def _gears_memo(gears_key: tuple) -> dict:
+    """The memo of all :class:`GearMultiIndexer` with the same gears."""
+    return {}
+
+
 @fnt.lru_cache()
 def make_autograph(out_patterns=None, *args, **kw) -> autog.Autograph:
     """Configures a new :class:`.Autograph` with func-name patterns for this project. """
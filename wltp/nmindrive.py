@@ -12,9 +12,11 @@
 >>> __name__ = "wltp.nmindrive"
 """
 
+import functools as fnt
 from collections import namedtuple
-from typing import Union
+from typing import Dict, List, Mapping, NamedTuple, Union
 
+import numpy as np
 from jsonschema import ValidationError
 
 from graphtik import keyword, compose, sfx
@@ -36,9 +38,14 @@ def calc_n_rated_R(n_rated: float) -> int:
     return nround1(n_rated)
 
 
+def _n_rated_not_above_n_idle(n_idle_R, n_rated_R):
+    """The rule of :func:`validate_n_rated_above_n_idle()`, true where failed."""
+    return n_rated_R <= n_idle_R
+
+
 @autographed(out_sideffects=["valid: n_rated", "valid: n_idle"], endured=True)
 def validate_n_rated_above_n_idle(n_idle_R, n_rated_R):
-    if n_rated_R <= n_idle_R:
+    if _n_rated_not_above_n_idle(n_idle_R, n_rated_R):
         raise ValidationError(
             f"{m.n_rated}({n_rated_R}) must be higher than {m.n_idle}({n_idle_R}!"
         )
@@ -84,15 +91,25 @@ def calc_n_min_drive2_stopdecel_R(n_min_drive2_stopdecel: float) -> int:
     return nround1(n_min_drive2_stopdecel)
 
 
+def _below_n_min_drive_set(n, n_min_drive_set):
+    """The rule of the `validate_XXX_V1` checks, true where failed."""
+    return n < n_min_drive_set
+
+
+def _above_2x_n_min_drive_set(n, n_min_drive_set):
+    """The rule of the `validate_XXX_V2` checks, true where failed."""
+    return n > 2 * n_min_drive_set
+
+
 def _check_higher_from_n_min_drive_set(n, n_min_drive_set):
-    if n < n_min_drive_set:
+    if _below_n_min_drive_set(n, n_min_drive_set):
         raise ValidationError(
             f"Must be higher than `{m.n_min_drive_set}`({n_min_drive_set})!"
         )
 
 
 def _check_lower_than_2x_n_min_drive_set(n, n_min_drive_set):
-    if n > 2 * n_min_drive_set:
+    if _above_2x_n_min_drive_set(n, n_min_drive_set):
         raise ValidationError(
             f"Must be lower than 2 x `{m.n_min_drive_set}`({n_min_drive_set})!"
         )
@@ -221,19 +238,40 @@ def validate_n_min_drive_down_start_V2(
 )
 
 
-def _compose_mdl_2_n_min_drives(aug: autog.Autograph = None, **pipeline_kw) -> "Pipeline":  # type: ignore
-    aug = Autograph(["calc_", "upd_"])
-    funcs = FnHarvester(base_modules=[__name__]).harvest()
+#: The public functions & classes not to become operations in the pipeline.
+_not_harvested = (
+    "mdl_2_n_min_drives_pipeline",
+    "NMinDrivesBatch",
+    "calc_n_min_drives_batch",
+    "n_min_drives_from_model",
+)
+
+
+@fnt.lru_cache()
+def mdl_2_n_min_drives_pipeline(
+    aug: autog.Autograph = None, **pipeline_kw
+) -> "Pipeline":  # type: ignore
+    """
+    The pipeline documented in :data:`mdl_2_n_min_drives`, built & cached on 1st use.
+
+    For the *n_min_drives* of many vehicles at once, prefer :func:`calc_n_min_drives_batch()`.
+    """
+    aug = aug or Autograph(["calc_", "upd_"])
+    funcs = FnHarvester(
+        excludes=_not_harvested, base_modules=[__name__]
+    ).harvest()
     ops = aug.wrap_funcs(funcs)
     return compose("mdl_2_n_min_drives", *ops, **pipeline_kw)
 
 
-# TODO: create *lazily* pipeline module-attribute.
-mdl_2_n_min_drives = _compose_mdl_2_n_min_drives()
+mdl_2_n_min_drives: "Pipeline"  # type: ignore
 """
 A pipeline to pre-process *n_min_drives* values.
 (the validation nodes in the plot below are hidden, not to clutter the diagram):
 
+It is built on 1st access by :func:`mdl_2_n_min_drives_pipeline()` (PEP 562, PY3.7+),
+since harvesting & composing it costs on import-time.
+
 >>> import networkx as nx
 >>> netop = mdl_2_n_min_drives
 >>> hidden = netop.net.find_ops(lambda n, _: not n.name.startswith("validate_"))
@@ -261,3 +299,178 @@ def _compose_mdl_2_n_min_drives(aug: autog.Autograph = None, **pipeline_kw) -> "
  n_min_drive2=450, n_min_drive_set=813, n_min_drive_up=813, n_min_drive_up_start=813,
  n_min_drive_down=813, n_min_drive_down_start=813, t_cold_end=470)}
 """
+
+
+def __getattr__(name):
+    ## PEP 562, for the pipeline that used to be built on import.
+    if name == "mdl_2_n_min_drives":
+        return mdl_2_n_min_drives_pipeline()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+#: The items of :class:`NMinDrives` that may be given to :func:`calc_n_min_drives_batch()`,
+#: instead of being calculated.
+n_min_drives_overridables = _NMinDrives._fields[:-1]
+
+#: The `validate_XXX` checks of the items bounded by `n_min_drive_set`,
+#: mapped to the checked item and the rule of the check, true where failed.
+_bounded_item_checks = {
+    f"validate_{item}_V{i}": (item, rule)
+    for item in (
+        "n_min_drive_up",
+        "n_min_drive_down",
+        "n_min_drive_up_start",
+        "n_min_drive_down_start",
+    )
+    for i, rule in enumerate((_below_n_min_drive_set, _above_2x_n_min_drive_set), 1)
+}
+
+
+class NMinDrivesBatch(NamedTuple):
+    """The *n_min_drives* of N vehicles, as returned by :func:`calc_n_min_drives_batch()`."""
+
+    #: the (R)ounded `n_idle` N-array
+    n_idle_R: np.ndarray
+    #: the (R)ounded `n_rated` N-array
+    n_rated_R: np.ndarray
+    #: an :class:`NMinDrives` with the (R)ounded N-array of each item
+    n_min_drives: _NMinDrives
+    #: a boolean N-array for each `validate_XXX` check, true where a vehicle failed it
+    errors: Dict[str, np.ndarray]
+
+    @property
+    def invalid(self) -> np.ndarray:
+        """A boolean N-array, true for the vehicles failing any check."""
+        return np.logical_or.reduce(list(self.errors.values()))
+
+    def vehicle(self, i: int) -> _NMinDrives:
+        """The :class:`NMinDrives` of the `i`-th vehicle, with python scalars."""
+        return _NMinDrives(*(v[i].item() for v in self.n_min_drives))
+
+    def vehicle_errors(self, i: int) -> List[ValidationError]:
+        """The errors of the `i`-th vehicle, as raised by the scalar `validate_XXX` checks."""
+        nmins = self.vehicle(i)
+        errors = []
+        for check, failed in self.errors.items():
+            if not failed[i]:
+                continue
+            try:
+                if check == "validate_n_rated_above_n_idle":
+                    args = (self.n_idle_R[i].item(), self.n_rated_R[i].item())
+                else:
+                    item, _rule = _bounded_item_checks[check]
+                    args = (getattr(nmins, item), nmins.n_min_drive_set)
+                globals()[check](*args)
+            except ValidationError as ex:
+                errors.append(ValidationError(f"{check}: {ex.message}", cause=ex))
+
+        return errors
+
+
+def calc_n_min_drives_batch(n_idle, n_rated, t_cold_end=0, **overrides) -> NMinDrivesBatch:
+    """
+    Vectorized :func:`mdl_2_n_min_drives_pipeline()` for N vehicles at once.
+
+    :param n_idle, n_rated, t_cold_end:
+        scalars or N-arrays, broadcasted against each other
+    :param overrides:
+        any of :data:`n_min_drives_overridables` given by the manufacturers,
+        as scalars or N-arrays, where NANs mean "calculate it" for that vehicle
+    :return:
+        the rounded values & a boolean error-mask per check (and not raising)
+
+    **Example:**
+
+    >>> res = calc_n_min_drives_batch([500, 800, 900], [3000, 4000, 850],
+    ...                               n_min_drive_up=[np.NAN, 2500, np.NAN])
+    >>> res.n_min_drives.n_min_drive_set
+    array([ 813, 1200,  894])
+    >>> res.n_min_drives.n_min_drive_up
+    array([ 813, 2500,  894])
+    >>> res.invalid
+    array([False,  True,  True])
+    >>> res.vehicle_errors(1)
+    [<ValidationError: 'validate_n_min_drive_up_V2: Must be lower than 2 x `n_min_drive_set`(1200)!'>,
+     <ValidationError: 'validate_n_min_drive_up_start_V2: Must be lower than 2 x `n_min_drive_set`(1200)!'>]
+    >>> res.vehicle_errors(2)
+    [<ValidationError: 'validate_n_rated_above_n_idle: n_rated(850) must be higher than n_idle(900!'>]
+    >>> res.vehicle(0)
+    NMinDrives(n_min_drive1=500, n_min_drive2_up=575, n_min_drive2_stopdecel=500,
+     n_min_drive2=450, n_min_drive_set=813, n_min_drive_up=813, n_min_drive_up_start=813,
+     n_min_drive_down=813, n_min_drive_down_start=813, t_cold_end=0)
+    """
+    unknown = set(overrides) - set(n_min_drives_overridables)
+    if unknown:
+        raise TypeError(f"Unknown n_min_drives to override: {sorted(unknown)}")
+
+    n_idle, n_rated, t_cold_end = np.broadcast_arrays(
+        np.asarray(n_idle, dtype=float), np.asarray(n_rated, dtype=float), t_cold_end
+    )
+    shape = np.shape(n_idle)
+    n_idle_R = calc_n_idle_R(n_idle)
+    n_rated_R = calc_n_rated_R(n_rated)
+
+    def given(item, calculated):
+        value = overrides.get(item)
+        if value is None:
+            return calculated
+        value = np.broadcast_to(np.asarray(value, dtype=float), shape)
+        return np.where(np.isnan(value), calculated, value)
+
+    ## The `calc_XXX()` functions of the pipeline on the arrays, in its order,
+    #  and their `calc_XXX_R()` in a 2nd pass, from all unrounded values.
+    n_min_drive_set = given(
+        "n_min_drive_set", calc_n_min_drive_set(n_idle_R, n_rated_R)
+    )
+    n_min_drive_up = given("n_min_drive_up", calc_n_min_drive_up(n_min_drive_set))
+    n_min_drive_down = given(
+        "n_min_drive_down", calc_n_min_drive_down(n_min_drive_set)
+    )
+    unrounded = {
+        "n_min_drive1": given("n_min_drive1", calc_n_min_drive1(n_idle_R)),
+        "n_min_drive2_up": given("n_min_drive2_up", calc_n_min_drive2_up(n_idle_R)),
+        "n_min_drive2_stopdecel": given(
+            "n_min_drive2_stopdecel", calc_n_min_drive2_stopdecel(n_idle_R)
+        ),
+        "n_min_drive2": given("n_min_drive2", calc_n_min_drive2(n_idle_R)),
+        "n_min_drive_set": n_min_drive_set,
+        "n_min_drive_up": n_min_drive_up,
+        "n_min_drive_up_start": given(
+            "n_min_drive_up_start", calc_n_min_drive_up_start(n_min_drive_up)
+        ),
+        "n_min_drive_down": n_min_drive_down,
+        "n_min_drive_down_start": given(
+            "n_min_drive_down_start", calc_n_min_drive_down_start(n_min_drive_down)
+        ),
+    }
+    nmins = _NMinDrives(
+        **{k: globals()[f"calc_{k}_R"](v) for k, v in unrounded.items()},
+        t_cold_end=t_cold_end,
+    )
+
+    errors = {
+        "validate_n_rated_above_n_idle": _n_rated_not_above_n_idle(n_idle_R, n_rated_R)
+    }
+    for check, (item, rule) in _bounded_item_checks.items():
+        errors[check] = rule(getattr(nmins, item), nmins.n_min_drive_set)
+
+    return NMinDrivesBatch(n_idle_R, n_rated_R, nmins, errors)
+
+
+def n_min_drives_from_model(mdl: Mapping) -> NMinDrivesBatch:
+    """
+    The scalar fast-path of :func:`mdl_2_n_min_drives_pipeline()` for a single vehicle-model.
+
+    :return:
+        a batch of 1 vehicle, to get its :meth:`~NMinDrivesBatch.vehicle()` values
+        and :meth:`~NMinDrivesBatch.vehicle_errors()`
+    """
+    overrides = {
+        k: mdl[k] for k in n_min_drives_overridables if mdl.get(k) is not None
+    }
+    return calc_n_min_drives_batch(
+        [mdl[m.n_idle]],
+        [mdl[m.n_rated]],
+        [mdl.get(m.t_cold_end, 0)],
+        **overrides,
+    )
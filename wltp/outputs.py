@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013-2020 European Commission (JRC);
+# Licensed under the EUPL (the 'Licence');
+# You may not use this work except in compliance with the Licence.
+# You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl
+"""
+shape the `cycle` results for storage: output-profiles, compact dtypes & layouts
+
+The `cycle` dataframe produced by :meth:`.Experiment.run()` keeps all intermediate
+per-gear columns & rule-flags, in `float64`, for debugging against AccDB;
+an *output-profile* (see :data:`output_profiles`) selects the column-groups kept
+and downcasts them, to budget the storage of whole fleets.
+
+Its 2-level ``(item, gear)`` columns may also be laid out (see :data:`cycle_layouts`)
+with flat names, or *long* with a row per ``(t, gear)``, mapping 1:1
+to the columns of tabular formats (e.g. Arrow & Parquet schemas).
+
+**Example:**
+
+.. code-block:: python
+
+    from wltp.experiment import Experiment
+
+    mdl = Experiment(mdl, output_profile="compact").run()
+    mdl["cycle"]         # float32 & int8 columns, without rule-flags
+    mdl["cycle_nbytes"]  # its size in memory
+
+    mdl = Experiment(mdl, output_layout="long").run()
+    mdl["cycle"]         # the items without gears, like `V`, `P_req` & `G_min`
+    mdl["cycle_gears"]   # a row per (t, gear) for the items with gears, like `n`
+
+.. Workaround sphinx-doc/sphinx#6590
+.. doctest::
+    :hide:
+
+    >>> from wltp.outputs import *
+    >>> __name__ = "wltp.outputs"
+"""
+import logging
+import re
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import io as wio
+
+log = logging.getLogger(__name__)
+
+#: The value of NANs in the int8 flags downcast from `object` columns,
+#: like :data:`.cycler.NANFLAG`.
+NANFLAG = -1
+
+#: The choices for `output_profile` of :class:`.Experiment`:
+#:
+#: - ``debug``: all columns as calculated, in `float64` (the default);
+#: - ``full``: all columns, downcast by :func:`downcast_cycle()`;
+#: - ``compact``: downcast, without the per-rule columns of :func:`rule_items()`.
+output_profiles = ("debug", "full", "compact")
+
+#: The choices for `output_layout` of :class:`.Experiment`:
+#:
+#: - ``wide``: 2-level ``(item, gear)`` columns (the default);
+#: - ``flat``: 1-level columns named ``item`` or ``item/gear`` (:func:`flat_cycle()`);
+#: - ``long``: the flat items without gears, plus the `cycle_gears` model-item
+#:   from :func:`long_cycle()`.
+cycle_layouts = ("wide", "flat", "long")
+
+
+def rule_items() -> Tuple[str, ...]:
+    """
+    The intermediate cycle-items for deciding the gears, dropped by the ``compact`` profile.
+
+    Their values are derived from the items kept (e.g. `n`, `p_avail` & `P_req`),
+    and summarized in the `OK_gear` flags & `G_min`/`G_max0` gears.
+    """
+    c = wio.pstep_factory.get().cycle
+    return (
+        c.n_norm,
+        c.p,
+        c.p_avail_stable,
+        c.p_norm,
+        c.P_remain,
+        c.OK_g0,
+        c.OK_max_n,
+        c.OK_n,
+        c.OK_p,
+        c.ok_min_n_g1,
+        c.ok_min_n_g1_initaccel,
+        c.ok_min_n_g2,
+        c.ok_min_n_g2_stopdecel,
+        c.ok_min_n_g3plus_dns,
+        c.ok_min_n_g3plus_ups,
+        c.incrementing_gflags,
+    )
+
+
+def _downcast_array(values: np.ndarray) -> np.ndarray:
+    kind = values.dtype.kind
+    if kind == "f":
+        return values.astype(np.float32)
+    if kind in "iu":
+        return pd.to_numeric(values, downcast="integer")
+    if kind == "O":
+        isnull = pd.isnull(values)
+        notnull = values[~isnull]
+        if all(isinstance(i, (bool, np.bool_)) for i in notnull):
+            flags = np.full(len(values), NANFLAG, dtype=np.int8)
+            flags[~isnull] = notnull.astype(bool)
+            return flags
+    return values
+
+
+def downcast_cycle(cycle: pd.DataFrame) -> pd.DataFrame:
+    """
+    A new cycle with floats as `float32`, ints downcast, and `bool` objects as int8 flags.
+
+    - `float32` keeps ~7 significant digits, more than the precision of the GTR
+      (e.g. velocities rounded to :data:`.invariants.v_decimals`, or engine-speeds
+      in `rpm` in the thousands);
+    - the object-columns with bools & NANs (e.g. `ok_min_n_g2` flags)
+      become int8 with :data:`NANFLAG` for the NANs.
+
+    Example:
+
+    >>> cycle = pd.DataFrame({
+    ...     "t": [0, 1, 2], "V": [0.0, 1.2, 131.3], "ok": [True, None, False]
+    ... })
+    >>> downcast_cycle(cycle).dtypes
+    t        int8
+    V     float32
+    ok       int8
+    dtype: object
+    >>> downcast_cycle(cycle)["ok"].tolist()
+    [1, -1, 0]
+    """
+    arrays = [_downcast_array(col.to_numpy()) for _, col in cycle.items()]
+    compact = pd.DataFrame(dict(enumerate(arrays)), index=cycle.index)
+    compact.columns = cycle.columns
+
+    return compact
+
+
+def check_output_options(output_profile: str = "debug", output_layout: str = "wide"):
+    """
+    :raise ValueError:
+        if not one of the :data:`output_profiles` & :data:`cycle_layouts`
+    """
+    for kind, value, choices in (
+        ("output-profile", output_profile, output_profiles),
+        ("output-layout", output_layout, cycle_layouts),
+    ):
+        if value not in choices:
+            raise ValueError(f"Unknown {kind} {value!r}, not one of {choices}!")
+
+
+def profile_cycle(cycle: pd.DataFrame, output_profile: str) -> pd.DataFrame:
+    """
+    Apply one of the :data:`output_profiles` on the `cycle` (the ``debug`` returns it as is).
+
+    :raise ValueError:
+        for unknown profiles
+    """
+    check_output_options(output_profile=output_profile)
+    if output_profile == "debug":
+        return cycle
+
+    if output_profile == "compact":
+        items = cycle.columns.get_level_values(0)
+        cycle = cycle.loc[:, ~items.isin(rule_items())]
+
+    return downcast_cycle(cycle)
+
+
+def flat_cycle(cycle: pd.DataFrame, gears=True, sep="/") -> pd.DataFrame:
+    """
+    A shallow copy of the `cycle`, with 1-level columns named like :func:`.io.flatten_columns()`.
+
+    :param gears:
+        when false, only the items without gears are kept (e.g. to complement
+        :func:`long_cycle()`)
+    :return:
+        a frame sharing the arrays of `cycle` (no copies), each column contiguous
+
+    Example:
+
+    >>> from wltp import io as wio
+    >>> G = wio.GearMultiIndexer.from_ngears(2)
+    >>> cycle = pd.DataFrame(
+    ...     [[0, 10.0, 20.0], [1, 11.0, 21.0]],
+    ...     columns=pd.MultiIndex.from_tuples([("t", ""), *G.with_item("n")[:]]),
+    ... )
+    >>> flat_cycle(cycle)
+       t  n/g1  n/g2
+    0  0  10.0  20.0
+    1  1  11.0  21.0
+    >>> flat_cycle(cycle, gears=False).columns.tolist()
+    ['t']
+    """
+    if not gears:
+        cycle = cycle.loc[:, cycle.columns.get_level_values(1) == ""]
+    flat = cycle.copy(deep=False)
+    flat.columns = wio.flatten_columns(cycle.columns, sep)
+
+    return flat
+
+
+def _gear_id(gname: str) -> int:
+    return int(re.sub("[^0-9]", "", gname))
+
+
+def long_cycle(cycle: pd.DataFrame) -> pd.DataFrame:
+    """
+    The items of the `cycle` having gears, with a row per ``(t, gear)``.
+
+    :return:
+        a frame with a `t` & a `gear` (int8 number) column, and a contiguous
+        column per item, gear after gear; gears missing from an item
+        are filled with NANs, or :data:`NANFLAG` for int & bool items (as int8)
+
+    Example:
+
+    >>> from wltp import io as wio
+    >>> G = wio.GearMultiIndexer.from_ngears(2)
+    >>> cycle = pd.DataFrame(
+    ...     [[0, 10.0, 20.0, True], [1, 11.0, 21.0, False]],
+    ...     columns=pd.MultiIndex.from_tuples(
+    ...         [("t", ""), *G.with_item("n")[:], ("OK", "g2")]
+    ...     ),
+    ... )
+    >>> long_cycle(cycle)
+       t  gear     n  OK
+    0  0     1  10.0  -1
+    1  1     1  11.0  -1
+    2  0     2  20.0   1
+    3  1     2  21.0   0
+    """
+    items, gears = (cycle.columns.get_level_values(i) for i in (0, 1))
+    gnames = sorted(set(gears[gears != ""]), key=_gear_id)
+    t = cycle.index.to_numpy()
+    nrows = len(t)
+
+    columns = {
+        "t": np.tile(t, len(gnames)),
+        "gear": np.repeat([_gear_id(g) for g in gnames], nrows).astype(np.int8),
+    }
+    for item in items[gears != ""].unique():
+        item_gears = gears[items == item]
+        arrays = [
+            cycle.iloc[:, (items == item) & (gears == g)].to_numpy()[:, 0]
+            if g in item_gears
+            else None
+            for g in gnames
+        ]
+        present = [a for a in arrays if a is not None]
+        if len(present) < len(arrays):
+            if present[0].dtype.kind in "biu":
+                present = [a.astype(np.int8) for a in present]
+                missing = np.full(nrows, NANFLAG, dtype=np.int8)
+            else:
+                missing = np.full(nrows, np.nan, dtype=present[0].dtype)
+            present = iter(present)
+            arrays = [missing if a is None else next(present) for a in arrays]
+        columns[str(item)] = np.concatenate(arrays)
+
+    return pd.DataFrame(columns)
+
+
+def layout_cycle(
+    cycle: pd.DataFrame, output_layout: str
+) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+    """
+    Apply one of the :data:`cycle_layouts` on the `cycle`.
+
+    :return:
+        the cycle laid out, and the `cycle_gears` for the ``long`` layout, or None
+    :raise ValueError:
+        for unknown layouts
+    """
+    check_output_options(output_layout=output_layout)
+    if output_layout == "flat":
+        return flat_cycle(cycle), None
+    if output_layout == "long":
+        return flat_cycle(cycle, gears=False), long_cycle(cycle)
+
+    return cycle, None
+
+
+def cycle_nbytes(cycle: pd.DataFrame) -> int:
+    """The bytes of the `cycle` in memory, including its index (but not its labels)."""
+    return int(cycle.memory_usage(index=True, deep=False).sum())
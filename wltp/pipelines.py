@@ -8,6 +8,20 @@
 """
 All :term:`pipeline` definitions for running the WLTP gear-shifting algorithm
 
+All pipeline factories below are cached, so each pipeline is built once per process
+(per distinct arguments), and :mod:`graphtik` caches in its network the
+:term:`graphtik:execution plan` solved for each combination of input & output names.
+To run many vehicles with the same inputs, the plan may also be compiled explicitly,
+and executed directly::
+
+    plan = cycler_pipeline().compile(inputs=mdl.keys())
+    for mdl in fleet:
+        cycle = plan.execute(mdl)["cycle"]
+
+.. Note::
+    Do not ask just ``cycle`` as `outputs`, or the ops providing
+    its (implicit) columns are pruned.
+
 .. Workaround sphinx-doc/sphinx#6590
 .. doctest::
     :hide:
@@ -16,8 +30,14 @@
     >>> __name__ = "wltp.pipelines"
 """
 import functools as fnt
+from typing import Dict, Mapping
 
+import networkx as nx
+import pandas as pd
 from graphtik import compose, keyword, modify, operation, optional, sfxed, vararg
+from graphtik.base import Operation
+from graphtik.execution import Solution
+from graphtik.modifier import dep_stripped, get_jsonp, is_sfxed
 from graphtik.pipeline import Pipeline
 
 from . import autograph as autog
@@ -277,18 +297,20 @@ def n_max_pipeline(aug: autog.Autograph = None, **pipeline_kw) -> Pipeline:
 
 
 @fnt.lru_cache()
-def cycler_pipeline(
+def cycle_phases_pipeline(
     aug: autog.Autograph = None, domain=("cycle", None), **pipeline_kw
 ) -> Pipeline:
     """
-    Main pipeline to "run" the cycle.
+    Pipeline to start the cycle from its velocities, up to the phase markers.
+
+    Its results depend only on the class & the scaled velocity
+    (see :func:`.cycler.get_class_cycle()`).
 
     .. graphtik::
-        :height: 600
         :hide:
-        :name: cycler_pipeline
+        :name: cycle_phases_pipeline
 
-        >>> pipe = cycler_pipeline()
+        >>> pipe = cycle_phases_pipeline()
     """
     aug = aug or wio.make_autograph(domain=domain)
     ops = aug.wrap_funcs(
@@ -305,12 +327,46 @@ def cycler_pipeline(
             cycler.PhaseMarker.calc_phase_initaccel,
             cycler.PhaseMarker.calc_phase_stopdecel,
             cycler.PhaseMarker.calc_phase_up,
-            *gwots_pipeline(aug).ops,
-            *p_req_pipeline(aug).ops,
-            *n_max_pipeline(aug).ops,
-            engine.validate_n_max,
-            wio.GearMultiIndexer.from_df,
-            cycler.join_gwots_with_cycle,
+        ]
+    )
+    pipe = compose(..., *ops, **pipeline_kw)
+
+    return pipe
+
+
+@fnt.lru_cache()
+def cycler_pipeline(
+    aug: autog.Autograph = None,
+    domain=("cycle", None),
+    flags_engine="numpy",
+    class_cycle=False,
+    **pipeline_kw,
+) -> Pipeline:
+    """
+    Main pipeline to "run" the cycle.
+
+    :param flags_engine:
+        how to calculate the "initial gear" flags:
+
+        - ``numpy``: all at once on arrays, with :func:`.cycler.calc_gear_flags()`;
+        - ``pandas``: rule by rule on dataframes, with the original
+          :func:`.cycler.calc_OK_min_n()` & co (slower, kept for reference).
+    :param class_cycle:
+        when true, the cycle starts from a ``class_cycle`` input
+        (see :func:`.cycler.get_class_cycle()`), instead of
+        the ops of :func:`cycle_phases_pipeline()` building it from velocities.
+
+    .. graphtik::
+        :height: 600
+        :hide:
+        :name: cycler_pipeline
+
+        >>> pipe = cycler_pipeline()
+    """
+    if flags_engine == "numpy":
+        flags_funcs = [cycler.calc_gear_flags]
+    elif flags_engine == "pandas":
+        flags_funcs = [
             cycler.calc_P_remain,
             cycler.calc_OK_p,
             cycler.calc_OK_max_n,
@@ -319,6 +375,25 @@ def cycler_pipeline(
             cycler.derrive_ok_n_flags,
             # cycler.concat_frame_columns,
             cycler.calc_ok_gears,
+        ]
+    else:
+        raise ValueError(f"Unknown flags_engine({flags_engine!r})!")
+
+    aug = aug or wio.make_autograph(domain=domain)
+    if class_cycle:
+        phases_ops = [cycler.init_cycle_from_class_cycle]
+    else:
+        phases_ops = cycle_phases_pipeline(aug).ops
+    ops = aug.wrap_funcs(
+        [
+            *phases_ops,
+            *gwots_pipeline(aug).ops,
+            *p_req_pipeline(aug).ops,
+            *n_max_pipeline(aug).ops,
+            engine.validate_n_max,
+            wio.GearMultiIndexer.from_df,
+            cycler.join_gwots_with_cycle,
+            *flags_funcs,
             cycler.make_incrementing_gflags,
             cycler.make_G_min,
             cycler.make_G_max0,
@@ -327,3 +402,179 @@ def cycler_pipeline(
     pipe = compose(..., *ops, **pipeline_kw)
 
     return pipe
+
+
+def _provided_doc(dep: str) -> str:
+    """The name of the (top) document a dependency belongs to."""
+    path = get_jsonp(dep)
+    return path[0] if path else dep_stripped(dep)
+
+
+def _modified(op: Operation) -> list:
+    """The `provides` of `op` modifying *in-place* documents it also `needs`."""
+    needs = {_provided_doc(dep) for dep in op.needs}
+    return [
+        dep for dep in op.provides if is_sfxed(dep) and dep_stripped(dep) in needs
+    ]
+
+
+class WhatIf:
+    """
+    A session keeping the last :term:`graphtik:solution` of a pipeline, to recompute
+    only the operations downstream of the inputs edited.
+
+    **Example:**
+
+    .. code-block:: python
+
+        wi = WhatIf(cycler_pipeline(class_cycle=True), inputs)
+        sol = wi.update(f2=0.03)  # re-runs P_resist, P_req & gear-flags, not `gwots`
+
+    The values produced upstream are fed back as inputs and the downstream ops
+    are selected with a `predicate`, since :term:`graphtik:recompute` by
+    `recompute_from` would re-run also the ops providing the :term:`graphtik:sideffected`
+    documents (e.g. ``cycle``).
+    The columns of such documents provided by downstream ops
+    (the :term:`graphtik:jsonp` dependencies, e.g. ``cycle/P_req``) are dropped
+    before recomputing, to be appended again.
+    """
+
+    def __init__(self, pipe: Pipeline, inputs: Mapping, **compute_kw):
+        """
+        :param pipe:
+            the pipeline to run; its plan (dependency graph) is solved
+            just once, on the 1st (full) computation
+        :param inputs:
+            the initial inputs, computed immediately
+        :param compute_kw:
+            passed to all :meth:`graphtik.pipeline.Pipeline.compute()` calls
+            (e.g. `outputs` or `callbacks`)
+        """
+        self.pipe = pipe
+        self.compute_kw = compute_kw
+        #: the current inputs, including all edits
+        self.inputs = dict(inputs)
+        #: the last solution, the union of all computations after the edits
+        self.solution = pipe.compute(dict(self.inputs), **compute_kw)
+        #: the dependency graph of the 1st (full) computation
+        self.dag = self.solution.plan.dag
+        #: the ops executed on the last :meth:`update()`
+        self.executed = list(self.solution.executed)
+
+    def downstream_ops(self, *names: str) -> set:
+        """
+        The operations of the last plan depending (transitively) on any of `names`.
+
+        If any of them modifies *in-place* a document (e.g. ``cycle``
+        by :func:`.cycler.join_gwots_with_cycle()`), all the ops providing
+        to that document (and their dependents) are included, to rebuild it.
+        """
+        dag = self.dag
+        all_ops = [n for n in dag if isinstance(n, Operation)]
+        ops: set = set()
+        sources = [n for n in names if n in dag]
+        while sources:
+            nodes = set()
+            for node in sources:
+                nodes.update(nx.descendants(dag, node))
+            new_ops = {n for n in nodes if isinstance(n, Operation)} - ops
+            ops.update(new_ops)
+
+            docs = {_provided_doc(dep) for op in new_ops for dep in _modified(op)}
+            sources = [
+                op
+                for op in all_ops
+                if op not in ops and any(_provided_doc(d) in docs for d in op.provides)
+            ]
+            ops.update(sources)
+
+        return ops
+
+    def _upstream_values(self, ops: set) -> dict:
+        """
+        The values of the last solution not provided by `ops`, plus the
+        :term:`graphtik:sideffected` tokens they need from the ops not re-run.
+        """
+        values = {k: v for k, v in self.solution.items() if not is_sfxed(k)}
+        doc_cols: Dict[str, set] = {}
+        provides = set()
+        for op in ops:
+            provides.update(op.provides)
+            for dep in op.provides:
+                path = get_jsonp(dep)
+                if path and len(path) > 1:
+                    doc_cols.setdefault(path[0], set()).add(path[1])
+                elif dep not in _modified(op):
+                    values.pop(dep_stripped(dep), None)
+        for doc in {_provided_doc(dep) for op in ops for dep in _modified(op)}:
+            ## Not rebuilt (e.g. given as input), so copy it,
+            #  not to corrupt the last solution.
+            if isinstance(values.get(doc), pd.DataFrame):
+                values[doc] = values[doc].copy()
+
+        for doc, cols in doc_cols.items():
+            df = values.get(doc)
+            if isinstance(df, pd.DataFrame):
+                ## Drop also the sub-columns of multi-indexed columns (e.g. `P_remain/g1`).
+                values[doc] = df.drop(
+                    columns=[
+                        c
+                        for c in df.columns
+                        if (c[0] if isinstance(c, tuple) else c) in cols
+                    ]
+                )
+
+        for op in ops:
+            for dep in op.needs:
+                if is_sfxed(dep) and dep not in provides:
+                    doc = dep_stripped(dep)
+                    if doc in values:
+                        values[dep] = values[doc]
+
+        return values
+
+    def update(self, **changes) -> Solution:
+        """
+        Edit some inputs, and recompute only the ops downstream of them.
+
+        :param changes:
+            the new values for some of the :attr:`inputs` (or even intermediate
+            values of the :attr:`solution`, overriding their computation)
+        :return:
+            the new :attr:`solution`, containing all values (computed or not),
+            with any *jsonp* documents in their previous column-order
+        """
+        self.inputs.update(changes)
+        ops = self.downstream_ops(*changes)
+        prev_sol = self.solution
+
+        values = self._upstream_values(ops)
+        values.update(changes)
+        sol = self.pipe.compute(
+            values, predicate=lambda op, _node_attrs: op in ops, **self.compute_kw
+        )
+        if "outputs" not in self.compute_kw:
+            ## Any ops pruned (e.g. for missing inputs) would leave stale values.
+            pruned = ops - set(sol.executed)
+            if pruned:
+                raise ValueError(
+                    f"Cannot recompute {sorted(op.name for op in pruned)}"
+                    f" after changing {list(changes)}!"
+                )
+
+        for name, prev in prev_sol.items():
+            df = sol.get(name)
+            if (
+                isinstance(prev, pd.DataFrame)
+                and isinstance(df, pd.DataFrame)
+                and df is not prev
+                and set(df.columns) == set(prev.columns)
+            ):
+                sol[name] = df[prev.columns]
+        for name in [k for k in sol if is_sfxed(k)]:
+            del sol[name]
+
+        self.solution = sol
+        self.executed = list(sol.executed)
+
+        return sol
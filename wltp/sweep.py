@@ -0,0 +1,581 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013-2020 European Commission (JRC);
+# Licensed under the EUPL (the 'Licence');
+# You may not use this work except in compliance with the Licence.
+# You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl
+"""
+sweep a vehicle over a grid (or random samples) of overrides, computing once the parts not varying
+
+The points may vary only the :data:`sweepable_items` (mass, road-loads & power), so that
+the wot & its interpolation on the v-grid (`gwots`) are shared by all points,
+the scalars (`v_max`, `pmr`, class, `f_dsc`) are calculated as array-operations
+across the points, and cycles are built once per distinct ``(class, f_dsc)``
+(see :func:`.cycler.get_class_cycle()`).
+When asked, the cycles of the points sharing a class-cycle run also as array-ops,
+evaluating their `P_req` and gear-flags at once (see :func:`run_cycles()`).
+
+**Example:**
+
+.. code-block:: python
+
+    from wltp import sweep
+
+    table = sweep.sweep(mdl, {"test_mass": range(1200, 2001, 100), "f2": [0.03, 0.04]})
+
+    ## Uncertainty of 2% in road-loads & 1% in mass.
+    mc = sweep.monte_carlo(
+        mdl, {"f0": 0.02, "f1": 0.02, "f2": 0.02, "test_mass": 0.01}, relative=True
+    )
+    mc.stats.loc["v_max", ["mean", "5%", "95%"]]
+
+.. Workaround sphinx-doc/sphinx#6590
+.. doctest::
+    :hide:
+
+    >>> from wltp.sweep import *
+    >>> __name__ = "wltp.sweep"
+"""
+import itertools as itt
+import logging
+from typing import Mapping, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from . import cycler, datamodel, downscale, engine, nmindrive, vehicle
+from . import io as wio
+from . import vmax
+
+log = logging.getLogger(__name__)
+
+#: The model items that the points of :func:`sweep()` may vary;
+#: all the rest (e.g. `wot`, `n2v_ratios`) are shared by all points,
+#: but a different `p_rated` scales also the power of the `wot`
+#: (as if it were normalized).
+sweepable_items = (
+    "test_mass",
+    "f0",
+    "f1",
+    "f2",
+    "f_safety_margin",
+    "f_inertial",
+    "p_rated",
+)
+
+#: The :data:`sweepable_items` that must be positive, or their points fail
+#: (e.g. the tails of :func:`monte_carlo()` samples with large sigmas).
+positive_items = ("test_mass", "p_rated")
+
+#: The scalar model items calculated for each point by :func:`sweep()`.
+sweep_outputs = (
+    "pmr",
+    "v_max",
+    "n_vmax",
+    "g_vmax",
+    "is_n_lim_vmax",
+    "wltc_class",
+    "f_dsc_raw",
+    "f_dsc",
+)
+
+#: The model items added by :func:`sweep()` when running also the cycles,
+#: followed by the time-shares of each gear in the `G_max0` cycle-column
+#: (the 1st estimation of the gears, see :func:`.cycler.make_G_max0()`),
+#: in columns ``g0_share``, ``g1_share``, ...
+cycle_outputs = ("n_max1", "n_max2", "n_max3", "n_max")
+
+#: The quantiles of the :func:`monte_carlo()` stats.
+mc_quantiles = (0.05, 0.5, 0.95)
+
+
+def grid_points(grid: Union[Mapping[str, Sequence], pd.DataFrame]) -> pd.DataFrame:
+    """
+    The points of a `grid`, one per row.
+
+    :param grid:
+        either a mapping of :data:`sweepable_items` to their values,
+        expanded to all their combinations, or a dataframe with a row per point
+    :raise ValueError:
+        for non-sweepable items
+
+    **Example:**
+
+    >>> grid_points({"test_mass": [1000, 1100], "f2": [0.03, 0.04]})
+       test_mass    f2
+    0       1000  0.03
+    1       1000  0.04
+    2       1100  0.03
+    3       1100  0.04
+    """
+    if isinstance(grid, pd.DataFrame):
+        points = grid.reset_index(drop=True)
+    else:
+        points = pd.DataFrame(
+            list(itt.product(*grid.values())), columns=list(grid.keys())
+        )
+    _check_sweepable(points.columns)
+
+    return points
+
+
+def _check_sweepable(items):
+    unknown = set(items) - set(sweepable_items)
+    if unknown:
+        raise ValueError(
+            f"Cannot sweep items {sorted(unknown)}, only: {', '.join(sweepable_items)}"
+        )
+
+
+def _point_values(mdl: Mapping, points: pd.DataFrame) -> dict:
+    """The sweepable items as ``(points, 1)`` arrays, from the grid or the model."""
+    npoints = len(points)
+    values = {
+        i: points[i].to_numpy(float).reshape(-1, 1)
+        if i in points
+        else np.full((npoints, 1), np.NAN if mdl.get(i) is None else mdl[i], float)
+        for i in sweepable_items
+    }
+    ## Like :meth:`.Experiment._run()`, when all resistances are missing.
+    if all(mdl.get(f) is None and f not in points for f in ("f0", "f1", "f2")):
+        f0, f1, f2 = vehicle.calc_default_resistance_coeffs(
+            values["test_mass"], mdl["resistance_coeffs_regression_curves"]
+        )
+        values.update(f0=f0, f1=f1, f2=f2)
+
+    return values
+
+
+def _error_line(ex: Exception) -> str:
+    return f"{type(ex).__name__}: {ex}".splitlines()[0]
+
+
+def _prepare_model(mdl: Mapping, **experiment_kw) -> dict:
+    from .experiment import Experiment
+
+    m = wio.pstep_factory.get()
+
+    mdl = Experiment(mdl, **experiment_kw).model
+    if mdl.get(m.cycle) is not None:
+        raise ValueError("Cannot sweep a model with a forced `cycle`!")
+
+    return mdl
+
+
+def calc_points(
+    mdl: Mapping, points: pd.DataFrame, gwots: pd.DataFrame = None
+) -> pd.DataFrame:
+    """
+    Calculate the :data:`sweep_outputs` for all `points` of a model as array-ops.
+
+    :param mdl:
+        a validated model (e.g. :attr:`.Experiment.model`)
+    :param points:
+        a dataframe with a row per point, and columns from :data:`sweepable_items`
+    :param gwots:
+        the interpolated wot of the model, if already calculated
+        (see :func:`.engine.interpolate_wot_on_v_grid()`)
+    :return:
+        a new table with the columns of `points`, the :data:`sweep_outputs`,
+        and an ``error`` column with the exception-line of any failed point
+    """
+    m = wio.pstep_factory.get()
+
+    npoints = len(points)
+    vals = _point_values(mdl, points)
+    errors = np.full(npoints, None, dtype=object)
+
+    p_rated = vals["p_rated"]
+    if gwots is None:
+        gwots = engine.interpolate_wot_on_v_grid(mdl[m.wot], mdl[m.n2v_ratios])
+
+    V_grid = gwots.index.to_numpy()
+    p_resist = vehicle.calc_p_resist(V_grid, vals["f0"], vals["f1"], vals["f2"])
+    p_wot_scale = p_rated / mdl[m.p_rated]
+    v_max_rec = vmax.calc_v_max_many(
+        gwots,
+        p_resist,
+        vals["f_safety_margin"],
+        None if (p_wot_scale == 1).all() else p_wot_scale,
+    )
+    errors[np.isnan(v_max_rec.v_max)] = "ValueError: Cannot find v_max!"
+    del p_resist
+    for item in positive_items:
+        errors[vals[item][:, 0] <= 0] = f"ValueError: Non-positive {item}!"
+
+    p_rated = p_rated[:, 0]
+    test_mass = vals["test_mass"][:, 0]
+    unladen_mass = mdl.get(m.unladen_mass) or test_mass - mdl[m.driver_mass]
+    pmr = vehicle.calc_p_m_ratio(p_rated, unladen_mass)
+
+    wltc_class = np.full(npoints, mdl.get(m.wltc_class), dtype=object)
+    if mdl.get(m.wltc_class) is None:
+        classes = mdl["wltc_data"]["classes"]
+        for i in np.flatnonzero(pd.isnull(errors)):
+            try:
+                wltc_class[i] = vehicle.decide_wltc_class(
+                    classes, float(pmr[i]), v_max_rec.v_max[i]
+                )
+            except ValueError as ex:
+                errors[i] = _error_line(ex)
+
+    f_dsc_raw = np.full(npoints, np.NAN)
+    f_dsc = np.full(npoints, np.NAN)
+    if mdl.get(m.f_dsc):
+        f_dsc[:] = mdl[m.f_dsc]
+    else:
+        for cls in set(wltc_class[pd.isnull(errors)]):
+            ii = (wltc_class == cls) & pd.isnull(errors)
+            dsc_data = datamodel.get_class(cls, mdl=mdl)["downscale"]
+            f_dsc_raw[ii] = downscale.calc_f_dsc_raw(
+                dsc_data["p_max_values"],
+                dsc_data["factor_coeffs"],
+                p_rated[ii],
+                *(vals[i][ii, 0] for i in ("test_mass", "f0", "f1", "f2")),
+                vals["f_inertial"][ii, 0],
+            )
+            f_dsc[ii] = downscale.calc_f_dsc(
+                f_dsc_raw[ii], mdl[m.f_dsc_threshold], mdl[m.f_dsc_decimals]
+            )
+
+    table = points.reset_index(drop=True)
+    table[m.pmr] = pmr
+    table[m.v_max] = v_max_rec.v_max
+    table[m.n_vmax] = v_max_rec.n_vmax
+    table[m.g_vmax] = v_max_rec.g_vmax
+    table[m.is_n_lim_vmax] = v_max_rec.is_n_lim
+    table[m.wltc_class] = wltc_class
+    table[m.f_dsc_raw] = f_dsc_raw
+    table[m.f_dsc] = f_dsc
+    table["error"] = errors
+
+    return table
+
+
+def sweep(
+    mdl: Mapping,
+    grid: Union[Mapping[str, Sequence], pd.DataFrame],
+    *,
+    with_cycle=False,
+    **experiment_kw,
+) -> pd.DataFrame:
+    """
+    Calculate the scalar results of a vehicle for all points of a `grid` of overrides.
+
+    :param mdl:
+        the base vehicle-model, validated once (see :class:`.Experiment`);
+        a forced `wltc_class` or `f_dsc` applies to all points,
+        but a forced cycle is not supported.
+    :param grid:
+        the overrides of the :data:`sweepable_items`, see :func:`grid_points()`
+    :param with_cycle:
+        when true, run also the cycle of each point, to collect :data:`cycle_outputs`
+        (slower, ~1ms/point, plus ~25ms for each distinct class-cycle & `f_dsc`)
+    :param experiment_kw:
+        passed to :class:`.Experiment` validating `mdl`
+    :return:
+        a *tidy* table with a row per point of the `grid`, with the swept items,
+        the :data:`sweep_outputs` (and :data:`cycle_outputs`),
+        plus an ``error`` column with the exception-line of any failed point
+        (see :func:`calc_points()`)
+    """
+    mdl = _prepare_model(mdl, **experiment_kw)
+    table = calc_points(mdl, grid_points(grid))
+    if with_cycle:
+        table = run_cycles(mdl, table)
+
+    return table
+
+
+def _with_nan_row(grid_values: np.ndarray) -> np.ndarray:
+    """Append a NAN row, for the ``-1`` of :meth:`pd.Index.get_indexer()`."""
+    return np.vstack((grid_values, np.full((1, grid_values.shape[1]), np.NAN)))
+
+
+def _p_avails(gwots: pd.DataFrame, gears, f_safety_margins) -> np.ndarray:
+    """The `p_avail` of the `gwots` for all `f_safety_margins`: (fsm, V, gear)."""
+    w = wio.pstep_factory.get().wot
+
+    return np.stack(
+        [
+            _with_nan_row(
+                engine.attach_p_avail_in_gwots(gwots.copy(), f_safety_margin=fsm)
+                .loc[:, w.p_avail]
+                .loc[:, gears]
+                .to_numpy(float)
+            )
+            for fsm in f_safety_margins
+        ]
+    )
+
+
+def run_cycles(
+    mdl: Mapping,
+    table: pd.DataFrame,
+    gwots: pd.DataFrame = None,
+    chunksize: int = 100,
+) -> pd.DataFrame:
+    """
+    Run the cycle of each ok point, as array-ops across the points sharing a cycle.
+
+    The points with the same ``(wltc_class, f_dsc)`` run the same class-cycle
+    (see :func:`.cycler.get_class_cycle()`) & `gwots`, differing only in their
+    `P_req`, `P_avail` & `n_max`, so the cycles of those having also the same `g_vmax`
+    are stacked one after the other, in chunks of `chunksize` points, and
+    their gear-flags evaluated at once by :func:`.cycler.calc_gear_flags_arrays()`.
+
+    The `P_avail` of a point with a different `p_rated` is the one of the model
+    scaled (not interpolated from a scaled wot), so its flags may differ from
+    an :class:`.Experiment` only where power is short by a float-rounding.
+
+    :param mdl:
+        a validated model
+    :param table:
+        as returned by :func:`calc_points()`
+    :param gwots:
+        the interpolated wot of the model, if already calculated
+    :param chunksize:
+        the points stacked at once, bounding the memory of
+        the ``(chunksize x cycle, gear)`` arrays
+    :return:
+        a new table with the :data:`cycle_outputs` (and gear-shares) appended
+        (before the ``error`` column), and any cycle-errors in ``error``
+    """
+    m = wio.pstep_factory.get()
+    c = m.cycle
+    w = m.wot
+
+    npoints = len(table)
+    vals = _point_values(mdl, table)
+    errors = table["error"].to_numpy(copy=True)
+    n2v_ratios = mdl[m.n2v_ratios]
+    ngears = len(n2v_ratios)
+    outputs = {i: np.full(npoints, np.NAN) for i in cycle_outputs}
+    shares = np.full((ngears + 1, npoints), np.NAN)
+
+    wot = mdl[m.wot]
+    _n95_low, n95_high = engine.calc_n95(wot, mdl[m.n_rated], mdl[m.p_rated])
+    nmins = {i: mdl.get(i) for i in nmindrive.NMinDrives._fields}
+    if any(v is None for v in nmins.values()):
+        nmins = nmindrive.n_min_drives_from_model(mdl).vehicle(0)._asdict()
+    if gwots is None:
+        gwots = engine.interpolate_wot_on_v_grid(wot, n2v_ratios)
+    gears = wio.GearMultiIndexer.from_df(gwots)[:]
+    N_grid = _with_nan_row(gwots[w.n].loc[:, gears].to_numpy(float))
+
+    p_wot_scale = vals["p_rated"][:, 0] / mdl[m.p_rated]
+    fsms, fsm_idx = np.unique(vals["f_safety_margin"][:, 0], return_inverse=True)
+    p_avails = _p_avails(gwots, gears, fsms)
+    v_grid_idx = pd.Index(gwots.index)
+
+    ok = np.flatnonzero(pd.isnull(errors))
+    ## Plain strings, not to have pandas probe the `name` of the psteps.
+    keys = [str(k) for k in (m.wltc_class, m.f_dsc, m.g_vmax)]
+    groups = table.iloc[ok].groupby(keys, sort=False)
+    for (wltc_class, f_dsc, g_vmax), ii in groups.indices.items():
+        ii = ok[ii]
+        try:
+            cc = cycler.get_class_cycle(
+                wltc_class,
+                f_dsc,
+                f_running_threshold=mdl[m.f_running_threshold],
+                f_up_threshold=mdl[m.f_up_threshold],
+                phase_repeat_threshold=mdl.get(
+                    m.phase_repeat_threshold, cycler.PhaseMarker.phase_repeat_threshold
+                ),
+            )
+            arrays = dict(zip(cc.columns, cc.arrays))
+            V, A = arrays[c.V], arrays[c.A]
+            phases = [
+                np.asarray(arrays[i], dtype=bool)
+                for i in (c.run, c.stop, c.initaccel, c.stopdecel, c.up)
+            ]
+            ## The `gwots` joined on the cycle, NANs outside the v-grid (e.g. stops),
+            #  like :func:`.cycler.join_gwots_with_cycle()`.
+            vpos = v_grid_idx.get_indexer(V)
+            N = N_grid[vpos]
+
+            n2v_g_vmax = engine.calc_n2v_g_vmax(g_vmax, n2v_ratios)
+            n_max_cycle = engine.calc_n_max_cycle(n2v_g_vmax, V)
+            n_max_vehicle = n2v_g_vmax * table[m.v_max].to_numpy(float)[ii]
+            n_max = np.maximum(np.maximum(n95_high, n_max_cycle), n_max_vehicle)
+        except Exception as ex:
+            log.debug("Sweep points %s failed!", ii, exc_info=True)
+            errors[ii] = _error_line(ex)
+            continue
+
+        for i, n in zip(ii, n_max):
+            try:
+                engine.validate_n_max(wot, n)
+            except ValueError as ex:
+                errors[i] = _error_line(ex)
+        valid = pd.isnull(errors[ii])
+        ii = ii[valid]
+        outputs[m.n_max1][ii] = n95_high
+        outputs[m.n_max2][ii] = n_max_cycle
+        outputs[m.n_max3][ii] = n_max_vehicle[valid]
+        outputs[m.n_max][ii] = n_max[valid]
+
+        for start in range(0, len(ii), chunksize):
+            jj = ii[start : start + chunksize]
+            npts = len(jj)
+            P_req = vehicle.calc_required_power(
+                vehicle.calc_p_resist(V, *(vals[k][jj] for k in (m.f0, m.f1, m.f2))),
+                vehicle.calc_inertial_power(
+                    V, A, vals[m.test_mass][jj], vals[m.f_inertial][jj]
+                ),
+            )
+            P_avail = p_avails[fsm_idx[jj, None], vpos] * p_wot_scale[jj, None, None]
+            flags = cycler.calc_gear_flags_arrays(
+                np.tile(N, (npts, 1)),
+                P_avail.reshape(-1, ngears),
+                P_req.reshape(-1),
+                *(np.tile(phase, npts) for phase in phases),
+                g_vmax,
+                n95_high,
+                n_max_cycle,
+                nmins["n_min_drive2_stopdecel"],
+                nmins["n_min_drive2"],
+                nmins["n_min_drive_up_start"],
+            )
+
+            ## The highest gear allowed, like :func:`.cycler.make_G_max0()`
+            #  on the :func:`.cycler.make_incrementing_gflags()`.
+            ok_gear = flags[c.OK_gear].reshape(npts, len(V), ngears + 1)
+            G_max0 = (ok_gear * np.arange(ngears + 1, dtype="int8")).max(axis=-1)
+            for g in range(ngears + 1):
+                shares[g, jj] = (G_max0 == g).mean(axis=1)
+
+    table = table.drop(columns="error")
+    for item, values in outputs.items():
+        table[item] = values
+    for g, values in enumerate(shares):
+        table[f"{wio.gear_name(g)}_share"] = values
+    table["error"] = errors
+
+    return table
+
+
+class MonteCarloResults(NamedTuple):
+    """The outcome of :func:`monte_carlo()`. """
+
+    #: the table of all samples, as returned by :func:`calc_points()`
+    #: (and :func:`run_cycles()` for the 1st `cycle_samples`)
+    samples: pd.DataFrame
+    #: the *count*, *mean*, *std*, *min*, quantiles & *max* of the numeric outputs
+    #: of the samples not failed, indexed by output
+    stats: pd.DataFrame
+    #: the fractions of all samples for each value of ``wltc_class``, ``g_vmax`` &
+    #: ``is_n_lim_vmax``, indexed by ``(item, value)``
+    #: (where failed samples have ``None`` class and 0 gear)
+    shares: pd.Series
+
+
+def sample_points(
+    mdl: Mapping,
+    sigmas: Mapping[str, float],
+    nsamples: int,
+    *,
+    relative=False,
+    rng: np.random.Generator = None,
+) -> pd.DataFrame:
+    """
+    Perturb some :data:`sweepable_items` of a validated model with normal noise.
+
+    The samples are not truncated, so a large sigma may draw physically impossible
+    values, e.g. non-positive :data:`positive_items`, that fail
+    in :func:`calc_points()` with an explanatory ``error``.
+
+    :param sigmas:
+        the standard-deviation of each item perturbed
+    :param relative:
+        when true, `sigmas` are fractions of the (absolute) model values
+    :return:
+        a dataframe with a column per item in `sigmas`, and `nsamples` rows
+    :raise ValueError:
+        for items missing from the model (e.g. `f0`, `f1` & `f2`
+        derived from the regression curves)
+    """
+    _check_sweepable(sigmas)
+    unset = [i for i in sigmas if mdl.get(i) is None]
+    if unset:
+        raise ValueError(f"Cannot perturb items missing from the model: {unset}")
+    if rng is None:
+        rng = np.random.default_rng()
+
+    points = {}
+    for item, sigma in sigmas.items():
+        mean = mdl[item]
+        if relative:
+            sigma = abs(sigma * mean)
+        points[item] = rng.normal(mean, sigma, nsamples)
+
+    return pd.DataFrame(points)
+
+
+def monte_carlo(
+    mdl: Mapping,
+    sigmas: Mapping[str, float],
+    nsamples: int = 10_000,
+    *,
+    relative=False,
+    seed: Optional[int] = None,
+    chunksize: int = 1000,
+    quantiles: Sequence[float] = mc_quantiles,
+    cycle_samples: int = 0,
+    **experiment_kw,
+) -> MonteCarloResults:
+    """
+    Estimate the distributions of the results of a vehicle, due to uncertain inputs.
+
+    The samples are calculated in chunks by :func:`calc_points()`, to bound
+    the memory of the ``(chunksize, v_grid)`` road-load arrays.
+
+    :param mdl:
+        the vehicle-model, validated once (see :class:`.Experiment`)
+    :param sigmas:
+        the standard-deviations of the :data:`sweepable_items` measured
+        (e.g. ``f0, f1, f2, test_mass, p_rated``), see :func:`sample_points()`
+    :param seed:
+        for reproducible samples
+    :param cycle_samples:
+        run also the cycles of that many 1st samples (see :func:`run_cycles()`),
+        to include the `n_max` & gear-shares in the stats
+    :param experiment_kw:
+        passed to :class:`.Experiment` validating `mdl`
+    """
+    m = wio.pstep_factory.get()
+
+    mdl = _prepare_model(mdl, **experiment_kw)
+    rng = np.random.default_rng(seed)
+    gwots = engine.interpolate_wot_on_v_grid(mdl[m.wot], mdl[m.n2v_ratios])
+
+    ## Sample all at once, so results do not depend on `chunksize`.
+    points = sample_points(mdl, sigmas, nsamples, relative=relative, rng=rng)
+    chunks = [
+        calc_points(mdl, points.iloc[start : start + chunksize], gwots)
+        for start in range(0, nsamples, chunksize)
+    ]
+    samples = pd.concat(chunks, ignore_index=True)
+
+    if cycle_samples:
+        cycled = run_cycles(mdl, samples.iloc[:cycle_samples], gwots)
+        samples = pd.concat([cycled, samples.iloc[cycle_samples:]], sort=False)
+        samples = samples[cycled.columns]
+
+    numeric = [
+        c
+        for c in samples.columns
+        if c not in (m.g_vmax, m.is_n_lim_vmax) and samples[c].dtype.kind == "f"
+    ]
+    ok = samples[samples["error"].isnull()]
+    stats = ok[numeric].describe(percentiles=quantiles).T
+    shares = pd.concat(
+        {
+            item: samples[item].value_counts(normalize=True, dropna=False)
+            for item in (m.wltc_class, m.g_vmax, m.is_n_lim_vmax)
+        }
+    )
+
+    return MonteCarloResults(samples, stats, shares)
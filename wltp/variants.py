@@ -0,0 +1,418 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013-2020 European Commission (JRC);
+# Licensed under the EUPL (the 'Licence');
+# You may not use this work except in compliance with the Licence.
+# You may obtain a copy of the Licence at: http://ec.europa.eu/idabc/eupl
+"""
+an index identifying the downscaled & capped variants of the class-cycles by their CRC
+
+The nominal class-phases are identified by :func:`.cycles.identify_cycle_v()`,
+but a forced `v_target` that has been downscaled by some `f_dsc` and/or capped
+to some `v_cap` (and compensated, Annex 1-9) needs a full recomputation to classify.
+The :class:`VariantsIndex` maps the CRC32 of all those variants (on the discrete grid
+of `f_dsc_decimals` and integer `v_cap`) back to their parameters,
+and it is persisted in a cache-dir the 1st time it is built (~secs),
+to be just loaded afterwards (see :func:`load_variants_index()`).
+
+**Example:**
+
+.. code-block:: python
+
+    >>> from wltp import variants
+    >>> V = variants.calc_variant_V("class3b", f_dsc=0.05, v_cap=110)
+
+    >>> variants.get_variants_index("~/.cache/wltp").identify(V)  # doctest: +SKIP
+    CycleVariant(cycle='class3b', phase=None, f_dsc=0.05, v_cap=110, compensated=False)
+
+.. Workaround sphinx-doc/sphinx#6590
+.. doctest::
+    :hide:
+
+    >>> from wltp.variants import *
+    >>> __name__ = "wltp.variants"
+"""
+import functools as fnt
+import logging
+import os
+from binascii import crc32
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from . import cycles, datamodel, downscale
+from . import invariants as inv
+
+log = logging.getLogger(__name__)
+
+#: The largest `f_dsc` of the variants indexed (realistic vehicles are well below).
+f_dsc_max = 0.5
+#: The smallest (integer) `v_cap` of the variants indexed.
+v_cap_min = 50
+#: The prefix of the index files in a cache-dir, followed by the key of the grid.
+index_file_prefix = "cycle-variants-"
+
+
+class CycleVariant(NamedTuple):
+    """The parameters producing a velocity trace, as found by :class:`VariantsIndex`."""
+
+    #: the class (e.g. ``class3b``)
+    cycle: str
+    #: like ``phase-1`` (`V` phasing), or None for the full cycle
+    phase: Optional[str]
+    #: the downscaling factor, 0 if not downscaled
+    f_dsc: float
+    #: the capping velocity, None if not capped
+    v_cap: Optional[int]
+    #: whether the capped distance has been compensated (full cycles only)
+    compensated: bool
+
+
+def _dsc_ints(wltc_class: str, f_dsc: float) -> np.ndarray:
+    """The class velocity downscaled by `f_dsc`, in deci-km/h."""
+    V = datamodel.get_class_v_cycle(wltc_class)
+    if f_dsc:
+        phases = datamodel.get_class(wltc_class)["downscale"]["phases"]
+        V = inv.vround(downscale.calc_V_dsc_raw(V, f_dsc, phases))
+
+    return np.rint(V.to_numpy() * 10 ** inv.v_decimals).astype(np.int64)
+
+
+def _compensation(
+    V_capped: np.ndarray, V_dsc: np.ndarray, v_caps: np.ndarray, boundaries
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Where & how many `v_cap` samples to insert, like :func:`.downscale.calc_V_compensated()`.
+
+    :param V_capped:
+        a 2D-array of deci-km/h, a row for each of the `v_caps` (km/h)
+    :return:
+        the 1st capped sample of each phase (columns), and the extra samples there
+    """
+    diffs = V_capped != V_dsc
+    positions = np.zeros((len(V_capped), len(boundaries)), dtype=int)
+    extras = np.zeros_like(positions)
+    for i, (start, end) in enumerate(boundaries):
+        phase_diffs = diffs[:, start:end]
+        delta = (V_dsc[start:end] - V_capped[:, start:end]).sum(axis=1)
+        delta = delta / 10 ** inv.v_decimals
+        positions[:, i] = start + phase_diffs.argmax(axis=1)
+        extras[:, i] = np.where(phase_diffs.any(axis=1), inv.round1(delta / v_caps), 0)
+
+    return positions, extras
+
+
+def _compensated(
+    V_capped: np.ndarray, V_dsc: np.ndarray, v_cap: int, boundaries
+) -> np.ndarray:
+    """Like :func:`.downscale.calc_V_compensated()` on deci-km/h arrays."""
+    _, extras = _compensation(V_capped[None, :], V_dsc, v_cap, boundaries)
+    if not extras.any():
+        return V_capped
+
+    return downscale.compensate_capped(V_dsc, V_capped, extras[0], boundaries)[0]
+
+
+def calc_variant_V(
+    wltc_class: str, f_dsc: float = 0, v_cap: int = None, compensated=False
+) -> np.ndarray:
+    """
+    The velocity (km/h) of a class-cycle downscaled and/or capped.
+
+    Equivalent to the traces of :func:`.pipelines.compensate_capped_pipeline()`,
+    but fast, for building & testing the :class:`VariantsIndex`.
+
+    :param compensated:
+        when true, the capped distance is compensated by extra `v_cap` samples
+    """
+    V_dsc = _dsc_ints(wltc_class, f_dsc)
+    V = V_dsc
+    if v_cap:
+        V = np.minimum(V_dsc, v_cap * 10 ** inv.v_decimals)
+        if compensated:
+            lengths = datamodel.get_class(wltc_class)["lengths"]
+            boundaries = cycles.get_class_phase_boundaries(lengths, None)
+            V = _compensated(V, V_dsc, v_cap, boundaries)
+
+    return V / 10 ** inv.v_decimals
+
+
+def _trace_key(V_ints: np.ndarray) -> int:
+    """The length & CRC32 of a trace of deci-km/h, as in :func:`.cycles.crc_velocity()`."""
+    return (len(V_ints) << 32) | crc32(V_ints.astype(cycles.packed_V_dtype))
+
+
+def _compensated_key(
+    V16: np.ndarray, positions, extras, v_cap: int, end: int
+) -> Optional[int]:
+    """The :func:`_trace_key()` of :func:`_compensated()`, without building it."""
+    wedge = np.full(extras.max(), v_cap * 10 ** inv.v_decimals, V16.dtype)
+    crc = length = prev = 0
+    for pos, extra in zip(positions, extras):
+        if extra:
+            crc = crc32(wedge[:extra], crc32(V16[prev:pos], crc))
+            length += pos - prev + extra
+            prev = pos
+    crc = crc32(np.zeros(1, V16.dtype), crc32(V16[prev:end], crc))
+    length += end - prev + 1
+
+    return (length << 32) | crc
+
+
+def f_dsc_grid(f_dsc_max: float = f_dsc_max) -> np.ndarray:
+    """The `f_dsc` values above the default threshold, rounded to the default decimals."""
+    shapes = datamodel.model_item_shapes()
+    decimals = shapes["f_dsc_decimals"].default
+    threshold = shapes["f_dsc_threshold"].default
+    steps = np.arange(
+        round(threshold * 10 ** decimals) + 1, round(f_dsc_max * 10 ** decimals) + 1
+    )
+
+    return (steps / 10 ** decimals).round(decimals)
+
+
+def iter_class_variants(
+    wltc_class: str, f_dscs: Iterable[float], v_cap_min: int = v_cap_min
+) -> Iterator[Tuple[int, CycleVariant]]:
+    """
+    Generate the keys of all traces of a class differing from its nominal phases.
+
+    :param f_dscs:
+        the downscaling factors to vary, besides 0
+    :return:
+        pairs of ``(key, variant)``, where `key` is the length (high bits)
+        and the CRC32 of the trace (low bits); the same trace may be generated
+        by several variants, so keep the 1st one (the least downscaled & capped)
+    """
+    class_data = datamodel.get_class(wltc_class)
+    boundaries = cycles.get_class_phase_boundaries(class_data["lengths"], None)
+    dsc_phases = class_data["downscale"]["phases"]
+    t_dsc_start, _, t_dsc_end = dsc_phases
+    v_scale = 10 ** inv.v_decimals
+    f_dscs = (0, *f_dscs)
+    V_dscs = downscale.calc_V_dsc_batch(
+        datamodel.get_class_v_cycle(wltc_class), f_dscs, dsc_phases
+    )
+    V_dscs = np.rint(V_dscs * v_scale).astype(np.int64)
+    nominal = V_dscs[0]
+
+    for f_dsc, V_dsc in zip(f_dscs, V_dscs):
+        v_caps = np.arange(v_cap_min, -(-V_dsc.max() // v_scale))
+        V_capped = np.minimum(V_dsc, v_caps[:, None] * v_scale)
+        if f_dsc:
+            V_capped = np.vstack((V_dsc, V_capped))
+            v_caps = (None, *v_caps.tolist())
+        else:
+            v_caps = v_caps.tolist()
+
+        ## Phases (`V` phasing) changed by capping, or by this `f_dsc`.
+        phases = [
+            (f"phase-{i}", start, end)
+            for i, (start, end) in enumerate(boundaries, 1)
+            if not f_dsc or (start <= t_dsc_end and t_dsc_start <= end)
+        ]
+        changed = [
+            (V_capped[:, start : end + 1] != nominal[start : end + 1]).any(axis=1)
+            for _, start, end in phases
+        ]
+
+        is_capped = np.array([bool(v) for v in v_caps])
+        positions, extras = _compensation(
+            V_capped[is_capped],
+            V_dsc,
+            np.array(v_caps)[is_capped].astype(int),
+            boundaries,
+        )
+        compensations = iter(zip(positions, extras))
+
+        V_capped = V_capped.astype(cycles.packed_V_dtype)
+        for i, (V, v_cap) in enumerate(zip(V_capped, v_caps)):
+            yield _trace_key(V), CycleVariant(wltc_class, None, f_dsc, v_cap, False)
+            for (phase, start, end), phase_changed in zip(phases, changed):
+                if phase_changed[i]:
+                    yield (
+                        _trace_key(V[start : end + 1]),
+                        CycleVariant(wltc_class, phase, f_dsc, v_cap, False),
+                    )
+            if v_cap:
+                pos, extra = next(compensations)
+                if extra.any():
+                    key = _compensated_key(V, pos, extra, v_cap, boundaries[-1][-1])
+                    yield key, CycleVariant(wltc_class, None, f_dsc, v_cap, True)
+
+
+class VariantsIndex:
+    """
+    Map the CRC32 of the downscaled & capped variants of all classes to their parameters.
+
+    Build it (or load it from a cache-dir) with :func:`get_variants_index()`.
+    """
+
+    def __init__(self, keys: np.ndarray, variants: Dict[str, np.ndarray]):
+        """
+        :param keys:
+            the ``length << 32 | crc32`` of each trace
+        :param variants:
+            the columns of :class:`CycleVariant` as arrays aligned with `keys`,
+            with `phase` numbered (0 for None) and `v_cap` 0 for None
+        """
+        #: the arrays persisted (see :meth:`save()`)
+        self.arrays = {"keys": keys, **variants}
+        self._rows = dict(zip(keys.tolist(), range(len(keys))))
+        self._cycles = variants["cycle"].tolist()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({len(self)} variants)"
+
+    @classmethod
+    def build(cls, f_dscs: Iterable[float], v_cap_min: int = v_cap_min):
+        """Generate the variants of all classes (see :func:`iter_class_variants()`)."""
+        f_dscs = list(f_dscs)
+        rows: Dict[int, CycleVariant] = {}
+        for wltc_class in datamodel.get_class_names():
+            for key, variant in iter_class_variants(wltc_class, f_dscs, v_cap_min):
+                rows.setdefault(key, variant)
+
+        variants = list(rows.values())
+        return cls(
+            np.fromiter(rows.keys(), dtype=np.uint64, count=len(rows)),
+            {
+                "cycle": np.array([v.cycle for v in variants]),
+                "phase": np.array(
+                    [int(v.phase[6:]) if v.phase else 0 for v in variants], np.int8
+                ),
+                "f_dsc": np.array([v.f_dsc for v in variants], float),
+                "v_cap": np.array([v.v_cap or 0 for v in variants], np.int16),
+                "compensated": np.array([v.compensated for v in variants], bool),
+            },
+        )
+
+    @classmethod
+    def load(cls, fpath: Union[str, Path]) -> "VariantsIndex":
+        with np.load(fpath, allow_pickle=False) as npz:
+            arrays = dict(npz.items())
+
+        return cls(arrays.pop("keys"), arrays)
+
+    def save(self, fpath: Union[str, Path]):
+        """Write the index atomically, for concurrent processes to :meth:`load()`."""
+        fpath = Path(fpath)
+        fpath.parent.mkdir(parents=True, exist_ok=True)
+        tmp_fpath = fpath.with_name(f"{fpath.stem}.{os.getpid()}.tmp.npz")
+        np.savez(tmp_fpath, **self.arrays)
+        os.replace(tmp_fpath, fpath)
+
+    def lookup(self, key: int) -> Optional[CycleVariant]:
+        """
+        :param key:
+            the ``length << 32 | crc32`` of a trace (see :meth:`identify()`)
+        :return:
+            the variant, or None if unknown
+        """
+        i = self._rows.get(key)
+        if i is None:
+            return None
+
+        arrays = self.arrays
+        phase = int(arrays["phase"][i])
+        v_cap = int(arrays["v_cap"][i])
+        return CycleVariant(
+            self._cycles[i],
+            f"phase-{phase}" if phase else None,
+            float(arrays["f_dsc"][i]),
+            v_cap or None,
+            bool(arrays["compensated"][i]),
+        )
+
+    def identify(self, V: Iterable) -> Optional[CycleVariant]:
+        """
+        Find the parameters of a downscaled and/or capped class-cycle or phase.
+
+        :param V:
+            velocities (km/h), rounded according to :data:`.invariants.v_decimals`
+        :return:
+            the least downscaled & capped variant producing `V`, or None
+            (e.g. for the nominal phases, identified by :func:`.cycles.identify_cycle_v()`)
+        """
+        V = np.asarray(V, dtype=float)
+        V_ints = np.rint(inv.vround(V) * 10 ** inv.v_decimals)
+        return self.lookup(_trace_key(V_ints))
+
+
+def _index_fpath(cache_dir: Union[str, Path], f_dscs, v_cap_min: int) -> Path:
+    """The file of the index in `cache_dir`, keyed by the grid & the wltc-data."""
+    key = datamodel.tree_checksum(
+        {
+            "wltc_data": datamodel.wltc_data_checksum(datamodel.get_wltc_data()),
+            "f_dscs": f_dscs,
+            "v_cap_min": v_cap_min,
+        }
+    )
+    return Path(cache_dir).expanduser() / f"{index_file_prefix}{key[:16]}.npz"
+
+
+@fnt.lru_cache()
+def _load_index(fpath: Path) -> VariantsIndex:
+    return VariantsIndex.load(fpath)
+
+
+def load_variants_index(
+    cache_dir: Union[str, Path],
+    f_dsc_max: float = f_dsc_max,
+    v_cap_min: int = v_cap_min,
+) -> Optional[VariantsIndex]:
+    """
+    The variants-index already saved in `cache_dir`, once per process, never building it.
+
+    :return:
+        the index, or None if not (yet) saved there by :func:`get_variants_index()`,
+        or unreadable
+    """
+    fpath = _index_fpath(cache_dir, f_dsc_grid(f_dsc_max), v_cap_min)
+    if not fpath.is_file():
+        return None
+    try:
+        return _load_index(fpath)
+    except Exception as ex:
+        log.warning("Ignoring unreadable variants-index %s, due to: %s", fpath, ex)
+        return None
+
+
+@fnt.lru_cache()
+def get_variants_index(
+    cache_dir: Union[str, Path] = None,
+    f_dsc_max: float = f_dsc_max,
+    v_cap_min: int = v_cap_min,
+) -> VariantsIndex:
+    """
+    Load the variants-index from `cache_dir`, or build & persist it there, once per process.
+
+    :param cache_dir:
+        where to persist the index, keyed by the grid & the wltc-data
+        (e.g. the same dir as :mod:`.cache`);  if not given, it is built in memory
+    """
+    f_dscs = f_dsc_grid(f_dsc_max)
+
+    fpath = None
+    if cache_dir:
+        fpath = _index_fpath(cache_dir, f_dscs, v_cap_min)
+        try:
+            return _load_index(fpath)
+        except FileNotFoundError:
+            pass
+        except Exception as ex:
+            log.warning(
+                "Rebuilding unreadable variants-index %s, due to: %s", fpath, ex
+            )
+
+    log.info("Building cycle variants-index for %i f_dsc values...", len(f_dscs))
+    index = VariantsIndex.build(f_dscs, v_cap_min)
+    if fpath:
+        index.save(fpath)
+
+    return index
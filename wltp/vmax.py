@@ -31,9 +31,10 @@
 import numpy as np
 import pandas as pd
 
-from graphtik import implicit, keyword, sfxed
+from graphtik import implicit, keyword, optional, sfxed
 
 from . import autograph as autog
+from . import engine
 from . import io as wio
 from .invariants import v_step, vround
 
@@ -50,7 +51,10 @@
 
 
 def _find_p_remain_root(
-    gid: int, wot: pd.DataFrame, p_resist: Union[pd.Series, np.ndarray]
+    gid: int,
+    wot: pd.DataFrame,
+    p_resist: Union[pd.Series, np.ndarray],
+    with_wot: bool = False,
 ) -> VMaxRec:
     """
     Find the velocity (the "x") where `p_avail` (the "y") crosses `p_resist`,
@@ -61,6 +65,11 @@ def _find_p_remain_root(
 
     :param gear_gwot:
         A df indexed by grid `v` with (at least) `p_remain_stable` column.
+    :param p_resist:
+        aligned *positionally* with the rows of `wot`
+    :param with_wot:
+        when true, return also the intermediate curves in :attr:`VMaxRec.wot`
+        (a new df), otherwise it is `None`
     :return:
         a :class:`VMaxRec` with v_max in kmh or np.NAN
     """
@@ -68,67 +77,78 @@ def _find_p_remain_root(
 
     assert not wot.empty
 
-    wot = wot.copy()  # or else warn, when appending columns.
-
-    wot[w.p_resist] = p_resist
-    # Drop NANs for max_WOT case below to work, and save space.
-    wot = wot.dropna(subset=(w.p_avail_stable,))
-    wot[w.p_remain_stable] = wot[w.p_avail_stable] - p_resist
+    ## Drop NANs for max_WOT case below to work.
+    P_avail_stable = wot[w.p_avail_stable].to_numpy()
+    valid = ~np.isnan(P_avail_stable)
+    V = wot.index.to_numpy()[valid]
+    N = wot[w.n].to_numpy()[valid]
+    P_remain = P_avail_stable[valid] - np.asarray(p_resist)[valid]
 
-    if (wot[w.p_remain_stable] > 0).all():
-        v_max = wot.index[-1]  # v @ max n
-        n_v_max = wot.loc[:, w.n].iloc[-1]
+    if (P_remain > 0).all():
+        v_max = V[-1]  # v @ max n
+        n_v_max = N[-1]
 
         assert not (np.isnan(v_max) or np.isnan(n_v_max)), locals()
-        rec = VMaxRec(v_max, n_v_max, gid, True, wot)
+        rec = VMaxRec(v_max, n_v_max, gid, True, None)
     else:
-        v_max = np.NAN
-
         ## Zero-crossings of p_remain are marked as sign-changes,
         #  particularly interested in "down-crosses":
         #   -1: drop from positive to 0 (perfect match!)
         #   -2: drop from positive to negative
-        wot[w.sign_p_remain_stable] = np.sign(wot[w.p_remain_stable])
-
-        ## diff-periods:
-        #   ofs=+1: diff with prev-element so zero-crossing is marked on high-index (after cross)
-        #   ofs=-1: diff with next-element so zero-crossing is marked on low-index (before cross)
-        #  (e.g. `F new vehicle.form.vbs#L3273`).
-        #  - Multiplied to preserve sign of down-crossing, for inequality further below.
-        #  - Apply `fillna()`` bc `diff()` leaves one period at head or tail.
+        #  marked on the low-index (before cross), like
+        #  `F new vehicle.form.vbs#L3273`; the 1st of them is the solution
+        #  (where p_remain is either 0 or still positive).
         #
-        offs = -1
-        wot[w.zero_crossings] = offs * wot[w.sign_p_remain_stable].diff(
-            periods=offs
-        ).fillna(0)
-        # ... search for down-crossings only.
-        # roots_head = wot.index[wot[w.zero_crossings].lt(0, fill_value=0)]  # if no `fill_value` all NANs.
-        roots_head = wot.index[wot[w.zero_crossings] < 0]
-        # ... and capture v @ lowest of them (where p_remain is either 0 or still positive)
-        if roots_head.size > 0:
-            v_max = roots_head[0]  # Plain rounding, already close to grid.
-            n_v_max = wot.loc[v_max, w.n]
+        down_crossings = np.diff(np.sign(P_remain)) < 0
+        if down_crossings.any():
+            i = down_crossings.argmax()
+            v_max = V[i]  # Plain rounding, already close to grid.
+            n_v_max = N[i]
 
             assert not (np.isnan(v_max) or np.isnan(n_v_max)), locals()
             assert v_max == vround(v_max), (v_max, vround(v_max))
-            _i = wot.loc[roots_head[0] :, w.p_remain_stable].iteritems()
-            assert next(_i)[1] > 0 and next(_i)[1] <= 0, (
+            assert P_remain[i] > 0 and P_remain[i + 1] <= 0, (
                 "Solution is not the last positive p_remain:",
-                roots_head[0],
                 v_max,
-                wot.loc[v_max - 5 * v_step : v_max + 5 * v_step, w.p_remain_stable],
+                P_remain[max(0, i - 5) : i + 6],
             )
-            rec = VMaxRec(v_max, n_v_max, gid, False, wot)
+            rec = VMaxRec(v_max, n_v_max, gid, False, None)
         else:
-            rec = VMaxRec(np.NAN, np.NAN, gid, False, wot)
+            rec = VMaxRec(np.NAN, np.NAN, gid, False, None)
+
+    if with_wot:
+        rec = rec._replace(wot=_make_vmax_wot(wot, p_resist, rec.is_n_lim))
 
     return rec
 
 
+def _make_vmax_wot(
+    wot: pd.DataFrame, p_resist: Union[pd.Series, np.ndarray], is_n_lim: bool
+) -> pd.DataFrame:
+    """The diagnostic intermediate curves used by :func:`_find_p_remain_root()`. """
+    w = wio.pstep_factory.get().wot
+
+    wot = wot.copy()  # or else warn, when appending columns.
+
+    wot[w.p_resist] = p_resist
+    wot = wot.dropna(subset=(w.p_avail_stable,))
+    wot[w.p_remain_stable] = wot[w.p_avail_stable] - wot[w.p_resist]
+    if not is_n_lim:
+        wot[w.sign_p_remain_stable] = np.sign(wot[w.p_remain_stable])
+        #  (see `_find_p_remain_root()` for the down-crossings)
+        offs = -1
+        wot[w.zero_crossings] = offs * wot[w.sign_p_remain_stable].diff(
+            periods=offs
+        ).fillna(0)
+
+    return wot
+
+
 @autog.autographed(
     needs=[
         sfxed("gwots", "p_avail"),
         implicit("gwots/p_resist"),
+        optional("vmax_with_wot", "with_wot"),
     ],
     provides=[
         *VMaxRec._fields[:-2],
@@ -138,7 +158,9 @@ def _find_p_remain_root(
     inp_sideffects=[("gwots", "p_avail")],
     returns_dict=True,
 )
-def calc_v_max(gwots: Union[pd.Series, pd.DataFrame]) -> VMaxRec:
+def calc_v_max(
+    gwots: Union[pd.Series, pd.DataFrame], with_wot: bool = False
+) -> VMaxRec:
     """
     Finds maximum velocity by scanning gears from the top.
 
@@ -150,6 +172,9 @@ def calc_v_max(gwots: Union[pd.Series, pd.DataFrame]) -> VMaxRec:
         as generated by :func:`~.engine.interpolate_wot_on_v_grid()`, and
         augmented by :func:`~.engine.attach_p_avail_in_gwots()` (in kW) and
         :func:`~.vehicle.calc_p_resist()`.
+    :param with_wot:
+        when true, collect also the diagnostic curves of all gears scanned
+        in :attr:`VMaxRec.wot` (slower), otherwise it is `None`
     :return:
         a :class:`VMaxRec` namedtuple.
 
@@ -157,7 +182,7 @@ def calc_v_max(gwots: Union[pd.Series, pd.DataFrame]) -> VMaxRec:
     w = wio.pstep_factory.get().wot
 
     ## Extract it so as to substract it from `p_avail`.
-    p_resist = gwots.loc[:, w.p_resist]
+    p_resist = gwots.loc[:, w.p_resist].to_numpy()
     gidx = wio.GearMultiIndexer.from_df(gwots)
     ng = gidx.ng
 
@@ -196,7 +221,7 @@ def gear_gwot(gi):
     all_recs = []
     ok_rec = None
     for gid in gids_to_scan:
-        rec = _find_p_remain_root(gid, gear_gwot(gid), p_resist)
+        rec = _find_p_remain_root(gid, gear_gwot(gid), p_resist, with_wot)
         all_recs.append(rec)
 
         if ok_rec and (np.isnan(rec.v_max) or rec.v_max <= ok_rec.v_max):
@@ -205,6 +230,10 @@ def gear_gwot(gi):
         if not np.isnan(rec.v_max):
             ok_rec = rec
     else:
+        all_recs = [
+            _find_p_remain_root(r.g_vmax, gear_gwot(r.g_vmax), p_resist, True)
+            for r in all_recs
+        ]
         gear_wots_df = _package_wots_df(all_recs)
         raise ValueError(
             "Cannot find v_max!\n  Insufficient power??",
@@ -212,5 +241,118 @@ def gear_gwot(gi):
             gwots.head(),
         )
 
-    gear_wots_df = _package_wots_df(all_recs)
+    gear_wots_df = _package_wots_df(all_recs) if with_wot else None
     return ok_rec._replace(wot=gear_wots_df)
+
+
+def _find_p_remain_roots(
+    V: np.ndarray, N: np.ndarray, P_avail_stable: np.ndarray, p_resist: np.ndarray
+) -> VMaxRec:
+    """
+    Like :func:`_find_p_remain_root()` for a single gear, but for many `p_resist` at once.
+
+    :param V, N:
+        the v-grid and the engine-speeds of the gear
+    :param P_avail_stable:
+        the gear's power, shaped like `V`, or ``(points, V)``
+    :param p_resist:
+        shaped ``(points, V)``
+    :return:
+        a :class:`VMaxRec` with arrays, and NAN `v_max` & `n_vmax` where not found
+    """
+    valid = ~np.isnan(P_avail_stable)
+    if valid.ndim > 1:
+        ## The safety-margin cannot introduce NANs.
+        valid = valid.all(axis=0)
+        P_avail_stable = P_avail_stable[:, valid]
+    else:
+        P_avail_stable = P_avail_stable[valid]
+    V = V[valid]
+    N = N[valid]
+    P_remain = P_avail_stable - p_resist[:, valid]
+
+    is_n_lim = (P_remain > 0).all(axis=1)
+    down_crossings = np.diff(np.sign(P_remain), axis=1) < 0
+    i = down_crossings.argmax(axis=1)
+    found = down_crossings.any(axis=1)
+
+    v_max = np.where(is_n_lim, V[-1], np.where(found, V[i], np.NAN))
+    n_vmax = np.where(is_n_lim, N[-1], np.where(found, N[i], np.NAN))
+
+    return VMaxRec(v_max, n_vmax, None, is_n_lim, None)
+
+
+def calc_v_max_many(
+    gwots: pd.DataFrame, p_resist: np.ndarray, f_safety_margin=None, p_wot_scale=None
+) -> VMaxRec:
+    """
+    Like :func:`calc_v_max()` for many road-loads (and safety-margins) of the same powertrain.
+
+    :param gwots:
+        the grid-wots (see :func:`calc_v_max()`), with `p_avail_stable` columns
+        unless `f_safety_margin` is given
+    :param p_resist:
+        floats shaped ``(points, v_grid)``, e.g. from :func:`.vehicle.calc_p_resist()`
+        broadcasting the ``(points, 1)`` coefficients over the v-grid of `gwots`
+    :param f_safety_margin:
+        when given (scalar or ``(points, 1)`` array), the `p_avail_stable` of
+        each point is calculated from the `p` columns of `gwots`
+    :param p_wot_scale:
+        when given (with `f_safety_margin`), multiplies the `p` columns of `gwots`
+        for each point (e.g. the ratios of perturbed `p_rated`)
+    :return:
+        a :class:`VMaxRec` with arrays of length `points` (but no `wot`),
+        with NAN `v_max` where :func:`calc_v_max()` would have raised,
+        and 0 `g_vmax` there.
+
+    **Example:**
+
+    >>> from wltp import engine, vehicle
+    >>> wot = pd.DataFrame({"n": [500, 3000, 6000], "p": [5, 40, 80]})
+    >>> gwots = engine.interpolate_wot_on_v_grid(wot, [120, 60, 40])
+    >>> f2 = np.array([[0.02], [0.1]])
+    >>> p_resist = vehicle.calc_p_resist(gwots.index.to_numpy(), 100, 0.5, f2)
+    >>> calc_v_max_many(gwots, p_resist, 0.1)[:4]
+    (array([150. , 125.1]), array([6000., 5004.]), array([3, 3]), array([ True, False]))
+    """
+    w = wio.pstep_factory.get().wot
+
+    p_resist = np.atleast_2d(p_resist)
+    npoints = p_resist.shape[0]
+    gidx = wio.GearMultiIndexer.from_df(gwots)
+    V = gwots.index.to_numpy()
+
+    v_max = np.full(npoints, np.NAN)
+    n_vmax = np.full(npoints, np.NAN)
+    g_vmax = np.zeros(npoints, dtype=int)
+    is_n_lim = np.zeros(npoints, dtype=bool)
+    ## Points where the gear-scan would `break` (the only success in `calc_v_max()`).
+    done = np.zeros(npoints, dtype=bool)
+
+    ## Scan gears from top --> (top - 3) but stop above the 1st gear.
+    gids_to_scan = list(reversed(range(1, gidx.ng + 1)))[:-1][:4]
+    for gid in gids_to_scan:
+        gear = wio.gear_name(gid)
+        if f_safety_margin is None:
+            P_avail_stable = gwots[(w.p_avail_stable, gear)].to_numpy()
+        else:
+            P = gwots[(w.p, gear)].to_numpy()
+            if p_wot_scale is not None:
+                P = P * p_wot_scale
+            P_avail_stable = engine.calc_p_available(P, f_safety_margin, 0)
+        N = gwots[(w.n, gear)].to_numpy()
+        rec = _find_p_remain_roots(V, N, P_avail_stable, p_resist)
+
+        has_ok = g_vmax > 0
+        done |= has_ok & (np.isnan(rec.v_max) | (rec.v_max <= v_max))
+        upd = ~done & ~np.isnan(rec.v_max)
+        v_max[upd] = rec.v_max[upd]
+        n_vmax[upd] = rec.n_vmax[upd]
+        g_vmax[upd] = gid
+        is_n_lim[upd] = rec.is_n_lim[upd]
+
+    v_max[~done] = n_vmax[~done] = np.NAN
+    g_vmax[~done] = 0
+    is_n_lim[~done] = False
+
+    return VMaxRec(v_max, n_vmax, g_vmax, is_n_lim, None)